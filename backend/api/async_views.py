@@ -0,0 +1,237 @@
+"""Асинхронные вью для горячих эндпоинтов чтения в режиме ASGI.
+
+GET и HEAD обслуживаются здесь: независимые запросы к БД (строки
+страницы, count, множества связей пользователя) выполняются параллельно.
+Остальные методы передаются синхронным вьюсетам DRF.
+
+Ограничения частоты здесь не нужны: у действий чтения нет областей
+throttle_scopes. Запросы выполняются в потоках исполнителя; метрики и
+журнал медленных запросов видят их через переменную контекста
+(metrics.middleware.QUERY_WRAPPERS). Middleware проекта асинхронные,
+так что поток занимают только сами запросы к БД. Ответ на HEAD - без тела.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django_filters.utils import translate_validation
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from recipes.models import Ingredient, Recipe, Tag
+
+from . import fastpath
+from .filters import IngredientFilter, RecipeFilter
+from .mixins import cached_page, page_cache_key, store_page
+from .paginators import (PagePagination, checked_count, count_cacheable,
+                         page_count)
+from .relations import get_relations
+from .renderers import ORJSONRenderer
+from .serializers import TagSerializer
+from .views import IngredientViewSet, RecipeViewSet, TagViewSet
+
+READ_METHODS = ('GET', 'HEAD')
+renderer = ORJSONRenderer()
+
+
+def _run_in_thread(func, *args):
+    # Потоки исполнителя держат свои соединения с БД - закрываем
+    # устаревшие так же, как это делает обработчик запроса.
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+async def db(func, *args):
+    """Выполнить синхронный код ORM в пуле потоков, не блокируя цикл."""
+    return await sync_to_async(_run_in_thread, thread_sensitive=False)(
+        func, *args)
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(renderer.render(data), status=status_code,
+                        content_type=renderer.media_type)
+
+
+def error_response(exc, request):
+    """Ответ об ошибке в формате обработчика исключений DRF."""
+    handled = api_settings.EXCEPTION_HANDLER(
+        exc, {'request': request, 'view': None})
+    response = json_response(handled.data, handled.status_code)
+    for header, value in handled.items():
+        if header != 'Content-Type':
+            response[header] = value
+    if response.status_code == status.HTTP_401_UNAUTHORIZED:
+        response['WWW-Authenticate'] = 'Token'
+    return response
+
+
+def filtered_queryset(filterset_class, request, queryset):
+    """queryset фильтра; неверные параметры - 400, как в DRF."""
+    filterset = filterset_class(
+        request.query_params, queryset=queryset, request=request)
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+    return filterset.qs
+
+
+def authenticate(request):
+    """DRF-запрос с аутентификацией по токену, как у синхронных вьюсетов."""
+    drf_request = Request(request, authenticators=[
+        authenticator() for authenticator
+        in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    ])
+    drf_request.user
+    return drf_request
+
+
+def read_view(sync_view):
+    """Вью: GET/HEAD - асинхронный обработчик, остальное - вьюсет DRF."""
+    def decorator(handler):
+        async def view(request, *args, **kwargs):
+            if request.method not in READ_METHODS:
+                return await sync_to_async(sync_view)(
+                    request, *args, **kwargs)
+            try:
+                drf_request = await db(authenticate, request)
+                response = await handler(drf_request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                response = error_response(exc, request)
+            if request.method == 'HEAD':
+                response.content = b''
+            return response
+        view.csrf_exempt = True
+        return view
+    return decorator
+
+
+async def relation_sets(relations):
+    """Загрузить недостающие множества связей параллельно."""
+    await asyncio.gather(*(
+        db(getattr, relations, kind)
+        for kind in ('favorites', 'shopping_cart', 'following')
+        if kind not in relations.__dict__
+    ))
+    return relations
+
+
+async def recipes_payload(recipe_ids, relations, servings=None):
+    rows, tags, ingredients, relations = await asyncio.gather(
+        db(fastpath.recipe_rows, recipe_ids),
+        db(fastpath.tags_by_recipe, recipe_ids),
+        db(fastpath.ingredients_by_recipe, recipe_ids, servings),
+        relation_sets(relations),
+    )
+    return fastpath.build_recipes(
+        [pk for pk in recipe_ids if pk in rows],
+        rows, tags, ingredients, relations, servings)
+
+
+def page_params(request):
+    paginator = PagePagination()
+    page_size = paginator.get_page_size(request)
+    page = request.query_params.get(paginator.page_query_param, 1)
+    try:
+        page = int(page)
+        if page < 1:
+            raise ValueError
+    except (TypeError, ValueError):
+        raise exceptions.NotFound(paginator.invalid_page_message)
+    return page, page_size
+
+
+def page_link(request, page, last_page):
+    if page < 1 or page > last_page:
+        return None
+    url = request.build_absolute_uri()
+    if page == 1:
+        return remove_query_param(url, PagePagination.page_query_param)
+    return replace_query_param(url, PagePagination.page_query_param, page)
+
+
+async def recipe_page(request):
+    queryset = await db(
+        filtered_queryset, RecipeFilter, request, Recipe.objects.all())
+    page, page_size = page_params(request)
+    offset = (page - 1) * page_size
+    # Лишний id показывает, есть ли следующая страница, даже если count
+    # - оценка или устарел в кэше (см. CountingPaginator).
+    (count, _), recipe_ids, relations = await asyncio.gather(
+        db(page_count, queryset, count_cacheable(request, RecipeViewSet)),
+        db(lambda: list(queryset.values_list('id', flat=True)[
+            offset:offset + page_size + 1])),
+        relation_sets(get_relations(request)),
+    )
+    if not recipe_ids and page > 1:
+        raise exceptions.NotFound(PagePagination.invalid_page_message)
+    count = checked_count(count, offset, recipe_ids, page_size)
+    has_more = len(recipe_ids) > page_size
+    recipe_ids = recipe_ids[:page_size]
+    last_page = page + 1 if has_more else page
+    results = await recipes_payload(recipe_ids, relations)
+    return {
+        'count': count,
+        'next': page_link(request, page + 1, last_page),
+        'previous': page_link(request, page - 1, last_page),
+        'results': results,
+    }
+
+
+@read_view(RecipeViewSet.as_view({'get': 'list', 'post': 'create'}))
+async def recipe_list(request):
+    """Список с общим кэшем страниц, как у RecipeViewSet.list."""
+    key = await db(page_cache_key, request, RecipeViewSet.private_filters)
+    if key is None:
+        return json_response(await recipe_page(request))
+    data = await db(cached_page, key)
+    if data is None:
+        data = await recipe_page(request)
+        await db(store_page, key, data)
+    fastpath.overlay_relations(
+        data['results'], await relation_sets(get_relations(request)))
+    return json_response(data)
+
+
+@read_view(RecipeViewSet.as_view({
+    'get': 'retrieve', 'patch': 'partial_update', 'delete': 'destroy'}))
+async def recipe_detail(request, pk):
+    results = await recipes_payload(
+        [pk], get_relations(request), fastpath.requested_servings(request))
+    if not results:
+        raise exceptions.NotFound()
+    return json_response(results[0])
+
+
+@read_view(IngredientViewSet.as_view({'get': 'list'}))
+async def ingredient_list(request):
+    return json_response(await db(lambda: fastpath.ingredients_data(
+        filtered_queryset(IngredientFilter, request,
+                          Ingredient.objects.all()))))
+
+
+@read_view(IngredientViewSet.as_view({'get': 'retrieve'}))
+async def ingredient_detail(request, pk):
+    data = await db(lambda: fastpath.ingredients_data(
+        Ingredient.objects.filter(pk=pk)))
+    if not data:
+        raise exceptions.NotFound()
+    return json_response(data[0])
+
+
+@read_view(TagViewSet.as_view({'get': 'list'}))
+async def tag_list(request):
+    return json_response(await db(
+        lambda: TagSerializer(Tag.objects.all(), many=True).data))
+
+
+@read_view(TagViewSet.as_view({'get': 'retrieve'}))
+async def tag_detail(request, pk):
+    tag = await db(lambda: Tag.objects.filter(pk=pk).first())
+    if tag is None:
+        raise exceptions.NotFound()
+    return json_response(TagSerializer(tag).data)
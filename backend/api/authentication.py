@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from metrics.instruments import record_cache
+
+CACHE_KEY = 'auth-token:{}'
+
+
+class SharedTokenCache:
+    """Кэш токенов в общем для всех воркеров бэкенде из CACHES."""
+
+    def __init__(self, alias, ttl):
+        self.cache = caches[alias]
+        self.ttl = ttl
+
+    def get(self, key):
+        return self.cache.get(CACHE_KEY.format(key))
+
+    def set(self, key, value):
+        self.cache.set(CACHE_KEY.format(key), value, self.ttl)
+
+    def delete(self, key):
+        self.cache.delete(CACHE_KEY.format(key))
+
+
+def get_token_cache():
+    """Кэш токенов; None, если общий кэш не настроен.
+
+    Кэша внутри процесса нет намеренно: сигналы сброса (выход, смена
+    пароля, деактивация) видит только воркер, обработавший запрос, и
+    остальные принимали бы отозванный токен до истечения TTL.
+    """
+    options = settings.AUTH_TOKEN_CACHE
+    if not options['ALIAS']:
+        return None
+    return SharedTokenCache(options['ALIAS'], options['TTL'])
+
+
+def drop_tokens(keys):
+    """Убрать токены из кэша."""
+    cache = get_token_cache()
+    if cache is not None:
+        for key in keys:
+            cache.delete(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену без запроса к БД на каждый запрос.
+
+    Пара (пользователь, токен) кэшируется по ключу токена; записи
+    сбрасываются сигналами в api.signals при удалении токена, смене
+    пароля и деактивации пользователя.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        if cache is None:
+            return super().authenticate_credentials(key)
+        credentials = cache.get(key)
+        record_cache('auth_token', credentials is not None)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            cache.set(key, credentials)
+        elif not credentials[0].is_active:
+            # Запись могла попасть в кэш до деактивации.
+            cache.delete(key)
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        return credentials
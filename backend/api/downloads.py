@@ -0,0 +1,23 @@
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse
+
+
+def protected_file_response(name, filename):
+    """Отдать файл из default_storage как вложение.
+
+    Если задан X_ACCEL_REDIRECT_PREFIX, Python только проверяет доступ,
+    а сам файл читает и отправляет nginx из internal-location.
+    """
+    prefix = settings.X_ACCEL_REDIRECT_PREFIX
+    if not prefix:
+        return FileResponse(default_storage.open(name),
+                            as_attachment=True, filename=filename)
+    response = HttpResponse()
+    # Тип определит nginx по расширению файла.
+    del response['Content-Type']
+    response['X-Accel-Redirect'] = f'{prefix.rstrip("/")}/{quote(name)}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,180 @@
+"""Быстрая сериализация для эндпоинтов чтения.
+
+Словари строятся напрямую из строк .values(), без создания вложенных
+сериализаторов на каждую запись. Результат совпадает с выводом
+RecipeSerializer, RecipeShortSerializer и IngredientSerializer.
+"""
+from collections import defaultdict
+
+from rest_framework.exceptions import ValidationError
+
+from recipes.models import ROLLUP_FIELDS, Component, Recipe
+from recipes.rollups import rollup_data
+from recipes.shopping_list import scaled_amount
+from recipes.units import format_amount
+
+from .relations import get_relations
+
+RECIPE_FIELDS = ('id', 'name', 'image', 'text', 'cooking_time', 'servings',
+                 *ROLLUP_FIELDS)
+AUTHOR_FIELDS = ('email', 'id', 'username', 'first_name', 'last_name')
+SHORT_RECIPE_FIELDS = ('id', 'name', 'image', 'cooking_time')
+INGREDIENT_FIELDS = ('id', 'name', 'measurement_unit')
+
+image_storage = Recipe._meta.get_field('image').storage
+
+
+def image_url(name):
+    if not name:
+        raise ValueError(
+            "The 'image' attribute has no file associated with it.")
+    return image_storage.url(name)
+
+
+def tags_by_recipe(recipe_ids):
+    tags = defaultdict(list)
+    rows = Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('tag__name').values_list(
+        'recipe_id', 'tag__id', 'tag__name', 'tag__color', 'tag__slug')
+    for recipe_id, tag_id, name, color, slug in rows:
+        tags[recipe_id].append(
+            {'id': tag_id, 'name': name, 'color': color, 'slug': slug})
+    return tags
+
+
+def requested_servings(request):
+    """Число порций из ?servings= или None, если параметр не передан."""
+    value = request.query_params.get('servings') if request else None
+    if value is None:
+        return None
+    try:
+        servings = int(value)
+        if servings < 1:
+            raise ValueError
+    except ValueError:
+        raise ValidationError({'servings': [
+            'Количество порций должно быть целым положительным числом.']})
+    return servings
+
+
+def ingredients_by_recipe(recipe_ids, servings=None):
+    """Составы рецептов; при servings количества пересчитываются в БД."""
+    ingredients = defaultdict(list)
+    rows = Component.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('recipe_id', 'id')
+    amount = 'amount'
+    if servings is not None:
+        rows = rows.annotate(scaled=scaled_amount(servings))
+        amount = 'scaled'
+    rows = rows.values_list(
+        'recipe_id', 'ingredient__id', 'ingredient__name', amount,
+        'ingredient__measurement_unit')
+    for recipe_id, ingredient_id, name, amount, unit in rows:
+        ingredients[recipe_id].append({
+            'id': ingredient_id,
+            'name': name,
+            'amount': amount if servings is None else format_amount(amount),
+            'measurement_unit': unit,
+        })
+    return ingredients
+
+
+def author_data(row, relations):
+    return {
+        'email': row['author__email'],
+        'id': row['author_id'],
+        'username': row['author__username'],
+        'first_name': row['author__first_name'],
+        'last_name': row['author__last_name'],
+        'is_subscribed': relations.is_subscribed(row['author_id']),
+    }
+
+
+def recipe_rows(recipe_ids):
+    return {
+        row['id']: row
+        for row in Recipe.objects.filter(id__in=recipe_ids).values(
+            *RECIPE_FIELDS, 'author_id',
+            *(f'author__{field}' for field in AUTHOR_FIELDS if field != 'id')
+        )
+    }
+
+
+def build_recipes(recipe_ids, rows, tags, ingredients, relations,
+                  servings=None):
+    """Собрать представления из уже загруженных частей.
+
+    Рецепты, удаленные после выборки страницы, пропускаются.
+    """
+    data = []
+    for recipe_id in recipe_ids:
+        row = rows.get(recipe_id)
+        if row is None:
+            continue
+        data.append({
+            'id': recipe_id,
+            'tags': tags[recipe_id],
+            'author': author_data(row, relations),
+            'ingredients': ingredients[recipe_id],
+            'is_favorited': recipe_id in relations.favorites,
+            'is_in_shopping_cart': recipe_id in relations.shopping_cart,
+            'name': row['name'],
+            'image': image_url(row['image']),
+            'text': row['text'],
+            'cooking_time': row['cooking_time'],
+            'servings': servings or row['servings'],
+            'nutrition': rollup_data(row, servings),
+        })
+    return data
+
+
+def overlay_relations(recipes, relations):
+    """Проставить флаги пользователя в готовые представления рецептов."""
+    for recipe in recipes:
+        recipe['is_favorited'] = recipe['id'] in relations.favorites
+        recipe['is_in_shopping_cart'] = (
+            recipe['id'] in relations.shopping_cart)
+        recipe['author']['is_subscribed'] = relations.is_subscribed(
+            recipe['author']['id'])
+    return recipes
+
+
+def recipes_data(recipe_ids, request, servings=None):
+    """Представления рецептов в порядке recipe_ids за три запроса."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return []
+    return build_recipes(
+        recipe_ids,
+        recipe_rows(recipe_ids),
+        tags_by_recipe(recipe_ids),
+        ingredients_by_recipe(recipe_ids, servings),
+        get_relations(request),
+        servings,
+    )
+
+
+def short_recipes_data(recipes):
+    """Краткие представления из QuerySet или списка экземпляров."""
+    if hasattr(recipes, 'values_list'):
+        rows = recipes.values_list(*SHORT_RECIPE_FIELDS)
+    else:
+        rows = ((recipe.id, recipe.name, recipe.image.name,
+                 recipe.cooking_time) for recipe in recipes)
+    return [
+        {'id': recipe_id, 'name': name, 'image': image_url(image),
+         'cooking_time': cooking_time}
+        for recipe_id, name, image, cooking_time in rows
+    ]
+
+
+def ingredients_data(ingredients):
+    if hasattr(ingredients, 'values'):
+        return list(ingredients.values(*INGREDIENT_FIELDS))
+    return [
+        {'id': ingredient.id, 'name': ingredient.name,
+         'measurement_unit': ingredient.measurement_unit}
+        for ingredient in ingredients
+    ]
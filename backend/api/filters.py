@@ -1,5 +1,6 @@
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Component, Ingredient, Recipe, Tag
 from users.models import User
 
 
@@ -12,8 +13,17 @@ class IngredientFilter(FilterSet):
         fields = ('name',)
 
 
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    """Список чисел через запятую: ?ingredients=1,2,3."""
+
+
 class RecipeFilter(FilterSet):
-    """Фильтр рецептов по автору/тегу/подписке/наличию в списке покупок."""
+    """Фильтр рецептов по автору/тегу/подписке/наличию в списке покупок,
+    времени приготовления, дате публикации и ингредиентам.
+
+    Ингредиенты проверяются подзапросами EXISTS / NOT EXISTS по составу
+    (индекс unique_component по ingredient, recipe), без JOIN и DISTINCT.
+    """
     tags = filters.ModelMultipleChoiceFilter(queryset=Tag.objects.all(),
                                              field_name='tags__slug',
                                              to_field_name='slug')
@@ -26,6 +36,18 @@ class RecipeFilter(FilterSet):
         label='is_in_shopping_cart',
         method='filter_is_in_shopping_cart'
     )
+    # ?cooking_time_min=&cooking_time_max=
+    cooking_time = filters.RangeFilter()
+    # ?pub_date_after=&pub_date_before= в ISO 8601.
+    pub_date = filters.IsoDateTimeFromToRangeFilter()
+    ingredients = NumberInFilter(method='filter_ingredients')
+    exclude_ingredients = NumberInFilter(method='filter_exclude_ingredients')
+    # ?calories_min=&calories_max= и т.п. по индексированным суммам.
+    calories = filters.RangeFilter()
+    proteins = filters.RangeFilter()
+    fats = filters.RangeFilter()
+    carbohydrates = filters.RangeFilter()
+    cost = filters.RangeFilter()
 
     class Meta:
         model = Recipe
@@ -40,3 +62,17 @@ class RecipeFilter(FilterSet):
         if value and self.request.user.is_authenticated:
             return queryset.filter(shop_cart__user=self.request.user)
         return queryset
+
+    def filter_ingredients(self, queryset, name, value):
+        """Рецепты, в составе которых есть все указанные ингредиенты."""
+        for ingredient_id in set(value):
+            queryset = queryset.filter(Exists(Component.objects.filter(
+                recipe=OuterRef('pk'), ingredient_id=ingredient_id)))
+        return queryset
+
+    def filter_exclude_ingredients(self, queryset, name, value):
+        """Рецепты без единого из указанных ингредиентов."""
+        if not value:
+            return queryset
+        return queryset.exclude(Exists(Component.objects.filter(
+            recipe=OuterRef('pk'), ingredient_id__in=value)))
@@ -0,0 +1,88 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+
+from recipes.models import Component, Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+WORDS = ('разогрейте духовку до 180 градусов смешайте муку с сахаром '
+         'добавьте яйца и молоко тщательно перемешайте выложите в форму '
+         'выпекайте минут до золотистой корочки подавайте теплым').split()
+ENCODINGS = ('identity', 'gzip', 'br')
+
+
+class Command(BaseCommand):
+    help = 'Объем ответа списка рецептов без сжатия, с gzip и с brotli.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=200)
+        parser.add_argument('--ingredients', type=int, default=8)
+        parser.add_argument('--limits', default='6,24,100')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def text(self, rng):
+        # Разный текст у каждого рецепта, иначе сжатие выглядит лучше,
+        # чем на реальных данных.
+        return ' '.join(rng.choice(WORDS) for _ in range(60)).capitalize()
+
+    def seed(self, count, per_recipe):
+        rng = random.Random(0)
+        author = User.objects.create(
+            email='bench@foodgram.local', username='bench_author',
+            first_name='Bench', last_name='Author')
+        Tag.objects.bulk_create(
+            Tag(name=f'Тег {i}', slug=f'bench-{i}', color=f'#bench{i}')
+            for i in range(3))
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент bench-{i}', measurement_unit='г')
+            for i in range(per_recipe))
+        tags = list(Tag.objects.filter(slug__startswith='bench-'))
+        ingredients = list(Ingredient.objects.filter(
+            name__startswith='Ингредиент bench-'))
+        Recipe.objects.bulk_create(
+            Recipe(author=author, name=f'Рецепт номер {i}',
+                   text=self.text(rng), image=f'recipes/{i:032x}.jpg',
+                   cooking_time=10 + i % 50)
+            for i in range(count))
+        recipes = list(Recipe.objects.filter(author=author))
+        Component.objects.bulk_create(
+            Component(recipe=recipe, ingredient=ingredient,
+                      amount=rng.randint(1, 1000))
+            for recipe in recipes for ingredient in ingredients)
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for recipe in recipes for tag in tags)
+
+    def fetch(self, client, url, encoding, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = client.get(url, HTTP_ACCEPT_ENCODING=encoding)
+            body = b''.join(response.streaming_content) if (
+                response.streaming) else response.content
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return len(body), response.get('Content-Encoding', 'identity'), best
+
+    def handle(self, *args, **options):
+        client = Client()
+        with transaction.atomic():
+            self.seed(options['recipes'], options['ingredients'])
+            for limit in options['limits'].split(','):
+                url = f'/api/recipes/?limit={limit}'
+                sizes = {}
+                for encoding in ENCODINGS:
+                    size, used, elapsed = self.fetch(
+                        client, url, encoding, options['repeat'])
+                    sizes[encoding] = size
+                    ratio = sizes['identity'] / size
+                    self.stdout.write(
+                        f'limit={limit:>4} {encoding:>8} -> {used:>8}: '
+                        f'{size:>8} байт (x{ratio:.1f}), '
+                        f'{elapsed * 1000:.1f} мс')
+            transaction.set_rollback(True)
@@ -0,0 +1,48 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочное сравнение WSGI и ASGI режимов: параллельные '
+            'клиенты запрашивают один и тот же путь.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'servers', nargs='+',
+            help='Базовые адреса, например http://127.0.0.1:8000 '
+                 '(gunicorn WSGI) и http://127.0.0.1:8001 (uvicorn ASGI).')
+        parser.add_argument('--path', default='/api/recipes/')
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--token', default='')
+
+    def fetch(self, url, headers):
+        start = time.perf_counter()
+        with urlopen(Request(url, headers=headers)) as response:
+            response.read()
+            return response.status, time.perf_counter() - start
+
+    def handle(self, *args, **options):
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        for server in options['servers']:
+            url = server.rstrip('/') + options['path']
+            self.fetch(url, headers)
+            start = time.perf_counter()
+            with ThreadPoolExecutor(options['concurrency']) as executor:
+                results = list(executor.map(
+                    lambda _: self.fetch(url, headers),
+                    range(options['requests'])))
+            elapsed = time.perf_counter() - start
+            latencies = sorted(latency for _, latency in results)
+            errors = sum(code != 200 for code, _ in results)
+            self.stdout.write(
+                f'{server}: {len(results) / elapsed:.1f} rps, '
+                f'p50 {latencies[len(latencies) // 2] * 1000:.1f} мс, '
+                f'p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} мс, '
+                f'ошибок {errors}'
+            )
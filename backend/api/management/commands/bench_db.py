@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+
+from foodgram.db.pool import pool_stats
+
+MODES = {
+    'no-persist': {'CONN_MAX_AGE': 0, 'POOL': False},
+    'persistent': {'CONN_MAX_AGE': 600, 'POOL': False},
+    'pool': {'CONN_MAX_AGE': 0, 'POOL': True},
+}
+
+
+class Command(BaseCommand):
+    help = ('Сравнение запросов в секунду с постоянными соединениями, '
+            'пулом и без них.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/tags/')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--modes', nargs='+', choices=MODES,
+                            default=list(MODES))
+
+    def handle(self, *args, **options):
+        settings_dict = connection.settings_dict
+        saved = (settings_dict['CONN_MAX_AGE'],
+                 dict(settings_dict.get('POOL') or {}))
+        client = Client()
+        try:
+            for mode in options['modes']:
+                if (MODES[mode]['POOL']
+                        and not hasattr(connection, 'pooled_connection')):
+                    self.stdout.write(
+                        f'{mode}: пропущено, нужен ENGINE foodgram.db')
+                    continue
+                connection.close()
+                settings_dict['CONN_MAX_AGE'] = MODES[mode]['CONN_MAX_AGE']
+                settings_dict['POOL'] = {**saved[1],
+                                         'ENABLED': MODES[mode]['POOL']}
+                client.get(options['path'])
+                start = time.perf_counter()
+                for _ in range(options['requests']):
+                    client.get(options['path'])
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f'{mode}: {options["requests"] / elapsed:.1f} rps '
+                    f'({elapsed * 1000 / options["requests"]:.2f} мс/запрос)'
+                )
+        finally:
+            connection.close()
+            settings_dict['CONN_MAX_AGE'], settings_dict['POOL'] = saved
+        if pool_stats():
+            self.stdout.write(f'Пул: {pool_stats()}')
@@ -0,0 +1,150 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.models import (Component, FavoriteRecipe, Ingredient, Recipe,
+                            ShoppingCart)
+from recipes.partitioning import set_partitions
+
+User = get_user_model()
+
+# Связи генерируются арифметикой по массивам id, чтобы не гонять
+# миллионы строк через Python.
+RELATIONS_SQL = """
+    INSERT INTO {table} (user_id, recipe_id{extra_columns})
+    SELECT u, (%(recipes)s::bigint[])[
+        1 + (u * 7919 + k * 104729) %% cardinality(%(recipes)s::bigint[])]
+        {extra_values}
+    FROM unnest(%(users)s::bigint[]) AS u,
+         generate_series(0, %(per_user)s - 1) AS k
+    ON CONFLICT DO NOTHING
+"""
+COMPONENTS_SQL = """
+    INSERT INTO {table} (recipe_id, ingredient_id, amount)
+    SELECT r, (%(ingredients)s::bigint[])[
+        1 + (r + k * 31) %% cardinality(%(ingredients)s::bigint[])],
+        1 + k
+    FROM unnest(%(recipes)s::bigint[]) AS r,
+         generate_series(0, %(per_recipe)s - 1) AS k
+    ON CONFLICT DO NOTHING
+"""
+
+
+def percentiles(timings):
+    cuts = statistics.quantiles(timings, n=100)
+    return cuts[49] * 1000, cuts[94] * 1000
+
+
+class Command(BaseCommand):
+    help = ('Задержка вставки и выборки избранного, корзины и состава '
+            'рецептов в обычных и хеш-секционированных таблицах '
+            '(PostgreSQL). Данные генерируются и откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20000)
+        parser.add_argument('--recipes', type=int, default=50000)
+        parser.add_argument('--per-user', type=int, default=50,
+                            help='Рецептов в избранном и в корзине.')
+        parser.add_argument('--per-recipe', type=int, default=8)
+        parser.add_argument('--partitions', type=int,
+                            default=settings.PARTITIONING['PARTITIONS'])
+        parser.add_argument('--samples', type=int, default=1000)
+        parser.add_argument('--page', type=int, default=24,
+                            help='Рецептов на странице списка.')
+
+    def seed(self, options):
+        users = User.objects.bulk_create(
+            User(email=f'part-{i}@foodgram.local', username=f'part-{i}',
+                 first_name='Part', last_name='User')
+            for i in range(options['users']))
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'part-{i}', measurement_unit='г')
+            for i in range(500))
+        recipes = Recipe.objects.bulk_create(
+            (Recipe(author=users[i % len(users)], name=f'part-{i}',
+                    text='text', image='recipes/part.png', cooking_time=10)
+             for i in range(options['recipes'])), batch_size=10000)
+        self.user_ids = [user.id for user in users]
+        self.recipe_ids = [recipe.id for recipe in recipes]
+        params = {'users': self.user_ids, 'recipes': self.recipe_ids,
+                  'ingredients': [item.id for item in ingredients],
+                  'per_user': options['per_user'],
+                  'per_recipe': options['per_recipe']}
+        with connection.cursor() as cursor:
+            cursor.execute(RELATIONS_SQL.format(
+                table=FavoriteRecipe._meta.db_table,
+                extra_columns='', extra_values=''), params)
+            cursor.execute(RELATIONS_SQL.format(
+                table=ShoppingCart._meta.db_table,
+                extra_columns=', servings', extra_values=', 1'), params)
+            cursor.execute(COMPONENTS_SQL.format(
+                table=Component._meta.db_table), params)
+
+    def measure(self, operation, samples):
+        timings = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            operation()
+            timings.append(time.perf_counter() - start)
+        return percentiles(timings)
+
+    def operations(self, rng, page):
+        def user_and_page():
+            return (rng.choice(self.user_ids),
+                    rng.sample(self.recipe_ids, page))
+
+        def insert():
+            FavoriteRecipe.objects.bulk_create(
+                [FavoriteRecipe(user_id=rng.choice(self.user_ids),
+                                recipe_id=rng.choice(self.recipe_ids))],
+                ignore_conflicts=True)
+
+        def user_flags():
+            # Флаги is_favorited / is_in_shopping_cart страницы списка.
+            user_id, recipe_ids = user_and_page()
+            for model in (FavoriteRecipe, ShoppingCart):
+                list(model.objects.filter(
+                    user_id=user_id, recipe_id__in=recipe_ids
+                ).values_list('recipe_id', flat=True))
+
+        def components():
+            list(Component.objects.filter(
+                recipe_id__in=user_and_page()[1]).values_list(
+                    'ingredient_id', 'amount'))
+
+        def recipe_favorites():
+            # Не по ключу секционирования: читает все секции.
+            FavoriteRecipe.objects.filter(
+                recipe_id=rng.choice(self.recipe_ids)).count()
+
+        return {'вставка в избранное': insert,
+                'флаги страницы': user_flags,
+                'состав страницы': components,
+                'избранное рецепта': recipe_favorites}
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Секционирование доступно только в PostgreSQL.')
+        with transaction.atomic():
+            start = time.perf_counter()
+            self.seed(options)
+            self.stdout.write(
+                f'Данные сгенерированы за {time.perf_counter() - start:.1f} с')
+            for partitions in (0, options['partitions']):
+                start = time.perf_counter()
+                set_partitions(connection, partitions)
+                self.stdout.write(
+                    f'\nСекций: {partitions or "нет"} '
+                    f'(перестроение {time.perf_counter() - start:.1f} с)')
+                operations = self.operations(
+                    random.Random(0), options['page'])
+                for name, operation in operations.items():
+                    p50, p95 = self.measure(operation, options['samples'])
+                    self.stdout.write(
+                        f'{name:>22}: p50 {p50:.2f} мс, p95 {p95:.2f} мс')
+            transaction.set_rollback(True)
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import ORJSONRenderer, StreamingJSONRenderer, orjson
+
+
+class Command(BaseCommand):
+    help = 'Пропускная способность JSON-рендереров на списке ингредиентов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=2200)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--chunk', type=int, default=500)
+
+    def handle(self, *args, **options):
+        items = [
+            {'id': i, 'name': f'Ингредиент номер {i}',
+             'measurement_unit': 'г'}
+            for i in range(options['items'])
+        ]
+        chunk = options['chunk']
+        batches = [items[i:i + chunk] for i in range(0, len(items), chunk)]
+        streaming = StreamingJSONRenderer()
+        cases = {
+            'JSONRenderer': lambda: JSONRenderer().render(items),
+            'ORJSONRenderer': lambda: ORJSONRenderer().render(items),
+            'StreamingJSONRenderer': lambda: b''.join(
+                streaming.stream(batches)),
+        }
+        if orjson is None:
+            self.stdout.write('orjson не установлен, используется json.')
+        for name, render in cases.items():
+            size = len(render())
+            start = time.perf_counter()
+            for _ in range(options['repeat']):
+                render()
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'{name}: {elapsed * 1000 / options["repeat"]:.2f} мс, '
+                f'{size * options["repeat"] / elapsed / 2 ** 20:.1f} МБ/с'
+            )
@@ -0,0 +1,84 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.serializers import RecipeSerializer
+from recipes.models import Component, Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Время сериализации 1000 рецептов через ModelSerializer '
+            'и через api.fastpath.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--ingredients', type=int, default=8)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def seed(self, count, per_recipe):
+        author = User.objects.create(
+            email='bench@foodgram.local', username='bench_author',
+            first_name='Bench', last_name='Author')
+        Tag.objects.bulk_create(
+            Tag(name=f'bench-{i}', slug=f'bench-{i}', color=f'#bench{i}')
+            for i in range(3))
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'bench-{i}', measurement_unit='г')
+            for i in range(per_recipe))
+        # Не все СУБД возвращают id из bulk_create - перечитываем.
+        tags = list(Tag.objects.filter(slug__startswith='bench-'))
+        ingredients = list(Ingredient.objects.filter(
+            name__startswith='bench-'))
+        Recipe.objects.bulk_create(
+            Recipe(author=author, name=f'bench-{i}', text='text',
+                   image='recipes/bench.png', cooking_time=10)
+            for i in range(count))
+        recipes = list(Recipe.objects.filter(author=author))
+        Component.objects.bulk_create(
+            Component(recipe=recipe, ingredient=ingredient, amount=100)
+            for recipe in recipes for ingredient in ingredients)
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for recipe in recipes for tag in tags)
+        return author, recipes
+
+    def measure(self, recipes, request, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            data = RecipeSerializer(
+                recipes, many=True, context={'request': request}).data
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, data
+
+    def handle(self, *args, **options):
+        count = options['recipes']
+        with transaction.atomic():
+            author, recipes = self.seed(count, options['ingredients'])
+            request = Request(APIRequestFactory().get('/api/recipes/'))
+            request.user = author
+            results = {}
+            for fast in (False, True):
+                with override_settings(FAST_SERIALIZATION=fast):
+                    recipes = list(Recipe.objects.filter(author=author))
+                    results[fast] = self.measure(
+                        recipes, request, options['repeat'])
+            transaction.set_rollback(True)
+        slow, fast = results[False][0], results[True][0]
+        per_thousand = 1000 / count
+        self.stdout.write(
+            f'ModelSerializer: {slow * per_thousand * 1000:.1f} мс '
+            f'на 1000 рецептов')
+        self.stdout.write(
+            f'fastpath: {fast * per_thousand * 1000:.1f} мс '
+            f'на 1000 рецептов (x{slow / fast:.1f})')
+        if results[False][1] != results[True][1]:
+            self.stderr.write('Результаты сериализации различаются!')
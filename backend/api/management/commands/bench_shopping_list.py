@@ -0,0 +1,96 @@
+import time
+from collections import Counter, defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import Component, Ingredient, Recipe, ShoppingCart
+from recipes.shopping_list import apply_deltas, shopping_list_rows
+from recipes.units import convert, format_amount
+
+User = get_user_model()
+
+# Одни и те же продукты в разных, но совместимых единицах.
+UNITS = ('г', 'кг', 'мл', 'л', 'ст. л.', 'ч. л.', 'стакан', 'шт.',
+         'по вкусу')
+
+
+class Command(BaseCommand):
+    help = ('Сборка списка покупок по большой корзине: поэлементное '
+            'слияние в Python против агрегации в БД.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=500)
+        parser.add_argument('--products', type=int, default=40)
+        parser.add_argument('--ingredients', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def seed(self, count, products, per_recipe):
+        user = User.objects.create(
+            email='bench@foodgram.local', username='bench_user',
+            first_name='Bench', last_name='User')
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'bench-{i}', measurement_unit=unit)
+            for i in range(products) for unit in UNITS)
+        ingredients = list(Ingredient.objects.filter(
+            name__startswith='bench-'))
+        Recipe.objects.bulk_create(
+            Recipe(author=user, name=f'bench-{i}', text='text',
+                   image='recipes/bench.png', cooking_time=10)
+            for i in range(count))
+        recipes = list(Recipe.objects.filter(author=user))
+        Component.objects.bulk_create(
+            Component(recipe=recipe,
+                      ingredient=ingredients[(i * 7 + j) % len(ingredients)],
+                      amount=1 + (i + j) % 500)
+            for i, recipe in enumerate(recipes) for j in range(per_recipe))
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=user, recipe=recipe) for recipe in recipes)
+        # bulk_create не вызывает сигналы - заполняем список одним проходом.
+        totals = Counter()
+        for ingredient_id, amount in Component.objects.filter(
+                recipe__in=recipes).values_list('ingredient_id', 'amount'):
+            totals[ingredient_id] += amount
+        apply_deltas([user.id], totals)
+        return user
+
+    def legacy(self, user):
+        """Прежний способ: обход всех компонентов рецептов из корзины."""
+        merged = defaultdict(float)
+        components = Component.objects.filter(
+            recipe__shop_cart__user=user).select_related('ingredient')
+        for component in components:
+            amount, unit = convert(
+                component.amount, component.ingredient.measurement_unit)
+            merged[(component.ingredient.name, unit)] += amount
+        return [
+            (name, unit, format_amount(amount))
+            for (name, unit), amount in sorted(merged.items())
+        ]
+
+    def current(self, user):
+        return [row[1:] for row in shopping_list_rows(user)]
+
+    def measure(self, func, user, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rows = func(user)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, rows
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = self.seed(options['recipes'], options['products'],
+                             options['ingredients'])
+            slow, expected = self.measure(
+                self.legacy, user, options['repeat'])
+            fast, rows = self.measure(self.current, user, options['repeat'])
+            transaction.set_rollback(True)
+        self.stdout.write(
+            f'Python: {slow * 1000:.1f} мс, БД: {fast * 1000:.1f} мс '
+            f'(x{slow / fast:.1f}), строк: {len(rows)}')
+        if rows != expected:
+            self.stderr.write('Списки покупок различаются!')
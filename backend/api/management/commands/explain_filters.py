@@ -0,0 +1,180 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.filters import RecipeFilter
+from recipes.models import Component, Ingredient, Recipe
+
+User = get_user_model()
+
+PREFIX = 'plan-'
+BATCH_SIZE = 10000
+# Запросы, планы которых проверяем. Ингредиенты - номера с шагом
+# генерации: ингредиенты с соседними номерами встречаются вместе.
+CASES = (
+    {'cooking_time_max': 15},
+    {'cooking_time_min': 30, 'cooking_time_max': 40},
+    {'pub_date_after': 30},
+    {'cooking_time_max': 20, 'pub_date_after': 90},
+    {'ingredients': (1,)},
+    {'ingredients': (1, 2), 'cooking_time_max': 30},
+    {'cooking_time_max': 10, 'exclude_ingredients': (3, 4)},
+    {'ingredients': (5,), 'exclude_ingredients': (6,),
+     'cooking_time_max': 25, 'pub_date_after': 180},
+)
+
+POSTGRES_SEED = (
+    """
+    INSERT INTO {recipe} (author_id, name, image, text, cooking_time,
+                          servings, pub_date)
+    SELECT %(author)s, 'Рецепт ' || i, 'recipes/' || i || '.jpg', '',
+           1 + i %% 120, 1 + i %% 6,
+           %(now)s - i * interval '30 seconds'
+    FROM generate_series(1, %(recipes)s) AS i
+    """,
+    """
+    INSERT INTO {component} (recipe_id, ingredient_id, amount)
+    SELECT r.id, ing.ids[1 + (r.id + k * %(step)s) %% %(ingredients)s],
+           1 + (r.id + k) %% 500
+    FROM {recipe} AS r,
+         (SELECT array_agg(id ORDER BY id) AS ids FROM {ingredient}
+          WHERE name LIKE %(prefix)s) AS ing,
+         generate_series(0, %(per_recipe)s - 1) AS k
+    WHERE r.author_id = %(author)s
+    """,
+)
+
+
+def full_scan(plan, table):
+    """Читает ли план таблицу целиком, а не по индексу."""
+    if connection.vendor == 'postgresql':
+        return f'Seq Scan on {table}' in plan
+    return any(line.strip().endswith(f'SCAN {table}')
+               for line in plan.splitlines())
+
+
+class Command(BaseCommand):
+    help = ('Планы запросов списка рецептов с фильтрами по времени '
+            'приготовления, дате и ингредиентам на сгенерированных '
+            'данных. Ошибка, если план читает таблицу рецептов целиком.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--per-recipe', type=int, default=8)
+        parser.add_argument('--limit', type=int, default=6,
+                            help='Размер страницы в проверяемых запросах.')
+        parser.add_argument('--plans', action='store_true',
+                            help='Печатать планы целиком.')
+
+    def seed_postgres(self, author, options):
+        params = {
+            'author': author.id, 'now': timezone.now(),
+            'recipes': options['recipes'],
+            'ingredients': options['ingredients'],
+            'per_recipe': options['per_recipe'],
+            'step': max(options['ingredients'] // options['per_recipe'], 1),
+            'prefix': f'{PREFIX}%',
+        }
+        tables = {'recipe': Recipe._meta.db_table,
+                  'component': Component._meta.db_table,
+                  'ingredient': Ingredient._meta.db_table}
+        with connection.cursor() as cursor:
+            for sql in POSTGRES_SEED:
+                cursor.execute(sql.format(**tables), params)
+            for table in tables.values():
+                cursor.execute(f'ANALYZE {table}')
+
+    def seed_orm(self, author, options):
+        ingredients = list(Ingredient.objects.filter(
+            name__startswith=PREFIX).order_by('id').values_list(
+                'id', flat=True))
+        step = max(len(ingredients) // options['per_recipe'], 1)
+        now = timezone.now()
+        for start in range(0, options['recipes'], BATCH_SIZE):
+            numbers = range(
+                start + 1, min(start + BATCH_SIZE, options['recipes']) + 1)
+            recipes = Recipe.objects.bulk_create(
+                Recipe(author=author, name=f'Рецепт {i}',
+                       image=f'recipes/{i}.jpg', text='',
+                       cooking_time=1 + i % 120, servings=1 + i % 6)
+                for i in numbers)
+            recipes = list(Recipe.objects.filter(
+                author=author).order_by('-id')[:len(recipes)])[::-1]
+            # auto_now_add не дает задать дату при вставке.
+            for i, recipe in zip(numbers, recipes):
+                recipe.pub_date = now - timedelta(seconds=30 * i)
+            Recipe.objects.bulk_update(recipes, ['pub_date'])
+            Component.objects.bulk_create(
+                Component(recipe=recipe,
+                          ingredient_id=ingredients[
+                              (recipe.id + k * step) % len(ingredients)],
+                          amount=1 + (recipe.id + k) % 500)
+                for recipe in recipes
+                for k in range(options['per_recipe']))
+
+    def seed(self, options):
+        author = User.objects.create(
+            email='plan@foodgram.local', username='plan_author',
+            first_name='Plan', last_name='Author')
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'{PREFIX}{i}', measurement_unit='г')
+            for i in range(options['ingredients']))
+        start = time.perf_counter()
+        if connection.vendor == 'postgresql':
+            self.seed_postgres(author, options)
+        else:
+            self.seed_orm(author, options)
+        self.stdout.write(
+            f'Сгенерировано {options["recipes"]} рецептов за '
+            f'{time.perf_counter() - start:.1f} с')
+
+    def query_params(self, case, ingredients, step):
+        params = {}
+        for name, value in case.items():
+            if name.endswith('ingredients'):
+                value = ','.join(
+                    str(ingredients[i * step % len(ingredients)])
+                    for i in value)
+            elif name == 'pub_date_after':
+                value = (timezone.now() - timedelta(days=value)).isoformat()
+            params[name] = value
+        return params
+
+    def check_case(self, params, options):
+        filterset = RecipeFilter(params, queryset=Recipe.objects.only('id'))
+        if not filterset.is_valid():
+            raise CommandError(filterset.errors)
+        queryset = filterset.qs[:options['limit']]
+        plan = queryset.explain()
+        start = time.perf_counter()
+        found = len(queryset)
+        elapsed = time.perf_counter() - start
+        scan = full_scan(plan, Recipe._meta.db_table)
+        self.stdout.write(
+            f'{"ПОЛНЫЙ ПРОХОД" if scan else "индекс":>13}  '
+            f'{elapsed * 1000:8.1f} мс  {found:>3} строк  {params}')
+        if options['plans']:
+            self.stdout.write(plan + '\n')
+        return scan
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.seed(options)
+            ingredients = list(Ingredient.objects.filter(
+                name__startswith=PREFIX).order_by('id').values_list(
+                    'id', flat=True))
+            step = max(len(ingredients) // options['per_recipe'], 1)
+            failed = [
+                case for case in CASES
+                if self.check_case(
+                    self.query_params(case, ingredients, step), options)]
+            transaction.set_rollback(True)
+        if failed:
+            raise CommandError(
+                f'Полный проход по таблице рецептов в {len(failed)} '
+                f'запросах из {len(CASES)}.')
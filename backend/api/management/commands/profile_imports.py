@@ -0,0 +1,70 @@
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# То, что делает воркер до первого запроса: WSGI-приложение и URLconf.
+BOOT_SCRIPT = (
+    'import foodgram.wsgi\n'
+    'from django.urls import get_resolver\n'
+    'get_resolver().url_patterns\n'
+)
+
+
+def parse_importtime(output):
+    """Строки -X importtime -> [(модуль, собственное, суммарное время мкс)]."""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_time), int(cumulative)))
+    return modules
+
+
+class Command(BaseCommand):
+    help = ('Время старта воркера и стоимость импорта модулей '
+            '(python -X importtime).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Сколько раз замерить полный старт интерпретатора.')
+
+    def run(self, *args):
+        return subprocess.run(
+            [sys.executable, *args, '-c', BOOT_SCRIPT],
+            cwd=settings.BASE_DIR, capture_output=True, text=True)
+
+    def handle(self, *args, **options):
+        timings = []
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            result = self.run()
+            timings.append(time.perf_counter() - start)
+            if result.returncode:
+                raise CommandError(result.stderr)
+        self.stdout.write(
+            f'Старт воркера: мин {min(timings) * 1000:.0f} мс, '
+            f'медиана {statistics.median(timings) * 1000:.0f} мс')
+
+        modules = parse_importtime(self.run('-X', 'importtime').stderr)
+        total = sum(self_time for _, self_time, _ in modules)
+        self.stdout.write(
+            f'Импорт: {len(modules)} модулей, {total / 1000:.0f} мс')
+        self.stdout.write('\nМодули по собственному времени, мс:')
+        for name, self_time, cumulative in sorted(
+                modules, key=lambda module: -module[1])[:options['top']]:
+            self.stdout.write(
+                f'{self_time / 1000:8.1f} {cumulative / 1000:8.1f}  {name}')
+        packages = Counter()
+        for name, self_time, _ in modules:
+            packages[name.split('.')[0]] += self_time
+        self.stdout.write('\nПакеты, мс:')
+        for package, self_time in packages.most_common(options['top']):
+            self.stdout.write(f'{self_time / 1000:8.1f}  {package}')
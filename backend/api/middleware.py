@@ -0,0 +1,295 @@
+import gzip
+import hashlib
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponseNotModified, JsonResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from django.utils.text import compress_sequence
+
+from metrics.instruments import SHED
+from metrics.middleware import HybridMiddleware
+from recipes.versions import current_version
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+    'text/',
+)
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding, кроме явно запрещенных (q=0)."""
+    encodings = set()
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+def brotli_sequence(sequence, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for chunk in sequence:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(HybridMiddleware):
+    """Сжатие ответов API: brotli, если клиент его принимает, иначе gzip.
+
+    Сжимаются только текстовые типы и ответы не меньше MIN_SIZE байт;
+    потоковые ответы (StreamingJSONRenderer) сжимаются по частям.
+    """
+
+    def __init__(self, get_response):
+        self.options = settings.COMPRESSION
+        if not self.options['ENABLED']:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def call(self, request):
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(
+            request, await self.get_response(request))
+
+    def choose_encoding(self, request):
+        encodings = accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in encodings:
+            return 'br'
+        if 'gzip' in encodings:
+            return 'gzip'
+        return None
+
+    def compress(self, encoding, content):
+        if encoding == 'br':
+            return brotli.compress(
+                content, quality=self.options['BROTLI_QUALITY'])
+        return gzip.compress(
+            content, compresslevel=self.options['GZIP_LEVEL'], mtime=0)
+
+    def process_response(self, request, response):
+        if (response.has_header('Content-Encoding')
+                or response.has_header('X-Accel-Redirect')):
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0]
+        if not content_type.strip().lower().startswith(COMPRESSIBLE_TYPES):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = self.choose_encoding(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if encoding == 'br':
+                response.streaming_content = brotli_sequence(
+                    response.streaming_content,
+                    self.options['BROTLI_QUALITY'])
+            else:
+                response.streaming_content = compress_sequence(
+                    response.streaming_content)
+            del response['Content-Length']
+        else:
+            if len(response.content) < self.options['MIN_SIZE']:
+                return response
+            compressed = self.compress(encoding, response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(response.content))
+
+        # Сжатое тело не совпадает побайтно с исходным.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+
+class InFlight:
+    """Запросы в работе процесса и отказы LoadSheddingMiddleware."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.count = 0
+        self.shed = 0
+        self.limit = None
+
+    def enter(self):
+        """Занять место; False - процесс перегружен."""
+        with self.lock:
+            if self.count >= self.limit:
+                self.shed += 1
+                SHED.inc()
+                return False
+            self.count += 1
+            return True
+
+    def leave(self):
+        with self.lock:
+            self.count -= 1
+
+    def stats(self):
+        return {'in_flight': self.count, 'shed': self.shed,
+                'max_in_flight': self.limit}
+
+
+IN_FLIGHT = InFlight()
+
+
+class LoadSheddingMiddleware(HybridMiddleware):
+    """Сброс нагрузки: 503 с Retry-After сверх MAX_IN_FLIGHT запросов.
+
+    Счетчик - на процесс (воркер): лучше сразу отказать, чем держать
+    запрос в очереди до таймаута прокси. Поэтому сброс работает только
+    у воркеров, обслуживающих несколько запросов сразу: gunicorn с
+    GUNICORN_THREADS > 1 или ASGI; у синхронного воркера в работе всегда
+    один запрос. Потоковое тело ответа отдается уже после выхода из
+    middleware и в счетчик не входит.
+    """
+
+    def __init__(self, get_response):
+        self.options = settings.LOAD_SHEDDING
+        if not self.options['MAX_IN_FLIGHT']:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        IN_FLIGHT.limit = self.options['MAX_IN_FLIGHT']
+
+    def overloaded(self):
+        response = JsonResponse(
+            {'detail': 'Сервер перегружен, повторите запрос позже.'},
+            status=503)
+        response['Retry-After'] = str(self.options['RETRY_AFTER'])
+        return response
+
+    def call(self, request):
+        if request.path.startswith(self.options['EXEMPT_PATHS']):
+            return self.get_response(request)
+        if not IN_FLIGHT.enter():
+            return self.overloaded()
+        try:
+            return self.get_response(request)
+        finally:
+            IN_FLIGHT.leave()
+
+    async def __acall__(self, request):
+        if request.path.startswith(self.options['EXEMPT_PATHS']):
+            return await self.get_response(request)
+        if not IN_FLIGHT.enter():
+            return self.overloaded()
+        try:
+            return await self.get_response(request)
+        finally:
+            IN_FLIGHT.leave()
+
+
+def load_shedding_stats():
+    """Счетчики LoadSheddingMiddleware текущего процесса; None - выключен."""
+    return None if IN_FLIGHT.limit is None else IN_FLIGHT.stats()
+
+
+def etag_matches(etag, header):
+    """etag есть в If-None-Match; сравнение слабое (без W/).
+
+    "*" не поддерживается: без вызова view неизвестно, есть ли ресурс.
+    """
+    return any(tag.removeprefix('W/') == etag
+               for tag in parse_etags(header))
+
+
+class AnonymousCacheMiddleware(HybridMiddleware):
+    """Заголовки для кэша nginx у анонимных GET списков рецептов.
+
+    Анонимный запрос - без Authorization и без cookie сессии: его ответ
+    одинаков для всех и помечается public с s-maxage, остальные ответы
+    тех же путей - private. ETag зависит от версии рецептов, URL и
+    Accept, поэтому совпавший If-None-Match получает 304 без вызова
+    view. Должен стоять после CompressionMiddleware: ETag сжатого
+    ответа становится слабым.
+    """
+
+    def __init__(self, get_response):
+        self.options = settings.RESPONSE_CACHE
+        if not self.options['S_MAXAGE']:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def is_anonymous(self, request):
+        return (request.method in ('GET', 'HEAD')
+                and 'HTTP_AUTHORIZATION' not in request.META
+                and settings.SESSION_COOKIE_NAME not in request.COOKIES)
+
+    def make_etag(self, request):
+        version = current_version()
+        if version is None:
+            return None
+        key = (f'{version}:{request.get_full_path()}:'
+               f'{request.META.get("HTTP_ACCEPT", "")}')
+        return f'"{hashlib.sha1(key.encode()).hexdigest()}"'
+
+    def patch_public(self, response, etag):
+        patch_cache_control(response, public=True, max_age=0,
+                            s_maxage=self.options['S_MAXAGE'])
+        if etag:
+            response['ETag'] = etag
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def patch_private(self, response):
+        patch_cache_control(response, private=True)
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def not_modified(self, request, etag):
+        """304 без вызова view, если If-None-Match совпал; иначе None."""
+        if etag and etag_matches(
+                etag, request.META.get('HTTP_IF_NONE_MATCH', '')):
+            return self.patch_public(HttpResponseNotModified(), etag)
+        return None
+
+    def patch(self, response, etag):
+        if response.status_code == 200:
+            return self.patch_public(response, etag)
+        return self.patch_private(response)
+
+    def call(self, request):
+        if not request.path.startswith(self.options['PATHS']):
+            return self.get_response(request)
+        if not self.is_anonymous(request):
+            return self.patch_private(self.get_response(request))
+        etag = self.make_etag(request)
+        return self.not_modified(request, etag) or self.patch(
+            self.get_response(request), etag)
+
+    async def __acall__(self, request):
+        if not request.path.startswith(self.options['PATHS']):
+            return await self.get_response(request)
+        if not self.is_anonymous(request):
+            return self.patch_private(await self.get_response(request))
+        # Версия читается из общего кэша - сетевой вызов вне цикла.
+        etag = await sync_to_async(
+            self.make_etag, thread_sensitive=False)(request)
+        return self.not_modified(request, etag) or self.patch(
+            await self.get_response(request), etag)
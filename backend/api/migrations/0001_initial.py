@@ -0,0 +1,27 @@
+# Generated by Django 3.2.16 on 2026-10-19 18:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThrottleBucket',
+            fields=[
+                ('key', models.CharField(max_length=200, primary_key=True, serialize=False, verbose_name='Область и клиент')),
+                ('tokens', models.FloatField(verbose_name='Жетонов')),
+                ('updated', models.FloatField(verbose_name='Обновлена')),
+                ('expires', models.FloatField(db_index=True, verbose_name='Полна после')),
+            ],
+            options={
+                'verbose_name': 'Корзина ограничения частоты',
+                'verbose_name_plural': 'Корзины ограничения частоты',
+            },
+        ),
+    ]
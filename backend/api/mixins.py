@@ -0,0 +1,95 @@
+import hashlib
+from itertools import islice
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import StreamingHttpResponse
+from rest_framework.response import Response
+
+from metrics.instruments import record_cache
+from recipes.versions import current_version, get_cache
+
+from .fastpath import overlay_relations
+from .relations import UserRelations, get_relations
+
+PAGE_KEY = 'recipe-page:{version}:{digest}'
+
+
+class StreamingListMixin:
+    """Потоковая отдача непагинированного списка.
+
+    Если выбран рендерер с методом stream(), элементы читаются из БД
+    через iterator() и сериализуются пачками по stream_chunk_size.
+    """
+    stream_chunk_size = 500
+
+    def list(self, request, *args, **kwargs):
+        renderer = getattr(request, 'accepted_renderer', None)
+        if not hasattr(renderer, 'stream') or self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return StreamingHttpResponse(
+            renderer.stream(self.serialized_batches(queryset)),
+            content_type=renderer.media_type
+        )
+
+    def serialized_batches(self, queryset):
+        rows = queryset.iterator(chunk_size=self.stream_chunk_size)
+        while True:
+            batch = list(islice(rows, self.stream_chunk_size))
+            if not batch:
+                return
+            yield self.get_serializer(batch, many=True).data
+
+
+def page_cache_key(request, private_filters):
+    """Ключ страницы списка рецептов; None - страницу не кэшировать."""
+    ttl = settings.RESPONSE_CACHE['PAGE_TTL']
+    if not ttl or any(name in request.query_params
+                      for name in private_filters):
+        return None
+    version = current_version()
+    if version is None:
+        return None
+    # Ссылки next/previous абсолютные: хост и схема входят в ключ.
+    url = (f'{request.build_absolute_uri(request.path)}?'
+           f'{urlencode(sorted(request.query_params.lists()), True)}')
+    return PAGE_KEY.format(
+        version=version, digest=hashlib.sha1(url.encode()).hexdigest())
+
+
+def cached_page(key):
+    data = get_cache().get(key)
+    record_cache('recipe_pages', data is not None)
+    return data
+
+
+def store_page(key, data):
+    """Сохранить страницу без флагов пользователя."""
+    overlay_relations(data['results'], UserRelations(AnonymousUser()))
+    get_cache().set(key, data, settings.RESPONSE_CACHE['PAGE_TTL'])
+
+
+class CachedPageMixin:
+    """Кэш страниц списка рецептов, общий для всех пользователей.
+
+    Страница хранится без флагов пользователя под ключом из URL с
+    параметрами фильтров и паджинации и версии рецептов (recipes.versions):
+    правка рецептов меняет версию, и старые страницы больше не читаются.
+    Флаги избранного, корзины и подписки на автора проставляются поверх
+    копии из кэша по множествам id из api.relations. Фильтры по связям
+    пользователя (private_filters) кэш не используют.
+    """
+    private_filters = ('is_favorited', 'is_in_shopping_cart')
+
+    def list(self, request, *args, **kwargs):
+        key = page_cache_key(request, self.private_filters)
+        if key is None:
+            return super().list(request, *args, **kwargs)
+        data = cached_page(key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            store_page(key, data)
+        overlay_relations(data['results'], get_relations(request))
+        return Response(data)
@@ -1,7 +1,141 @@
+import hashlib
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.utils.functional import cached_property
 from rest_framework.pagination import PageNumberPagination
 
+from metrics.instruments import record_cache
+from recipes.paginators import estimated_count, filtered
+
+COUNT_KEY = 'page-count:{}'
+
+
+def count_signature(queryset):
+    """Отпечаток фильтра: SQL запроса подсчета с параметрами."""
+    sql, params = queryset.order_by().query.get_compiler(
+        queryset.db).as_sql()
+    return hashlib.sha1(f'{sql}{params!r}'.encode()).hexdigest()
+
+
+def exact_count(queryset, cache=True):
+    """COUNT(*) с кэшем по отпечатку фильтра на COUNT_CACHE_TTL секунд.
+
+    cache=False - для списков конкретного пользователя: после его записи
+    число строк должно меняться сразу.
+    """
+    options = settings.PAGINATION_COUNT
+    if not (cache and options['CACHE_TTL']):
+        return queryset.count()
+    cache = caches[options['CACHE_ALIAS']]
+    key = COUNT_KEY.format(count_signature(queryset))
+    count = cache.get(key)
+    record_cache('page_count', count is not None)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, options['CACHE_TTL'])
+    return count
+
+
+def page_count(queryset, cache=True):
+    """(число строк, оценка ли это) для паджинации списка.
+
+    Оценка берется из pg_class.reltuples только для списка без фильтров и
+    только если она не меньше EXACT_THRESHOLD; отфильтрованные списки
+    считаются точно.
+    """
+    options = settings.PAGINATION_COUNT
+    if options['ESTIMATE'] and not filtered(queryset):
+        estimate = estimated_count(queryset.model, queryset.db)
+        if estimate is not None and estimate >= options['EXACT_THRESHOLD']:
+            return estimate, True
+    return exact_count(queryset, cache), False
+
+
+def count_cacheable(request, view):
+    """Можно ли кэшировать число строк: список одинаков для всех.
+
+    Избранное, корзина, подписки и рецепты самого пользователя меняются
+    его же запросами - устаревший count он бы сразу заметил.
+    """
+    if getattr(view, 'private_list', False):
+        return False
+    params = request.query_params
+    if any(name in params for name in getattr(view, 'private_filters', ())):
+        return False
+    user = request.user
+    return not (user.is_authenticated
+                and params.get('author') == str(user.pk))
+
+
+def checked_count(count, bottom, rows, per_page):
+    """Число строк, согласованное с прочитанной страницей.
+
+    На последней странице оно точное; если count из кэша или оценки
+    меньше уже прочитанного, берется нижняя граница.
+    """
+    if len(rows) <= per_page:
+        return bottom + len(rows)
+    return max(count, bottom + len(rows))
+
+
+class LookaheadPage(Page):
+
+    def __init__(self, object_list, number, paginator, has_more):
+        super().__init__(object_list, number, paginator)
+        self.has_more = has_more
+
+    def has_next(self):
+        return self.has_more
+
+
+class CountingPaginator(Paginator):
+    """Paginator с count из page_count.
+
+    count может быть оценкой или устареть в кэше, поэтому срез страницы
+    от него не зависит: страница читается с одной лишней строкой, по
+    которой видно, есть ли следующая, а count уточняется по ее строкам.
+    """
+    estimated = False
+
+    def __init__(self, *args, cache_count=True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_count = cache_count
+
+    @cached_property
+    def count(self):
+        count, self.estimated = page_count(self.object_list, self.cache_count)
+        return count
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if int(number) < 1:
+                raise
+            return int(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('Эта страница не содержит результатов')
+        self.count = checked_count(self.count, bottom, rows, self.per_page)
+        self.__dict__.pop('num_pages', None)
+        return LookaheadPage(rows[:self.per_page], number, self,
+                             len(rows) > self.per_page)
+
 
 class PagePagination(PageNumberPagination):
     """Паджинатор."""
     page_size = 6
     page_size_query_param = 'limit'
+    django_paginator_class = CountingPaginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.django_paginator_class = partial(
+            CountingPaginator, cache_count=count_cacheable(request, view))
+        return super().paginate_queryset(queryset, request, view)
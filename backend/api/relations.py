@@ -0,0 +1,94 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.functional import cached_property
+
+from metrics.instruments import record_cache
+from recipes.models import FavoriteRecipe, ShoppingCart
+from users.models import Subscribe
+
+VERSION_KEY = 'relations-version:{kind}:{user_id}'
+DATA_KEY = 'relations:{kind}:{user_id}:{version}'
+
+# Вид связи -> (модель, поле со связанным id).
+RELATIONS = {
+    'favorites': (FavoriteRecipe, 'recipe_id'),
+    'shopping_cart': (ShoppingCart, 'recipe_id'),
+    'following': (Subscribe, 'author_id'),
+}
+
+
+def get_cache():
+    alias = settings.RELATIONS_CACHE['ALIAS']
+    return caches[alias] if alias else None
+
+
+def bump_version(kind, user_id):
+    """Сделать недоступными закэшированные связи пользователя."""
+    cache = get_cache()
+    if cache is not None:
+        cache.set(VERSION_KEY.format(kind=kind, user_id=user_id),
+                  time.time_ns(), None)
+
+
+class UserRelations:
+    """Множества id избранного, корзины и подписок текущего пользователя.
+
+    Каждое множество загружается одним запросом values_list при первом
+    обращении (или берется из версионированной записи кэша), после чего
+    флаги в сериализаторах проверяются по вхождению в множество.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    def _load(self, kind):
+        if not self.user.is_authenticated:
+            return frozenset()
+        cache = get_cache()
+        version = None
+        if cache is not None:
+            version_key = VERSION_KEY.format(kind=kind, user_id=self.user.id)
+            version = cache.get(version_key)
+            if version is None:
+                version = time.time_ns()
+                cache.set(version_key, version, None)
+            data_key = DATA_KEY.format(
+                kind=kind, user_id=self.user.id, version=version)
+            ids = cache.get(data_key)
+            record_cache('relations', ids is not None)
+            if ids is not None:
+                return ids
+        model, field = RELATIONS[kind]
+        ids = frozenset(model.objects.filter(user=self.user).values_list(
+            field, flat=True))
+        if cache is not None:
+            cache.set(data_key, ids, settings.RELATIONS_CACHE['TTL'])
+        return ids
+
+    @cached_property
+    def favorites(self):
+        return self._load('favorites')
+
+    @cached_property
+    def shopping_cart(self):
+        return self._load('shopping_cart')
+
+    @cached_property
+    def following(self):
+        return self._load('following')
+
+    def is_subscribed(self, author_id):
+        return (self.user.is_authenticated
+                and self.user.id != author_id
+                and author_id in self.following)
+
+
+def get_relations(request):
+    """Контекст связей, один на запрос."""
+    relations = getattr(request, '_user_relations', None)
+    if relations is None:
+        relations = UserRelations(request.user)
+        request._user_relations = relations
+    return relations
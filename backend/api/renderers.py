@@ -0,0 +1,69 @@
+import logging
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSON через orjson, если он установлен, иначе стандартный рендерер.
+
+    Вывод совпадает с JSONRenderer: компактный, без экранирования
+    не-ASCII символов, нестроковые ключи словарей приводятся к строкам;
+    форматированный вывод (indent) отдается
+    стандартному рендереру.
+    """
+
+    def dumps(self, data):
+        return orjson.dumps(
+            data,
+            default=JSONEncoder().default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        ).replace(
+            '\u2028'.encode(), b'\\u2028'
+        ).replace('\u2029'.encode(), b'\\u2029')
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or indent:
+            return super().render(data, accepted_media_type, renderer_context)
+        return self.dumps(data)
+
+
+class StreamingJSONRenderer(ORJSONRenderer):
+    """Рендерер, умеющий отдавать список частями.
+
+    Обычные ответы рендерит как ORJSONRenderer; вьюсеты со
+    StreamingListMixin передают в stream() итератор пачек элементов.
+    Заголовки к этому моменту уже отправлены: ошибка посреди списка
+    пишется в лог и пробрасывается дальше, соединение обрывается, и ни
+    клиент, ни кэш nginx не примут обрезанный список за полный ответ.
+    """
+
+    def encode(self, data):
+        if orjson is not None:
+            return self.dumps(data)
+        return super().render(data)
+
+    def stream(self, batches):
+        yield b'['
+        first = True
+        try:
+            for batch in batches:
+                if not batch:
+                    continue
+                chunk = self.encode(batch)[1:-1]
+                yield chunk if first else b',' + chunk
+                first = False
+        except Exception:
+            logger.exception('Ошибка при потоковой отдаче списка')
+            raise
+        yield b']'
@@ -1,14 +1,24 @@
 import base64
 
+from django.conf import settings
 from django.core.files.base import ContentFile
 from djoser.serializers import UserSerializer
-from rest_framework import serializers
+from rest_framework import exceptions, serializers
+from rest_framework.reverse import reverse
 from rest_framework.validators import UniqueTogetherValidator
 
-from recipes.models import (Component, FavoriteRecipe, Ingredient, Recipe,
-                            ShoppingCart, Tag)
+from jobs.models import Job
+from jobs.queue import enqueue
+
+from recipes import rollups, shopping_list
+from recipes.models import (ROLLUP_FIELDS, Component, FavoriteRecipe,
+                            Ingredient, Recipe, ShoppingCart, Tag)
+from recipes.units import format_amount
 from users.models import Subscribe, User
 
+from . import fastpath
+from .relations import get_relations
+
 
 MIN_VALUE = 1
 MAX_VALUE = 32000
@@ -32,10 +42,8 @@ class UserSerializer(UserSerializer):
         extra_kwargs = {'password': {'write_only': True}}
 
     def get_is_subscribed(self, obj):
-        user = self.context.get("request").user
-        if user.is_authenticated and user.username != obj.username:
-            return obj.subscriber.filter(user=user).exists()
-        return False
+        return get_relations(self.context.get('request')).is_subscribed(
+            obj.id)
 
     def create(self, validated_data):
         """Метод создания нового пользователя."""
@@ -59,6 +67,13 @@ class Base64ImageField(serializers.ImageField):
         return super().to_internal_value(data)
 
 
+class IngredientListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        if not settings.FAST_SERIALIZATION:
+            return super().to_representation(data)
+        return fastpath.ingredients_data(data)
+
+
 class IngredientSerializer(serializers.ModelSerializer):
     """Сериалайзер для ингридиента."""
     class Meta:
@@ -68,6 +83,7 @@ class IngredientSerializer(serializers.ModelSerializer):
             'name',
             'measurement_unit',
         )
+        list_serializer_class = IngredientListSerializer
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -122,6 +138,14 @@ class ComponentCreateSerializer(serializers.ModelSerializer):
         return value
 
 
+class RecipeListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        if not settings.FAST_SERIALIZATION:
+            return super().to_representation(data)
+        return fastpath.recipes_data(
+            (recipe.id for recipe in data), self.context.get('request'))
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     """Сериалайзер рецепта."""
     tags = TagSerializer(many=True)
@@ -130,6 +154,7 @@ class RecipeSerializer(serializers.ModelSerializer):
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
     ingredients = ComponentSerializer(many=True, source='components')
     image = serializers.SerializerMethodField()
+    nutrition = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -144,23 +169,47 @@ class RecipeSerializer(serializers.ModelSerializer):
             'image',
             'text',
             'cooking_time',
+            'servings',
+            'nutrition',
         )
+        list_serializer_class = RecipeListSerializer
+
+    def to_representation(self, instance):
+        request = self.context.get('request')
+        # ?servings= пересчитывает только детальное представление.
+        servings = (fastpath.requested_servings(request)
+                    if self.parent is None else None)
+        if settings.FAST_SERIALIZATION:
+            data = fastpath.recipes_data([instance.id], request, servings)
+            if not data:
+                # Рецепт удален после выборки.
+                raise exceptions.NotFound()
+            return data[0]
+        data = super().to_representation(instance)
+        if servings is not None:
+            for ingredient in data['ingredients']:
+                ingredient['amount'] = format_amount(
+                    ingredient['amount'] * servings / instance.servings)
+            data['servings'] = servings
+            data['nutrition'] = self.get_nutrition(instance, servings)
+        return data
 
     def get_is_favorited(self, obj):
-        user = self.context.get('request').user
-        if user.is_authenticated:
-            return obj.favorite.filter(user=user).exists()
-        return False
+        return obj.id in get_relations(self.context.get('request')).favorites
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context.get('request').user
-        if user.is_authenticated:
-            return obj.shop_cart.filter(user=user).exists()
-        return False
+        return obj.id in get_relations(
+            self.context.get('request')).shopping_cart
 
     def get_image(self, obj):
         return obj.image.url
 
+    def get_nutrition(self, obj, servings=None):
+        return rollups.rollup_data({
+            field: getattr(obj, field)
+            for field in ('servings', *ROLLUP_FIELDS)
+        }, servings)
+
 
 class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
     """Сериалайзер для создания и редактирования рецептов."""
@@ -181,6 +230,7 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             'name',
             'text',
             'cooking_time',
+            'servings',
             'image'
         )
 
@@ -205,12 +255,24 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             ) for ingredient in ingredients]
         )
 
+    def update_rollups(self, recipe):
+        rollups.update_recipes([recipe.id])
+        recipe.refresh_from_db(fields=ROLLUP_FIELDS)
+
+    def process_image(self, recipe):
+        """Обработка изображения выполняется фоновой задачей."""
+        enqueue('recipes.process_image', {'recipe_id': recipe.id},
+                idempotency_key=f'recipe-image:{recipe.id}:'
+                                f'{recipe.image.name}')
+
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('components')
         recipe = Recipe.objects.create(author=self.context['request'].user,
                                        **validated_data)
         self.tags_and_ingredients_set(recipe, tags, ingredients)
+        self.update_rollups(recipe)
+        self.process_image(recipe)
         return recipe
 
     def update(self, instance, validated_data):
@@ -219,13 +281,22 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         instance.text = validated_data.get('text', instance.text)
         instance.cooking_time = validated_data.get(
             'cooking_time', instance.cooking_time)
+        old_servings = instance.servings
+        instance.servings = validated_data.get('servings', instance.servings)
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('components')
+        old_amounts = shopping_list.recipe_amounts(instance.id)
         Component.objects.filter(
             recipe=instance,
             ingredient__in=instance.ingredients.all()).delete()
         self.tags_and_ingredients_set(instance, tags, ingredients)
+        shopping_list.components_changed(
+            instance.id, old_amounts,
+            {item['ingredient'].id: item['amount'] for item in ingredients},
+            old_servings, instance.servings)
         instance.save()
+        self.update_rollups(instance)
+        self.process_image(instance)
         return instance
 
     def to_representation(self, instance):
@@ -236,6 +307,13 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         ).data
 
 
+class RecipeShortListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        if not settings.FAST_SERIALIZATION:
+            return super().to_representation(data)
+        return fastpath.short_recipes_data(data)
+
+
 class RecipeShortSerializer(serializers.ModelSerializer):
     """Сериалайзер для рецепта в избранном, подписке, списке покупок."""
     image = serializers.SerializerMethodField()
@@ -248,6 +326,7 @@ class RecipeShortSerializer(serializers.ModelSerializer):
             'image',
             'cooking_time'
         )
+        list_serializer_class = RecipeShortListSerializer
 
     def get_image(self, obj):
         return obj.image.url
@@ -273,10 +352,8 @@ class SubscribeSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        user = self.context.get("request").user
-        if user.is_authenticated and user.username != obj.username:
-            return obj.subscriber.filter(user=user).exists()
-        return False
+        return get_relations(self.context.get('request')).is_subscribed(
+            obj.id)
 
     def get_recipes(self, obj):
         request = self.context.get('request')
@@ -337,7 +414,7 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
     """Сериалайзер для рецепта в списке покупок."""
     class Meta:
         model = ShoppingCart
-        fields = ('user', 'recipe')
+        fields = ('user', 'recipe', 'servings')
         validators = [
             UniqueTogetherValidator(
                 queryset=ShoppingCart.objects.all(),
@@ -346,9 +423,53 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
             )
         ]
 
+    def update(self, instance, validated_data):
+        old_servings = instance.servings
+        instance = super().update(instance, validated_data)
+        shopping_list.servings_changed(instance, old_servings)
+        return instance
+
     def to_representation(self, instance):
         request = self.context.get('request')
         return RecipeShortSerializer(
             instance.recipe,
             context={'request': request}
         ).data
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Сериалайзер статуса фоновой задачи."""
+    url = serializers.SerializerMethodField()
+    download = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = (
+            'id',
+            'name',
+            'status',
+            'attempts',
+            'created',
+            'finished_at',
+            'url',
+            'download',
+        )
+
+    def get_url(self, obj):
+        return reverse('jobs-detail', args=[obj.id],
+                       request=self.context.get('request'))
+
+    def get_download(self, obj):
+        if obj.status != Job.DONE or not (obj.result or {}).get('file'):
+            return None
+        return reverse('jobs-download', args=[obj.id],
+                       request=self.context.get('request'))
+
+
+class ShoppingListItemSerializer(serializers.Serializer):
+    """Сериалайзер строки сводного списка покупок."""
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    measurement_unit = serializers.CharField()
+    # Целое или дробное после перевода в каноническую единицу.
+    amount = serializers.ReadOnlyField()
@@ -0,0 +1,70 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.models import FavoriteRecipe, ShoppingCart
+from recipes.purge import pre_purge
+from users.models import Subscribe
+
+from .authentication import drop_tokens
+from .relations import bump_version
+
+User = get_user_model()
+
+PURGED_KINDS = {
+    FavoriteRecipe: 'favorites',
+    ShoppingCart: 'shopping_cart',
+    Subscribe: 'following',
+}
+
+
+@receiver(post_delete, sender=Token)
+def drop_deleted_token(sender, instance, **kwargs):
+    """Выход через djoser удаляет токен - убираем его и из кэша."""
+    drop_tokens([instance.key])
+
+
+@receiver(pre_purge, sender=Token)
+def drop_purged_tokens(sender, pks, **kwargs):
+    # Первичный ключ Token - сам ключ токена.
+    drop_tokens(pks)
+
+
+@receiver(post_save, sender=User)
+def drop_user_tokens(sender, instance, update_fields=None, **kwargs):
+    """Смена пароля, деактивация и другие правки профиля."""
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    drop_tokens(Token.objects.filter(user=instance).values_list(
+        'key', flat=True))
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_delete, sender=FavoriteRecipe)
+def bump_favorites(sender, instance, **kwargs):
+    bump_version('favorites', instance.user_id)
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def bump_shopping_cart(sender, instance, **kwargs):
+    bump_version('shopping_cart', instance.user_id)
+
+
+@receiver(post_save, sender=Subscribe)
+@receiver(post_delete, sender=Subscribe)
+def bump_following(sender, instance, **kwargs):
+    bump_version('following', instance.user_id)
+
+
+@receiver(pre_purge, sender=FavoriteRecipe)
+@receiver(pre_purge, sender=ShoppingCart)
+@receiver(pre_purge, sender=Subscribe)
+def bump_purged(sender, pks, **kwargs):
+    """Очистка удаляет связи без post_delete - сбрасываем кэш сами."""
+    kind = PURGED_KINDS[sender]
+    user_ids = sender.objects.filter(pk__in=pks).order_by().values_list(
+        'user_id', flat=True).distinct()
+    for user_id in user_ids:
+        bump_version(kind, user_id)
@@ -0,0 +1,43 @@
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+
+from recipes.models import Tag
+from recipes.versions import bump_version, check_shared_cache
+
+RESPONSE_CACHE = {
+    'ALIAS': 'default',
+    'S_MAXAGE': 60,
+    'PAGE_TTL': 0,
+    'PATHS': ('/api/recipes/', '/api/tags/', '/api/ingredients/'),
+}
+
+
+@override_settings(RESPONSE_CACHE=RESPONSE_CACHE)
+class AnonymousCacheTest(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        Tag.objects.create(name='Завтрак', slug='breakfast', color='#E26C2D')
+
+    def test_not_modified_until_version_bump(self):
+        response = self.client.get('/api/tags/')
+        etag = response['ETag']
+        self.assertIn('s-maxage=60', response['Cache-Control'])
+        response = self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_version()
+        response = self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_authorized_response_is_private(self):
+        response = self.client.get(
+            '/api/tags/', HTTP_AUTHORIZATION='Token invalid')
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('ETag', response)
+
+    def test_process_local_cache_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            check_shared_cache()
@@ -0,0 +1,57 @@
+from django.core.cache import caches
+from rest_framework.test import APITestCase
+
+from recipes.models import Recipe, ShoppingCart
+from users.models import Subscribe, User
+
+
+def make_user(number):
+    return User.objects.create(
+        email=f'user{number}@example.com', username=f'user{number}',
+        first_name='Имя', last_name='Фамилия')
+
+
+def make_recipe(author, number):
+    return Recipe.objects.create(
+        author=author, name=f'Рецепт {number}', text='Описание',
+        image=f'recipes/{number}.jpg', cooking_time=10)
+
+
+class PaginationCountTest(APITestCase):
+    """count и next сразу после записи, при кэше числа строк."""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.user = make_user(1)
+        self.author = make_user(2)
+        self.client.force_authenticate(self.user)
+
+    def test_shopping_cart_filter_after_add(self):
+        recipe = make_recipe(self.author, 1)
+        url = '/api/recipes/?is_in_shopping_cart=1'
+        self.assertEqual(self.client.get(url).data['count'], 0)
+        ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        response = self.client.get(url)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(
+            [item['id'] for item in response.data['results']], [recipe.id])
+
+    def test_subscriptions_after_subscribe(self):
+        url = '/api/users/subscriptions/'
+        self.assertEqual(self.client.get(url).data['count'], 0)
+        Subscribe.objects.create(user=self.user, author=self.author)
+        response = self.client.get(url)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_stale_count_does_not_cut_page(self):
+        make_recipe(self.author, 1)
+        url = '/api/recipes/?limit=1'
+        self.assertEqual(self.client.get(url).data['count'], 1)
+        make_recipe(self.author, 2)
+        response = self.client.get(url)
+        self.assertEqual(response.data['count'], 2)
+        self.assertIsNotNone(response.data['next'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
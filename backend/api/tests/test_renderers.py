@@ -0,0 +1,23 @@
+from django.test import SimpleTestCase
+
+from api.renderers import StreamingJSONRenderer
+
+
+class StreamingJSONRendererTest(SimpleTestCase):
+
+    def test_batches_joined_into_array(self):
+        body = b''.join(StreamingJSONRenderer().stream(
+            iter([[{'id': 1}], [], [{'id': 2}]])))
+        self.assertEqual(body, b'[{"id":1},{"id":2}]')
+
+    def test_error_mid_stream_is_raised(self):
+        def batches():
+            yield [{'id': 1}]
+            raise RuntimeError('сбой')
+
+        chunks = []
+        with self.assertLogs('api.renderers', 'ERROR'):
+            with self.assertRaises(RuntimeError):
+                for chunk in StreamingJSONRenderer().stream(batches()):
+                    chunks.append(chunk)
+        self.assertNotIn(b']', chunks)
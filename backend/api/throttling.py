@@ -0,0 +1,153 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from metrics.instruments import THROTTLE
+
+try:
+    from django_redis import get_redis_connection
+except ImportError:
+    get_redis_connection = None
+
+BUCKET_KEY = 'throttle:{}:{}'
+STATS_KEY = 'throttle-stats:{}:{}'
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Пополнение и списание корзины одной командой Redis: одновременные
+# запросы клиента из разных воркеров не превышают лимит. Отсутствующая
+# корзина считается полной; ключ живет, пока корзина не наполнится.
+# Ответ - строка: числа Lua Redis округляет до целых.
+TAKE_TOKEN = """
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * refill)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / refill
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / refill * 1000))
+return tostring(wait)
+"""
+_local_lock = threading.Lock()
+_take_token_script = None
+
+
+def get_cache():
+    return caches[settings.THROTTLE['ALIAS']]
+
+
+def parse_rate(rate):
+    """'10/min' -> (емкость корзины, пополнение в секунду)."""
+    count, period = rate.split('/')
+    count = int(count)
+    return count, count / PERIODS[period[0]]
+
+
+def redis_client():
+    """Клиент Redis кэша THROTTLE['ALIAS']; None, если кэш не Redis."""
+    if get_redis_connection is None:
+        return None
+    try:
+        return get_redis_connection(settings.THROTTLE['ALIAS'])
+    except NotImplementedError:
+        return None
+
+
+def token_script(client):
+    global _take_token_script
+    if _take_token_script is None:
+        _take_token_script = client.register_script(TAKE_TOKEN)
+    return _take_token_script
+
+
+def take_token(key, capacity, refill, now):
+    """Взять жетон из корзины; вернуть 0 или сколько секунд ждать.
+
+    В Redis - атомарным скриптом TAKE_TOKEN. Другой кэш (LocMemCache при
+    разработке) общий только для потоков процесса: корзина меняется под
+    блокировкой процесса.
+    """
+    cache = get_cache()
+    client = redis_client()
+    if client is not None:
+        return float(token_script(client)(
+            keys=[cache.make_key(key)], args=[capacity, refill, now],
+            client=client))
+    with _local_lock:
+        tokens, updated = cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + max(0, now - updated) * refill)
+        wait = 0 if tokens >= 1 else (1 - tokens) / refill
+        if not wait:
+            tokens -= 1
+        cache.set(key, (tokens, now), math.ceil(capacity / refill))
+    return wait
+
+
+def record(cache, scope, outcome):
+    THROTTLE.labels(scope, outcome).inc()
+    key = STATS_KEY.format(scope, outcome)
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+
+def throttle_stats():
+    """Счетчики пропущенных и отклоненных запросов по областям."""
+    scopes = api_settings.DEFAULT_THROTTLE_RATES
+    keys = [STATS_KEY.format(scope, outcome)
+            for scope in scopes for outcome in ('allowed', 'throttled')]
+    values = get_cache().get_many(keys)
+    return {
+        scope: {
+            outcome: values.get(STATS_KEY.format(scope, outcome), 0)
+            for outcome in ('allowed', 'throttled')
+        }
+        for scope in scopes
+    }
+
+
+class ScopedTokenBucketThrottle(BaseThrottle):
+    """Token bucket на пользователя (аноним - на IP) и область действия.
+
+    Область берется из throttle_scopes вьюсета по имени action; действия
+    без области не ограничиваются. Лимиты - DEFAULT_THROTTLE_RATES.
+    """
+    timer = time.time
+
+    def get_scope(self, view):
+        scopes = getattr(view, 'throttle_scopes', {})
+        return scopes.get(getattr(view, 'action', None))
+
+    def allow_request(self, request, view):
+        self.wait_time = 0
+        scope = self.get_scope(view)
+        if scope is None:
+            return True
+        capacity, refill = parse_rate(
+            api_settings.DEFAULT_THROTTLE_RATES[scope])
+        user = request.user
+        ident = (f'user-{user.pk}' if user and user.is_authenticated
+                 else self.get_ident(request))
+        now = self.timer()
+        self.wait_time = take_token(
+            BUCKET_KEY.format(scope, ident), capacity, refill, now)
+        record(get_cache(), scope,
+               'throttled' if self.wait_time else 'allowed')
+        return not self.wait_time
+
+    def wait(self):
+        return self.wait_time
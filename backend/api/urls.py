@@ -1,7 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import IngredientViewSet, RecipeViewSet, TagViewSet, UsersViewSet
+from .views import (HealthView, IngredientViewSet, JobViewSet, RecipeViewSet,
+                    TagViewSet, UsersViewSet)
 
 v1_router = DefaultRouter()
 v1_router.register(
@@ -24,9 +25,15 @@ v1_router.register(
     IngredientViewSet,
     basename='ingredients'
 )
+v1_router.register(
+    r'jobs',
+    JobViewSet,
+    basename='jobs'
+)
 
 
 urlpatterns = [
+    path('health/', HealthView.as_view(), name='health'),
     path('', include(v1_router.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
@@ -1,3 +1,6 @@
+
+from django.conf import settings
+from django.db import DatabaseError, connection
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
@@ -8,23 +11,37 @@ from rest_framework.permissions import (SAFE_METHODS, AllowAny,
                                         IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
-from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
+from rest_framework.views import APIView
+from rest_framework.mixins import RetrieveModelMixin
+from rest_framework.viewsets import (GenericViewSet, ModelViewSet,
+                                     ReadOnlyModelViewSet)
 
-from recipes.models import (Component, FavoriteRecipe, Ingredient, Recipe,
-                            ShoppingCart, Tag)
+from foodgram.db.pool import pool_stats
+from jobs.models import Job
+from jobs.queue import enqueue
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe, ShoppingCart,
+                            Tag)
+from recipes.purge import delete_recipes, delete_user
+from recipes.shopping_list import (build_shopping_list, shopping_list_digest,
+                                   shopping_list_rows)
 from users.models import Subscribe, User
 
+from .downloads import protected_file_response
 from .filters import IngredientFilter, RecipeFilter
+from .middleware import load_shedding_stats
+from .mixins import CachedPageMixin, StreamingListMixin
 from .paginators import PagePagination
 from .permissions import IsAdminIsAuthorOrReadOnly
 from .serializers import (FavoriteRecipeSerializer, IngredientSerializer,
-                          RecipeCreateUpdateSerializer, RecipeSerializer,
-                          ShoppingCartSerializer, SubscribeSerializer,
-                          SubscriptionSerializer, TagSerializer,
-                          UserSerializer)
+                          JobSerializer, RecipeCreateUpdateSerializer,
+                          RecipeSerializer, RecipeShortSerializer,
+                          ShoppingCartSerializer, ShoppingListItemSerializer,
+                          SubscribeSerializer, SubscriptionSerializer,
+                          TagSerializer, UserSerializer)
+from .throttling import throttle_stats
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(StreamingListMixin, ReadOnlyModelViewSet):
     """Вьюсет для тегов."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
@@ -32,7 +49,7 @@ class TagViewSet(ReadOnlyModelViewSet):
     pagination_class = None
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(StreamingListMixin, ReadOnlyModelViewSet):
     """Вьюсет для ингредиентов."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -42,7 +59,7 @@ class IngredientViewSet(ReadOnlyModelViewSet):
     pagination_class = None
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(CachedPageMixin, ModelViewSet):
     """Вьюсет для рецептов."""
     queryset = Recipe.objects.all()
     filter_backends = (DjangoFilterBackend,)
@@ -50,19 +67,39 @@ class RecipeViewSet(ModelViewSet):
     permission_classes = (IsAdminIsAuthorOrReadOnly,)
     pagination_class = PagePagination
     http_method_names = ['get', 'post', 'patch', 'delete']
+    throttle_scopes = {
+        'create': 'uploads',
+        'partial_update': 'uploads',
+        'favorite': 'toggles',
+        'shopping_cart': 'toggles',
+        'download_shopping_cart': 'exports',
+    }
+
+    def get_queryset(self):
+        if self.action != 'list':
+            return self.queryset
+        if settings.FAST_SERIALIZATION:
+            # Представления страницы собираются по id в api.fastpath.
+            return self.queryset.only('id')
+        return self.queryset.select_related('author').prefetch_related(
+            'tags', 'components__ingredient')
 
     def get_serializer_class(self):
-        if self.action in SAFE_METHODS:
+        if self.request.method in SAFE_METHODS:
             return RecipeSerializer
         return RecipeCreateUpdateSerializer
 
+    def perform_destroy(self, instance):
+        delete_recipes([instance.id])
+
     def _handler_post_request(
             self, request=None, serializer=None,
-            user=None, recipe=None):
+            user=None, recipe=None, extra=None):
         """Обработчик POST-запросов."""
         serializer = serializer(data={
             'user': user.id,
             'recipe': recipe.id,
+            **(extra or {}),
         }, context={'request': request})
         serializer.is_valid(raise_exception=True)
         serializer.save(user=user, recipe=recipe)
@@ -84,6 +121,21 @@ class RecipeViewSet(ModelViewSet):
             status=status.HTTP_204_NO_CONTENT
         )
 
+    @action(detail=True, methods=['get'], pagination_class=None)
+    def similar(self, request, pk=None):
+        """Рецепты, которые добавляют вместе с этим.
+
+        Один запрос по индексу (recipe, -score) таблицы похожих рецептов,
+        заполняемой заданием recipes.update_similar. Для несуществующего
+        рецепта - 404, а не пустой список.
+        """
+        recipe = self.get_object()
+        recipes = Recipe.objects.filter(
+            similar_to__recipe_id=recipe.id
+        ).order_by('-similar_to__score')
+        return Response(RecipeShortSerializer(
+            recipes, many=True, context={'request': request}).data)
+
     @action(detail=True, methods=['post', 'delete'],
             permission_classes=[IsAuthenticated])
     def favorite(self, request, **kwargs):
@@ -108,14 +160,16 @@ class RecipeViewSet(ModelViewSet):
                 error_message='Рецепт не добавлялся в избранное.'
             )
 
-    @action(detail=True, methods=['post', 'delete'],
+    @action(detail=True, methods=['post', 'patch', 'delete'],
             permission_classes=[IsAuthenticated],
             pagination_class=None)
     def shopping_cart(self, request, **kwargs):
-        """Добавить/удалить рецепт из списка покупок."""
+        """Добавить/удалить рецепт из списка покупок, сменить порции."""
         recipe = get_object_or_404(Recipe, id=kwargs['pk'])
         user = request.user
         model = ShoppingCart
+        servings = {'servings': request.data['servings']} if (
+            'servings' in request.data) else None
 
         if request.method == 'POST':
             return self._handler_post_request(
@@ -123,8 +177,18 @@ class RecipeViewSet(ModelViewSet):
                 serializer=ShoppingCartSerializer,
                 user=user,
                 recipe=recipe,
+                extra=servings,
             )
 
+        if request.method == 'PATCH':
+            cart = get_object_or_404(model, user=user, recipe=recipe)
+            serializer = ShoppingCartSerializer(
+                cart, data=servings or {}, partial=True,
+                context={'request': request})
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+            return Response(serializer.data)
+
         if request.method == 'DELETE':
             return self._handler_delete_request(
                 recipe=recipe,
@@ -133,30 +197,40 @@ class RecipeViewSet(ModelViewSet):
                 error_message='Рецепт не добавлялся в корзину покупок.'
             )
 
+    @action(methods=['get'], detail=False,
+            permission_classes=[IsAuthenticated],
+            pagination_class=None)
+    def shopping_list(self, request):
+        """Сводный список покупок в JSON."""
+        rows = [
+            {'id': ingredient_id, 'name': name,
+             'measurement_unit': measurement_unit, 'amount': amount}
+            for ingredient_id, name, measurement_unit, amount
+            in shopping_list_rows(request.user)
+        ]
+        return Response(ShoppingListItemSerializer(rows, many=True).data)
+
     @action(methods=['get'], detail=False,
             permission_classes=[IsAuthenticated],
             pagination_class=None)
     def download_shopping_cart(self, request):
         """"Загрузить список покупок."""
         user = request.user
-        shopping_card = {}
-        ingredients = Component.objects.filter(recipe__shop_cart__user=user)
-        for ingredient in ingredients:
-            amount = ingredient.amount
-            name = ingredient.ingredient.name
-            measurement_unit = ingredient.ingredient.measurement_unit
-            if name not in shopping_card:
-                shopping_card[name] = {
-                    'measurement_unit': measurement_unit,
-                    'amount': amount
-                }
-            else:
-                shopping_card[name]['amount'] += amount
-        shopping_card = ([f"- {item}: {value['amount']} "
-                          f"{value['measurement_unit']}\n"
-                         for item, value in shopping_card.items()])
+        cart_size = ShoppingCart.objects.filter(user=user).count()
+        if cart_size > settings.SHOPPING_CART_EXPORT_THRESHOLD:
+            # Ключ по содержимому списка: после правки рецептов или
+            # ингредиентов файл формируется заново.
+            digest = shopping_list_digest(user)
+            task = enqueue(
+                'recipes.export_shopping_cart', {'user_id': user.id},
+                user=user, priority=10,
+                idempotency_key=f'shopping-list:{user.id}:{digest}')
+            return Response(
+                JobSerializer(task, context={'request': request}).data,
+                status=status.HTTP_202_ACCEPTED
+            )
         file_name = 'shopping_list.txt'
-        response = HttpResponse('===Foodgram===\n' + ''.join(shopping_card),
+        response = HttpResponse(build_shopping_list(user),
                                 'Content-Type: text/plain')
         response['Content-Disposition'] = f'attachment; filename={file_name}'
         return response
@@ -164,10 +238,14 @@ class RecipeViewSet(ModelViewSet):
 
 class UsersViewSet(UserViewSet):
     """Вьюсет для пользователей."""
-    queryset = User.objects.all()
+    queryset = User.objects.filter(deleted_at__isnull=True)
     serializer_class = UserSerializer
     permission_classes = (AllowAny,)
     add_serializer = SubscribeSerializer
+    throttle_scopes = {'subscribe': 'toggles'}
+    # Список только для текущего пользователя: число строк не кэшируется
+    # (api.paginators.count_cacheable).
+    private_list = False
 
     @action(methods=['get'], detail=False,
             permission_classes=(IsAuthenticated,),
@@ -182,10 +260,10 @@ class UsersViewSet(UserViewSet):
 
     @action(methods=['get'], detail=False,
             permission_classes=(IsAuthenticated,),
-            pagination_class=PagePagination)
+            pagination_class=PagePagination, private_list=True)
     def subscriptions(self, request):
         """Показать подписки пользователя."""
-        queryset = User.objects.filter(subscribing__user=request.user)
+        queryset = self.queryset.filter(subscribing__user=request.user)
         page = self.paginate_queryset(queryset)
         serializer = SubscribeSerializer(
             page, many=True,
@@ -198,7 +276,7 @@ class UsersViewSet(UserViewSet):
     def subscribe(self, request, id):
         """Подписаться/отписаться от автора."""
         user = self.request.user
-        author = get_object_or_404(User, id=id)
+        author = get_object_or_404(self.queryset, id=id)
         subscription = Subscribe.objects.filter(user=user, author=author)
 
         if request.method == 'POST':
@@ -218,3 +296,48 @@ class UsersViewSet(UserViewSet):
                 )
             subscription.delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def perform_destroy(self, instance):
+        delete_user(instance)
+
+
+class HealthView(APIView):
+    """Проверка доступности БД; статистика видна только админам."""
+    permission_classes = (AllowAny,)
+
+    def get(self, request):
+        data = {'database': 'ok'}
+        code = status.HTTP_200_OK
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except DatabaseError:
+            data['database'] = 'unavailable'
+            code = status.HTTP_503_SERVICE_UNAVAILABLE
+        if request.user.is_staff:
+            data['pool'] = pool_stats()
+            data['throttling'] = throttle_stats()
+            data['load_shedding'] = load_shedding_stats()
+        return Response(data, status=code)
+
+
+class JobViewSet(RetrieveModelMixin, GenericViewSet):
+    """Статус фоновой задачи пользователя и загрузка ее результата."""
+    serializer_class = JobSerializer
+    permission_classes = (IsAuthenticated,)
+    throttle_scopes = {'download': 'exports'}
+
+    def get_queryset(self):
+        return Job.objects.filter(user=self.request.user)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Скачать файл, подготовленный задачей."""
+        task = self.get_object()
+        if task.status != Job.DONE or not (task.result or {}).get('file'):
+            return Response(
+                {'errors': 'Файл еще не готов.'},
+                status=status.HTTP_409_CONFLICT
+            )
+        return protected_file_response(task.result['file'],
+                                       'shopping_list.txt')
@@ -6,6 +6,10 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from foodgram.startup import warm_up
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+os.environ.setdefault('ASYNC_READ_PATH', 'True')
 
 application = get_asgi_application()
+warm_up()
@@ -0,0 +1,57 @@
+"""Бэкенд PostgreSQL с проверкой соединений и необязательным пулом.
+
+Подключается через ENGINE = 'foodgram.db'. Дополнительные ключи
+в DATABASES['default']:
+    CONN_HEALTH_CHECKS - проверять постоянное соединение перед первым
+        запросом в рамках HTTP-запроса;
+    POOL - настройки внутрипроцессного пула (ENABLED, MIN_SIZE, MAX_SIZE,
+        TIMEOUT, MAX_IDLE).
+"""
+from django.db.backends.postgresql import base
+
+from .pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    health_check_pending = False
+    pooled_connection = (None, None)
+
+    @property
+    def pool(self):
+        options = self.settings_dict.get('POOL') or {}
+        if not options.get('ENABLED'):
+            return None
+        return get_pool(self.alias, options)
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        connection = pool.acquire(
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params)
+        )
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level)
+        self.pooled_connection = (pool, connection)
+        return connection
+
+    def _close(self):
+        pool, pooled = self.pooled_connection
+        if pooled is None or pooled is not self.connection:
+            return super()._close()
+        self.pooled_connection = (None, None)
+        pool.release(pooled, discard=self.errors_occurred)
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        if (self.connection is not None
+                and self.settings_dict.get('CONN_HEALTH_CHECKS')):
+            self.health_check_pending = True
+
+    def ensure_connection(self):
+        if self.connection is not None and self.health_check_pending:
+            self.health_check_pending = False
+            if not self.in_atomic_block and not self.is_usable():
+                self.close()
+        super().ensure_connection()
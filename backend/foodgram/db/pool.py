@@ -0,0 +1,150 @@
+"""Внутрипроцессный пул соединений с PostgreSQL."""
+import os
+import threading
+import time
+
+POOLS = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(Exception):
+    """Свободное соединение не появилось за отведенное время."""
+
+
+class ConnectionPool:
+    """Потокобезопасный LIFO-пул соединений psycopg2.
+
+    Соединения создаются лениво, не более max_size одновременно.
+    Лишние простаивающие соединения сверх min_size закрываются,
+    как только пролежали в пуле дольше max_idle секунд.
+    """
+
+    def __init__(self, min_size=1, max_size=10, timeout=5, max_idle=300):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle = []
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            'created': 0,
+            'reused': 0,
+            'returned': 0,
+            'discarded': 0,
+            'timeouts': 0,
+            'waited': 0,
+        }
+
+    def acquire(self, factory):
+        """Выдать соединение из пула или создать новое через factory."""
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                while self._idle:
+                    connection, _ = self._idle.pop()
+                    if connection.closed:
+                        self._stats['discarded'] += 1
+                        continue
+                    self._in_use += 1
+                    self._stats['reused'] += 1
+                    return connection
+                if self._in_use < self.max_size:
+                    self._in_use += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(
+                        f'Нет свободных соединений за {self.timeout} с.'
+                    )
+                self._stats['waited'] += 1
+                self._cond.wait(remaining)
+        try:
+            connection = factory()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats['created'] += 1
+        return connection
+
+    def release(self, connection, discard=False):
+        """Вернуть соединение в пул, откатив незавершенную транзакцию."""
+        if not discard and not connection.closed:
+            try:
+                if connection.get_transaction_status() != 0:
+                    connection.rollback()
+            except Exception:
+                discard = True
+        with self._cond:
+            self._in_use -= 1
+            if discard or connection.closed:
+                self._stats['discarded'] += 1
+                self._close_quietly(connection)
+            else:
+                self._stats['returned'] += 1
+                self._idle.append((connection, time.monotonic()))
+                self._prune()
+            self._cond.notify()
+
+    def _prune(self):
+        now = time.monotonic()
+        while (len(self._idle) > self.min_size
+               and now - self._idle[0][1] > self.max_idle):
+            connection, _ = self._idle.pop(0)
+            self._stats['discarded'] += 1
+            self._close_quietly(connection)
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """Закрыть все простаивающие соединения."""
+        with self._cond:
+            while self._idle:
+                connection, _ = self._idle.pop()
+                self._close_quietly(connection)
+
+    def stats(self):
+        with self._cond:
+            return {
+                **self._stats,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+            }
+
+
+def get_pool(alias, options):
+    """Пул для алиаса БД; после fork() каждый процесс заводит свой."""
+    key = (alias, os.getpid())
+    pool = POOLS.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = POOLS.get(key)
+            if pool is None:
+                pool = POOLS[key] = ConnectionPool(
+                    min_size=options.get('MIN_SIZE', 1),
+                    max_size=options.get('MAX_SIZE', 10),
+                    timeout=options.get('TIMEOUT', 5),
+                    max_idle=options.get('MAX_IDLE', 300),
+                )
+    return pool
+
+
+def pool_stats():
+    """Статистика пулов текущего процесса по алиасам БД."""
+    pid = os.getpid()
+    return {
+        alias: pool.stats()
+        for (alias, owner), pool in list(POOLS.items())
+        if owner == pid
+    }
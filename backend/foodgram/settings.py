@@ -34,18 +34,28 @@ INSTALLED_APPS = [
     'api.apps.ApiConfig',
     'recipes.apps.RecipesConfig',
     'users.apps.UsersConfig',
-    'sorl.thumbnail',
+    'jobs.apps.JobsConfig',
+    'metrics.apps.MetricsConfig',
     'djoser',
 ]
 
+# sorl-thumbnail проектом не используется; включается при необходимости.
+if os.getenv('THUMBNAILS', default='False') == 'True':
+    INSTALLED_APPS.append('sorl.thumbnail')
+
 MIDDLEWARE = [
+    'metrics.middleware.MetricsMiddleware',
+    'metrics.middleware.SlowQueryMiddleware',
+    'api.middleware.LoadSheddingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.AnonymousCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -68,6 +78,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+# Асинхронные вью чтения (api.async_views); включается в foodgram/asgi.py.
+ASYNC_READ_PATH = os.getenv('ASYNC_READ_PATH', default='False') == 'True'
+
 DATABASES = {
     'default': {
         'ENGINE': os.getenv('DB_ENGINE'),
@@ -75,10 +88,24 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
-        'PORT': os.getenv('DB_PORT')
+        'PORT': os.getenv('DB_PORT'),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=60)),
+        'CONN_HEALTH_CHECKS': os.getenv(
+            'DB_CONN_HEALTH_CHECKS', default='True') == 'True',
+        'POOL': {
+            'ENABLED': os.getenv('DB_POOL_ENABLED', default='False') == 'True',
+            'MIN_SIZE': int(os.getenv('DB_POOL_MIN_SIZE', default=1)),
+            'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', default=10)),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', default=5)),
+            'MAX_IDLE': float(os.getenv('DB_POOL_MAX_IDLE', default=300)),
+        },
     }
 }
 
+# При включенном пуле соединение возвращается в пул в конце каждого запроса.
+if DATABASES['default']['POOL']['ENABLED']:
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -95,13 +122,31 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 REST_FRAMEWORK = {
+    # Схемы OpenAPI; устаревшие CoreAPI-схемы (coreapi приходит
+    # зависимостью djoser) не используются.
+    'DEFAULT_SCHEMA_CLASS': 'rest_framework.schemas.openapi.AutoSchema',
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
 
+    # api.renderers.ORJSONRenderer - только orjson, без потоковой отдачи;
+    # rest_framework.renderers.JSONRenderer - стандартный рендерер.
+    'DEFAULT_RENDERER_CLASSES': [
+        os.getenv('JSON_RENDERER',
+                  default='api.renderers.StreamingJSONRenderer'),
+    ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+    ],
+    # Области задаются вьюсетам в throttle_scopes по имени action.
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.ScopedTokenBucketThrottle',
     ],
+    'DEFAULT_THROTTLE_RATES': {
+        'exports': os.getenv('THROTTLE_EXPORTS', default='10/min'),
+        'uploads': os.getenv('THROTTLE_UPLOADS', default='30/hour'),
+        'toggles': os.getenv('THROTTLE_TOGGLES', default='120/min'),
+    },
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
@@ -109,6 +154,156 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 6,
 }
 
+# Браузерный интерфейс DRF (шаблоны, формы) нужен только при разработке.
+if os.getenv('BROWSABLE_API', default=str(DEBUG)) == 'True':
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append(
+        'rest_framework.renderers.BrowsableAPIRenderer')
+
+# Общий кэш воркеров и фоновых задач (Redis в docker-compose.yml); без
+# CACHE_BACKEND - LocMemCache, только для разработки в одном процессе.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    }
+}
+
+# Кэш токенов на TTL секунд; ALIAS пустой - без кэша, токен проверяется
+# по БД. Нужен общий для воркеров кэш (не LocMemCache): иначе отозванный
+# токен принимают воркеры, не получившие сигнал сброса.
+AUTH_TOKEN_CACHE = {
+    'ALIAS': os.getenv('AUTH_TOKEN_CACHE_ALIAS', default=''),
+    'TTL': int(os.getenv('AUTH_TOKEN_CACHE_TTL', default=300)),
+}
+
+# Кэш id избранного, корзины и подписок пользователя; ALIAS пустой -
+# только в рамках запроса. Нужен общий для воркеров кэш (не LocMemCache).
+RELATIONS_CACHE = {
+    'ALIAS': os.getenv('RELATIONS_CACHE_ALIAS', default=''),
+    'TTL': int(os.getenv('RELATIONS_CACHE_TTL', default=600)),
+}
+
+# Кэширование анонимных ответов списков в nginx: Cache-Control с s-maxage
+# секунд (0 - выключено) для PATHS. ALIAS - общий для воркеров кэш
+# (не LocMemCache, иначе запуск прерывается) с версией рецептов
+# (recipes.versions) для ключей nginx,
+# ETag и ответов 304 и со страницами списка рецептов на PAGE_TTL секунд
+# (0 - не кэшировать, api.mixins.CachedPageMixin). Без ALIAS версии нет,
+# и по умолчанию nginx ничего не кэширует.
+RESPONSE_CACHE = {
+    'ALIAS': os.getenv('RESPONSE_CACHE_ALIAS', default=''),
+    'S_MAXAGE': int(os.getenv(
+        'RESPONSE_CACHE_S_MAXAGE',
+        default=60 if os.getenv('RESPONSE_CACHE_ALIAS') else 0)),
+    'PAGE_TTL': int(os.getenv('RESPONSE_CACHE_PAGE_TTL', default=300)),
+    'PATHS': ('/api/recipes/', '/api/tags/', '/api/ingredients/'),
+}
+
+# Метрики Prometheus на /metrics (см. metrics.instruments); для суммы по
+# воркерам gunicorn задайте PROMETHEUS_MULTIPROC_DIR.
+METRICS = {
+    'ENABLED': os.getenv('METRICS_ENABLED', default='True') == 'True',
+}
+
+# Журнал медленных SQL-запросов с планами EXPLAIN (админка, SlowQuery):
+# не больше MAX_ENTRIES отпечатков, по SAMPLES замеров на перцентили.
+# Значения параметров (токены, почта) пишутся только при LOG_PARAMS.
+SLOW_QUERIES = {
+    'ENABLED': os.getenv('SLOW_QUERIES_ENABLED', default='True') == 'True',
+    'THRESHOLD_MS': float(os.getenv('SLOW_QUERIES_THRESHOLD_MS', default=200)),
+    'MAX_ENTRIES': int(os.getenv('SLOW_QUERIES_MAX_ENTRIES', default=500)),
+    'SAMPLES': int(os.getenv('SLOW_QUERIES_SAMPLES', default=200)),
+    'LOG_PARAMS': os.getenv('SLOW_QUERIES_LOG_PARAMS', default='False') == 'True',
+}
+
+# Число строк в ответах PagePagination: при ESTIMATE список без фильтров
+# больше EXACT_THRESHOLD строк считается по статистике PostgreSQL, точные
+# COUNT(*) общих списков кэшируются по фильтру на CACHE_TTL секунд (0 - без
+# кэша). Границы страницы от count не зависят.
+PAGINATION_COUNT = {
+    'ESTIMATE': os.getenv('PAGINATION_ESTIMATE', default='True') == 'True',
+    'EXACT_THRESHOLD': int(
+        os.getenv('PAGINATION_EXACT_THRESHOLD', default=10000)),
+    'CACHE_ALIAS': os.getenv('PAGINATION_COUNT_CACHE_ALIAS', default='default'),
+    'CACHE_TTL': int(os.getenv('PAGINATION_COUNT_CACHE_TTL', default=15)),
+}
+
+# Хеш-секционирование избранного, корзины и состава рецептов в PostgreSQL
+# (recipes.partitioning). Применяется миграцией recipes 0009 или командой
+# partition_tables; PARTITIONS = 0 - обычные таблицы.
+PARTITIONING = {
+    'ENABLED': os.getenv('PARTITIONING_ENABLED', default='False') == 'True',
+    'PARTITIONS': int(os.getenv('PARTITIONING_PARTITIONS', default=16)),
+}
+
+# Очистка удаленных рецептов и пользователей (recipes.purge): строк в одном
+# DELETE, пачек за запуск задания и задержка запуска после удаления, сек.
+PURGE = {
+    'BATCH_SIZE': int(os.getenv('PURGE_BATCH_SIZE', default=500)),
+    'MAX_BATCHES': int(os.getenv('PURGE_MAX_BATCHES', default=100)),
+    'DELAY': int(os.getenv('PURGE_DELAY', default=0)),
+}
+
+# Рецептов в одном UPDATE при пересчете пищевой ценности (recipes.rollups).
+ROLLUP_BATCH_SIZE = int(os.getenv('ROLLUP_BATCH_SIZE', default=500))
+
+# Похожие рецепты (recipes.recommendations): TOP_K соседей на рецепт,
+# не меньше MIN_SUPPORT общих пользователей; BLOCK_SIZE строк A^T A и
+# READ_CHUNK строк взаимодействий за раз ограничивают память задания.
+RECOMMENDATIONS = {
+    'TOP_K': int(os.getenv('RECOMMENDATIONS_TOP_K', default=10)),
+    'MIN_SUPPORT': int(os.getenv('RECOMMENDATIONS_MIN_SUPPORT', default=2)),
+    'BLOCK_SIZE': int(os.getenv('RECOMMENDATIONS_BLOCK_SIZE', default=2000)),
+    'READ_CHUNK': int(os.getenv('RECOMMENDATIONS_READ_CHUNK', default=50000)),
+}
+
+# Кэш ограничения частоты запросов (api.throttling): корзины жетонов и
+# счетчики для /api/health/. В Redis жетон берется атомарным скриптом;
+# с другим кэшем (LocMemCache) лимиты и счетчики - на процесс.
+THROTTLE = {
+    'ALIAS': os.getenv('THROTTLE_CACHE_ALIAS', default='default'),
+}
+
+# Сброс нагрузки (api.middleware.LoadSheddingMiddleware); 0 - выключен.
+# Лимит - на процесс: нужен воркер с потоками (GUNICORN_THREADS) или ASGI.
+LOAD_SHEDDING = {
+    'MAX_IN_FLIGHT': int(os.getenv('LOAD_SHEDDING_MAX_IN_FLIGHT', default=0)),
+    'RETRY_AFTER': int(os.getenv('LOAD_SHEDDING_RETRY_AFTER', default=1)),
+    # /recipes-version - подзапрос nginx для каждого списка (см. nginx.conf).
+    'EXEMPT_PATHS': ('/api/health/', '/admin/', '/recipes-version'),
+}
+
+# Сборка ответов чтения из .values() вместо полей ModelSerializer.
+FAST_SERIALIZATION = os.getenv('FAST_SERIALIZATION', default='True') == 'True'
+
+# Фоновые задачи (jobs). JOBS_EAGER - выполнять сразу, без воркеров.
+JOBS_EAGER = os.getenv('JOBS_EAGER', default='False') == 'True'
+JOBS_RETRY_DELAY = int(os.getenv('JOBS_RETRY_DELAY', default=10))
+# Задача без отметки воркера (jobs.queue.heartbeat) дольше этого времени
+# считается брошенной и возвращается в очередь.
+JOBS_LOCK_TIMEOUT = int(os.getenv('JOBS_LOCK_TIMEOUT', default=600))
+
+# Корзины больше порога выгружаются фоновой задачей.
+SHOPPING_CART_EXPORT_THRESHOLD = int(
+    os.getenv('SHOPPING_CART_EXPORT_THRESHOLD', default=50))
+
+# Сжатие ответов (api.middleware.CompressionMiddleware); brotli - если
+# установлен пакет Brotli.
+COMPRESSION = {
+    'ENABLED': os.getenv('COMPRESSION_ENABLED', default='True') == 'True',
+    'MIN_SIZE': int(os.getenv('COMPRESSION_MIN_SIZE', default=1024)),
+    'GZIP_LEVEL': int(os.getenv('COMPRESSION_GZIP_LEVEL', default=6)),
+    'BROTLI_QUALITY': int(os.getenv('COMPRESSION_BROTLI_QUALITY', default=5)),
+}
+
+# Префикс internal-location nginx, отдающего MEDIA_ROOT. Если задан,
+# защищенные файлы (выгрузки задач) отдает nginx по X-Accel-Redirect.
+X_ACCEL_REDIRECT_PREFIX = os.getenv('X_ACCEL_REDIRECT_PREFIX', default='')
+
+RECIPE_IMAGE_MAX_SIZE = int(os.getenv('RECIPE_IMAGE_MAX_SIZE', default=1280))
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'PASSWORD_RESET_CONFIRM_URL': 'set_password/{uid}/{token}',
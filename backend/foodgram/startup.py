@@ -0,0 +1,22 @@
+"""Подготовка процесса к обслуживанию запросов.
+
+warm_up() заранее загружает то, что иначе грузилось бы первым запросом.
+При gunicorn --preload warm_up выполняется один раз в мастере, и воркеры
+получают готовые модули после fork.
+"""
+
+
+def warm_up():
+    """Загрузить URLconf, вьюсеты и классы из настроек DRF.
+
+    Обращений к БД здесь нет: соединения не должны открываться до fork.
+    """
+    from django.urls import get_resolver
+    from rest_framework.settings import api_settings
+
+    get_resolver().reverse_dict
+    for setting in ('DEFAULT_RENDERER_CLASSES', 'DEFAULT_PARSER_CLASSES',
+                    'DEFAULT_AUTHENTICATION_CLASSES',
+                    'DEFAULT_PERMISSION_CLASSES', 'DEFAULT_FILTER_BACKENDS',
+                    'DEFAULT_PAGINATION_CLASS'):
+        getattr(api_settings, setting)
@@ -3,11 +3,19 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from metrics.views import metrics
+from recipes.views import recipes_version
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/', include('api.urls')),
+    path('api/', include(
+        'api.async_urls' if settings.ASYNC_READ_PATH else 'api.urls')),
+    path('recipes-version', recipes_version, name='recipes-version'),
 ]
 
+if settings.METRICS['ENABLED']:
+    urlpatterns.append(path('metrics', metrics, name='metrics'))
+
 if settings.DEBUG:
     urlpatterns += static(
         settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
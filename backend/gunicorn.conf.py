@@ -0,0 +1,40 @@
+"""Настройки gunicorn (читаются из рабочего каталога автоматически)."""
+import gc
+import os
+
+bind = os.getenv('GUNICORN_BIND', default='0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', default=3))
+# Больше одного потока - воркер gthread; без этого LoadSheddingMiddleware
+# не срабатывает: у синхронного воркера в работе один запрос.
+threads = int(os.getenv('GUNICORN_THREADS', default=1))
+# Приложение загружается и прогревается (foodgram.startup.warm_up) один
+# раз в мастере; воркеры получают его через fork и делят память с ним.
+preload_app = os.getenv('GUNICORN_PRELOAD', default='True') == 'True'
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', default=0))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', default=0))
+
+
+def on_starting(server):
+    # Файлы метрик прошлого запуска не должны попасть в сумму по воркерам.
+    from metrics.instruments import reset_multiprocess_dir
+    reset_multiprocess_dir()
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        # Объекты мастера уходят в постоянное поколение GC: сборщик в
+        # воркерах их не обходит и не размножает разделяемые страницы.
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if server.cfg.preload_app:
+        # Соединения, если мастер их открыл, воркерам не наследуются.
+        from django.db import connections
+        connections.close_all()
+
+
+def child_exit(server, worker):
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
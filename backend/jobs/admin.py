@@ -0,0 +1,15 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    empty_value_display = '-пусто-'
+    list_display = ('name', 'status', 'priority', 'attempts', 'user',
+                    'run_at', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'idempotency_key')
+    raw_id_fields = ('user',)
+
+
+admin.site.register(Job, JobAdmin)
@@ -0,0 +1,82 @@
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from prometheus_client import start_http_server
+
+from jobs.queue import claim, heartbeat, requeue_stale, run_job
+from metrics.instruments import get_registry, reset_multiprocess_dir
+
+
+def work(poll_interval, once):
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *args: stopping.append(True))
+    last_requeue = 0
+    while not stopping:
+        close_old_connections()
+        if time.monotonic() - last_requeue > 60:
+            requeue_stale()
+            last_requeue = time.monotonic()
+        task = claim()
+        if task is not None:
+            with heartbeat(task):
+                run_job(task)
+            continue
+        if once:
+            return
+        time.sleep(poll_interval)
+
+
+def supervise(processes):
+    """Дождаться воркеров, передав им SIGTERM или Ctrl+C родителя."""
+    def stop(*args):
+        # Воркер получает SIGTERM и выходит, закончив текущую задачу.
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        stop()
+        for process in processes:
+            process.join()
+
+
+class Command(BaseCommand):
+    help = 'Запуск воркеров фоновых задач.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2)
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и завершиться.')
+        parser.add_argument(
+            '--metrics-port', type=int, default=0,
+            help='Порт HTTP-сервера метрик Prometheus (0 - не запускать). '
+                 'Для суммы по процессам задайте PROMETHEUS_MULTIPROC_DIR.')
+
+    def handle(self, *args, **options):
+        args = (options['poll_interval'], options['once'])
+        reset_multiprocess_dir()
+        if options['metrics_port']:
+            start_http_server(options['metrics_port'],
+                              registry=get_registry())
+        if options['processes'] == 1:
+            work(*args)
+            return
+        # Соединения с БД не должны переходить в дочерние процессы.
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=work, args=args, daemon=True)
+            for _ in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f'Запущено воркеров: {len(processes)}')
+        supervise(processes)
@@ -0,0 +1,159 @@
+import logging
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from metrics.instruments import JOB_DURATION
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def job(name):
+    """Зарегистрировать функцию как обработчик задачи name.
+
+    Обработчик получает payload как именованные аргументы, а то, что он
+    вернет (JSON-совместимое значение), сохраняется в Job.result.
+    """
+    def decorator(func):
+        HANDLERS[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, user=None, priority=0,
+            idempotency_key=None, delay=0, max_attempts=3):
+    """Поставить задачу в очередь.
+
+    При повторе с тем же idempotency_key возвращается существующая задача;
+    упавшая задача при этом перезапускается. В режиме JOBS_EAGER задача
+    выполняется сразу после фиксации транзакции.
+    """
+    if name not in HANDLERS:
+        raise KeyError(f'Неизвестная задача: {name}')
+    fields = {
+        'name': name,
+        'payload': payload or {},
+        'user': user,
+        'priority': priority,
+        'max_attempts': max_attempts,
+        'run_at': timezone.now() + timedelta(seconds=delay),
+    }
+    if idempotency_key is None:
+        task = Job.objects.create(**fields)
+    else:
+        task = _get_or_create_idempotent(idempotency_key, fields)
+    if settings.JOBS_EAGER and task.status == Job.QUEUED:
+        transaction.on_commit(lambda: run_job(task))
+    return task
+
+
+def _get_or_create_idempotent(key, fields):
+    try:
+        with transaction.atomic():
+            task, created = Job.objects.get_or_create(
+                idempotency_key=key, defaults=fields)
+    except IntegrityError:
+        task, created = Job.objects.get(idempotency_key=key), False
+    if not created and task.status == Job.FAILED:
+        task.status = Job.QUEUED
+        task.attempts = 0
+        task.run_at = fields['run_at']
+        task.save(update_fields=('status', 'attempts', 'run_at'))
+    return task
+
+
+def claim():
+    """Взять в работу самую приоритетную готовую задачу.
+
+    SELECT ... FOR UPDATE SKIP LOCKED позволяет нескольким воркерам
+    разбирать очередь, не блокируя друг друга.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        task = Job.objects.select_for_update(skip_locked=True).filter(
+            status=Job.QUEUED, run_at__lte=now
+        ).order_by('-priority', 'run_at', 'id').first()
+        if task is None:
+            return None
+        task.status = Job.RUNNING
+        task.locked_at = now
+        task.attempts += 1
+        task.save(update_fields=('status', 'locked_at', 'attempts'))
+    return task
+
+
+def run_job(task):
+    """Выполнить задачу и записать результат или запланировать повтор."""
+    if task.status == Job.QUEUED:
+        task.status = Job.RUNNING
+        task.locked_at = timezone.now()
+        task.attempts += 1
+    start = time.perf_counter()
+    try:
+        result = HANDLERS[task.name](**task.payload)
+    except Exception:
+        task.error = traceback.format_exc()
+        logger.exception('Задача %s завершилась с ошибкой', task)
+        if task.attempts < task.max_attempts:
+            task.status = Job.QUEUED
+            task.run_at = timezone.now() + timedelta(
+                seconds=settings.JOBS_RETRY_DELAY * 2 ** (task.attempts - 1))
+        else:
+            task.status = Job.FAILED
+            task.finished_at = timezone.now()
+        outcome = 'retry' if task.status == Job.QUEUED else 'failed'
+    else:
+        task.status = Job.DONE
+        task.result = result
+        task.error = ''
+        task.finished_at = timezone.now()
+        outcome = 'done'
+    JOB_DURATION.labels(task.name, outcome).observe(
+        time.perf_counter() - start)
+    task.save()
+    return task
+
+
+@contextmanager
+def heartbeat(task):
+    """Продлевать locked_at задачи, пока она выполняется.
+
+    requeue_stale возвращает в очередь задачи без отметки дольше
+    JOBS_LOCK_TIMEOUT: живой воркер обновляет ее втрое чаще, и долгая
+    задача не запускается второй раз, пока идет первая.
+    """
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(settings.JOBS_LOCK_TIMEOUT / 3):
+                Job.objects.filter(pk=task.pk, status=Job.RUNNING).update(
+                    locked_at=timezone.now())
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def requeue_stale():
+    """Вернуть в очередь задачи воркеров, которые упали посреди работы."""
+    deadline = timezone.now() - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT)
+    return Job.objects.filter(
+        status=Job.RUNNING, locked_at__lt=deadline
+    ).update(status=Job.QUEUED, locked_at=None)
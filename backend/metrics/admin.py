@@ -0,0 +1,44 @@
+from django.contrib import admin
+
+from .models import SlowQuery
+
+
+class SlowQueryAdmin(admin.ModelAdmin):
+    empty_value_display = '-пусто-'
+    list_display = ('fingerprint_short', 'view', 'serializer', 'count',
+                    'mean', 'p50', 'p95', 'p99', 'max_ms', 'last_seen')
+    list_filter = ('view',)
+    search_fields = ('sql', 'view', 'serializer', 'origin')
+    readonly_fields = ('fingerprint', 'sql', 'params', 'view', 'serializer',
+                       'origin', 'plan', 'count', 'total_ms', 'max_ms',
+                       'mean', 'p50', 'p95', 'p99', 'samples', 'first_seen',
+                       'last_seen')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='Отпечаток')
+    def fingerprint_short(self, obj):
+        return obj.fingerprint[:12]
+
+    @admin.display(description='Среднее, мс')
+    def mean(self, obj):
+        return round(obj.mean_ms, 1)
+
+    @admin.display(description='p50, мс')
+    def p50(self, obj):
+        return obj.percentile(50)
+
+    @admin.display(description='p95, мс')
+    def p95(self, obj):
+        return obj.percentile(95)
+
+    @admin.display(description='p99, мс')
+    def p99(self, obj):
+        return obj.percentile(99)
+
+
+admin.site.register(SlowQuery, SlowQueryAdmin)
@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+from django.core.signals import request_finished
+from django.db.backends.signals import connection_created
+
+
+class MetricsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'metrics'
+    verbose_name = 'Метрики'
+
+    def ready(self):
+        from .middleware import install_dispatcher, save_slow_queries
+        connection_created.connect(install_dispatcher)
+        request_finished.connect(save_slow_queries)
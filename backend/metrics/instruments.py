@@ -0,0 +1,133 @@
+"""Метрики приложения в формате Prometheus.
+
+Значения копятся в памяти процесса. Если задана переменная окружения
+PROMETHEUS_MULTIPROC_DIR, каждый процесс пишет их в свои mmap-файлы в
+этом каталоге, а /metrics суммирует файлы всех воркеров; блокировок
+между процессами при этом нет.
+"""
+import os
+import threading
+import time
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+if MULTIPROC_DIR:
+    # Файлы значений создаются уже при объявлении метрик ниже.
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+JOB_BUCKETS = (.1, .5, 1, 5, 15, 60, 300, 900, 3600)
+
+REQUESTS = Counter(
+    'foodgram_http_requests_total',
+    'Ответы API по вью (вьюсет.действие), методу и статусу.',
+    ('view', 'method', 'status'))
+LATENCY = Histogram(
+    'foodgram_http_request_duration_seconds',
+    'Время обработки запроса, включая отдачу потокового тела.',
+    ('view', 'method'), buckets=LATENCY_BUCKETS)
+DB_QUERIES = Histogram(
+    'foodgram_db_queries_per_request',
+    'Число SQL-запросов на один запрос к API.',
+    ('view',), buckets=QUERY_BUCKETS)
+DB_TIME = Counter(
+    'foodgram_db_query_seconds_total',
+    'Суммарное время SQL-запросов по вью.',
+    ('view',))
+CACHE = Counter(
+    'foodgram_cache_requests_total',
+    'Обращения к кэшам приложения: result - hit или miss.',
+    ('cache', 'result'))
+JOB_DURATION = Histogram(
+    'foodgram_job_duration_seconds',
+    'Время выполнения фоновых задач; status - done, retry или failed.',
+    ('job', 'status'), buckets=JOB_BUCKETS)
+THROTTLE = Counter(
+    'foodgram_throttle_requests_total',
+    'Решения ScopedTokenBucketThrottle: allowed или throttled.',
+    ('scope', 'outcome'))
+SHED = Counter(
+    'foodgram_load_shed_total',
+    'Запросы, отклоненные LoadSheddingMiddleware (503).')
+
+
+class QueryTracker:
+    """execute_wrapper, считающий SQL-запросы и их время.
+
+    Запросы асинхронной вью идут из нескольких потоков сразу - счетчики
+    меняются под блокировкой.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            with self.lock:
+                self.duration += duration
+                self.count += 1
+
+
+def observe_request(view, method, status, duration, tracker):
+    REQUESTS.labels(view, method, status).inc()
+    LATENCY.labels(view, method).observe(duration)
+    DB_QUERIES.labels(view).observe(tracker.count)
+    DB_TIME.labels(view).inc(tracker.duration)
+
+
+def record_cache(name, hit):
+    CACHE.labels(name, 'hit' if hit else 'miss').inc()
+
+
+def view_label(request):
+    """Имя вью для меток: вьюсет.действие, класс вью или 'admin'."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    if 'admin' in match.namespaces:
+        return 'admin'
+    func = match.func
+    cls = getattr(func, 'cls', None) or getattr(func, 'view_class', None)
+    if cls is None:
+        return match.view_name or func.__name__
+    actions = getattr(func, 'actions', None)
+    if actions:
+        method = request.method.lower()
+        return f'{cls.__name__}.{actions.get(method, method)}'
+    return cls.__name__
+
+
+def get_registry():
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render():
+    """(тело, Content-Type) для ответа на запрос Prometheus."""
+    return generate_latest(get_registry()), CONTENT_TYPE_LATEST
+
+
+def reset_multiprocess_dir():
+    """Очистить каталог файлов метрик перед стартом процессов.
+
+    Вызывается один раз родительским процессом, пока воркеров нет:
+    файлы прошлого запуска иначе попали бы в сумму.
+    """
+    if not MULTIPROC_DIR:
+        return
+    for name in os.listdir(MULTIPROC_DIR):
+        if name.endswith('.db'):
+            os.remove(os.path.join(MULTIPROC_DIR, name))
@@ -0,0 +1,165 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from .instruments import QueryTracker, observe_request, view_label
+from .slow_queries import SlowQueryRecorder
+
+# execute_wrapper текущего запроса. Переменная контекста переходит и в
+# потоки sync_to_async, поэтому запросы асинхронных вью из потоков
+# исполнителя (api.async_views) тоже попадают в метрики.
+QUERY_WRAPPERS = ContextVar('query_wrappers', default=())
+# SlowQueryRecorder ответа, ждущий request_finished. Сигнал шлет закрытие
+# ответа в том же контексте (под ASGI - в потоке с копией контекста).
+PENDING_RECORDER = ContextVar('pending_slow_queries', default=None)
+
+
+def dispatch_query(execute, sql, params, many, context):
+    """execute_wrapper каждого соединения: обертки текущего запроса."""
+    for wrapper in QUERY_WRAPPERS.get():
+        execute = partial(wrapper, execute)
+    return execute(sql, params, many, context)
+
+
+def install_dispatcher(sender, connection, **kwargs):
+    """Обработчик connection_created: подключить dispatch_query."""
+    if dispatch_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(dispatch_query)
+
+
+def save_slow_queries(sender, **kwargs):
+    """Обработчик request_finished: записать медленные запросы ответа."""
+    recorder = PENDING_RECORDER.get()
+    if recorder is None:
+        return
+    PENDING_RECORDER.set(None)
+    recorder.save()
+    # Обработчик Django уже закрыл соединение этого запроса - закрываем
+    # открытое записью по тем же правилам (CONN_MAX_AGE). В транзакции
+    # (тесты) соединение не трогаем.
+    if not connection.in_atomic_block:
+        connection.close_if_unusable_or_obsolete()
+
+
+@contextmanager
+def query_wrapper(wrapper):
+    previous = QUERY_WRAPPERS.get()
+    QUERY_WRAPPERS.set(previous + (wrapper,))
+    try:
+        yield
+    finally:
+        QUERY_WRAPPERS.set(previous)
+
+
+class HybridMiddleware:
+    """Основа middleware для WSGI и ASGI.
+
+    Под ASGI цепочка остается асинхронной (__acall__), и запрос не
+    занимает поток, пока его не займет сама вью. Подклассы реализуют
+    call() и __acall__().
+    """
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.call(request)
+
+
+def wrapped_stream(content, wrapper, finish):
+    try:
+        with query_wrapper(wrapper):
+            yield from content
+    finally:
+        finish()
+
+
+def finish_response(response, wrapper, finish):
+    """Вызвать finish(response); у потокового ответа - после всего тела:
+    пачки списка читаются из БД уже во время отдачи."""
+    if response.streaming:
+        response.streaming_content = wrapped_stream(
+            response.streaming_content, wrapper, lambda: finish(response))
+    else:
+        finish(response)
+    return response
+
+
+def call_wrapped(get_response, request, wrapper, finish):
+    """Обработать запрос с оберткой SQL-запросов и вызвать finish."""
+    with query_wrapper(wrapper):
+        response = get_response(request)
+    return finish_response(response, wrapper, finish)
+
+
+async def acall_wrapped(get_response, request, wrapper, finish):
+    with query_wrapper(wrapper):
+        response = await get_response(request)
+    return finish_response(response, wrapper, finish)
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """Счетчики, время ответа и число SQL-запросов по вью."""
+
+    def __init__(self, get_response):
+        if not settings.METRICS['ENABLED']:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def start(self, request):
+        tracker = QueryTracker()
+        start = time.perf_counter()
+
+        def finish(response):
+            observe_request(
+                view_label(request), request.method, response.status_code,
+                time.perf_counter() - start, tracker)
+
+        return tracker, finish
+
+    def call(self, request):
+        return call_wrapped(self.get_response, request, *self.start(request))
+
+    async def __acall__(self, request):
+        return await acall_wrapped(
+            self.get_response, request, *self.start(request))
+
+
+class SlowQueryMiddleware(HybridMiddleware):
+    """Запись запросов дольше SLOW_QUERIES['THRESHOLD_MS'] в SlowQuery."""
+
+    def __init__(self, get_response):
+        self.options = settings.SLOW_QUERIES
+        if not self.options['ENABLED']:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def start(self, request):
+        recorder = SlowQueryRecorder(
+            request, self.options['THRESHOLD_MS'] / 1000)
+
+        def finish(response):
+            # Сервер закрывает ответ, когда тело уже отдано и счетчик
+            # запросов MetricsMiddleware снят; запись - по request_finished.
+            PENDING_RECORDER.set(recorder)
+
+        return recorder, finish
+
+    def call(self, request):
+        return call_wrapped(self.get_response, request, *self.start(request))
+
+    async def __acall__(self, request):
+        return await acall_wrapped(
+            self.get_response, request, *self.start(request))
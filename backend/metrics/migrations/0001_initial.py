@@ -0,0 +1,38 @@
+# Generated by Django 3.2.16 on 2026-10-19 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=40, unique=True, verbose_name='Отпечаток')),
+                ('sql', models.TextField(verbose_name='Запрос')),
+                ('params', models.TextField(blank=True, verbose_name='Параметры')),
+                ('view', models.CharField(blank=True, max_length=200, verbose_name='Вью')),
+                ('serializer', models.CharField(blank=True, max_length=200, verbose_name='Метод сериализатора')),
+                ('origin', models.CharField(blank=True, max_length=500, verbose_name='Место вызова')),
+                ('plan', models.TextField(blank=True, verbose_name='План (EXPLAIN)')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Срабатываний')),
+                ('total_ms', models.FloatField(default=0, verbose_name='Суммарное время, мс')),
+                ('max_ms', models.FloatField(default=0, verbose_name='Максимум, мс')),
+                ('samples', models.JSONField(default=list, verbose_name='Последние замеры, мс')),
+                ('first_seen', models.DateTimeField(auto_now_add=True, verbose_name='Впервые')),
+                ('last_seen', models.DateTimeField(db_index=True, verbose_name='Последний раз')),
+            ],
+            options={
+                'verbose_name': 'Медленный запрос',
+                'verbose_name_plural': 'Медленные запросы',
+                'ordering': ('-last_seen',),
+            },
+        ),
+    ]
@@ -0,0 +1,85 @@
+from django.db import models
+
+
+class SlowQuery(models.Model):
+    """Медленный SQL-запрос, сгруппированный по отпечатку.
+
+    Таблица ограничена SLOW_QUERIES['MAX_ENTRIES'] записями (давно не
+    встречавшиеся вытесняются), а samples хранит время последних
+    SLOW_QUERIES['SAMPLES'] срабатываний для перцентилей.
+    """
+    fingerprint = models.CharField(
+        verbose_name='Отпечаток',
+        max_length=40,
+        unique=True
+    )
+    sql = models.TextField(
+        verbose_name='Запрос'
+    )
+    params = models.TextField(
+        verbose_name='Параметры',
+        blank=True
+    )
+    view = models.CharField(
+        verbose_name='Вью',
+        max_length=200,
+        blank=True
+    )
+    serializer = models.CharField(
+        verbose_name='Метод сериализатора',
+        max_length=200,
+        blank=True
+    )
+    origin = models.CharField(
+        verbose_name='Место вызова',
+        max_length=500,
+        blank=True
+    )
+    plan = models.TextField(
+        verbose_name='План (EXPLAIN)',
+        blank=True
+    )
+    count = models.PositiveIntegerField(
+        verbose_name='Срабатываний',
+        default=0
+    )
+    total_ms = models.FloatField(
+        verbose_name='Суммарное время, мс',
+        default=0
+    )
+    max_ms = models.FloatField(
+        verbose_name='Максимум, мс',
+        default=0
+    )
+    samples = models.JSONField(
+        verbose_name='Последние замеры, мс',
+        default=list
+    )
+    first_seen = models.DateTimeField(
+        verbose_name='Впервые',
+        auto_now_add=True
+    )
+    last_seen = models.DateTimeField(
+        verbose_name='Последний раз',
+        db_index=True
+    )
+
+    class Meta:
+        ordering = ('-last_seen',)
+        verbose_name = 'Медленный запрос'
+        verbose_name_plural = 'Медленные запросы'
+
+    def __str__(self):
+        return f'{self.fingerprint[:12]} ({self.view or "-"})'
+
+    def percentile(self, percent):
+        """Перцентиль по последним замерам (ближайший ранг)."""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        rank = max(1, -(-len(ordered) * percent // 100))
+        return ordered[int(rank) - 1]
+
+    @property
+    def mean_ms(self):
+        return self.total_ms / self.count if self.count else 0
@@ -0,0 +1,201 @@
+"""Журнал медленных SQL-запросов.
+
+SlowQueryRecorder подключается как execute_wrapper (metrics.middleware) и
+запоминает запросы дольше порога вместе с вью, методом сериализатора и
+строкой кода, откуда они пришли. Записываются они после отдачи ответа
+(по сигналу request_finished): план EXPLAIN и запись в SlowQuery не
+должны попадать в транзакцию запроса, в его время и в число его
+SQL-запросов.
+
+Значения параметров могут содержать токены, почту и хеши паролей, поэтому
+по умолчанию сохраняются только их типы и длины (SLOW_QUERIES['LOG_PARAMS']).
+"""
+import hashlib
+import os
+import re
+import sys
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.serializers import BaseSerializer
+
+from .instruments import view_label
+from .models import SlowQuery
+
+EXPLAIN_STATEMENTS = ('select', 'with', 'update', 'delete')
+MAX_PARAMS_LENGTH = 2000
+SKIP_DIRS = (os.path.dirname(os.path.abspath(__file__)),)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s")
+_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """Запрос без значений: литералы и параметры заменяются на ?,
+    списки IN любой длины сворачиваются в (?+)."""
+    sql = _LITERALS.sub('?', sql)
+    sql = _LISTS.sub('(?+)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.sha1(normalize(sql).encode()).hexdigest()
+
+
+def find_origin(frame):
+    """(метод сериализатора, место вызова в коде проекта) для кадра."""
+    serializer = origin = ''
+    base_dir = settings.BASE_DIR
+    while frame is not None and not (serializer and origin):
+        code = frame.f_code
+        if not serializer:
+            owner = frame.f_locals.get('self')
+            if isinstance(owner, BaseSerializer):
+                serializer = f'{type(owner).__name__}.{code.co_name}'
+        if (not origin and code.co_filename.startswith(base_dir)
+                and not code.co_filename.startswith(SKIP_DIRS)):
+            path = os.path.relpath(code.co_filename, base_dir)
+            origin = f'{path}:{frame.f_lineno} in {code.co_name}'
+        frame = frame.f_back
+    return serializer, origin
+
+
+def explain(sql, params):
+    """План запроса без его выполнения; пустая строка, если нельзя."""
+    if not sql.lstrip().lower().startswith(EXPLAIN_STATEMENTS):
+        return ''
+    options = {'analyze': False} if connection.vendor == 'postgresql' else {}
+    try:
+        prefix = connection.ops.explain_query_prefix(**options)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            return '\n'.join(
+                ' '.join(str(value) for value in row)
+                for row in cursor.fetchall())
+    except Exception as error:
+        return f'EXPLAIN не удался: {error}'
+
+
+class SlowQueryRecorder:
+    """execute_wrapper, копящий запросы дольше порога до конца ответа.
+
+    Место вызова ищется обходом стека один раз на текст запроса: у
+    повторов в цикле (N+1) текст с плейсхолдерами тот же.
+    """
+
+    def __init__(self, request, threshold):
+        self.request = request
+        self.threshold = threshold
+        self.entries = []
+        self.origins = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            if duration >= self.threshold and not many:
+                self.add(sql, params, duration)
+
+    def add(self, sql, params, duration):
+        origin = self.origins.get(sql)
+        if origin is None:
+            origin = self.origins[sql] = find_origin(sys._getframe(2))
+        serializer, origin = origin
+        self.entries.append({
+            'sql': sql,
+            'params': params,
+            'duration_ms': duration * 1000,
+            'view': view_label(self.request),
+            'serializer': serializer,
+            'origin': origin,
+        })
+
+    def save(self):
+        for entry in self.entries:
+            record(entry)
+        self.entries = []
+
+
+def record(entry):
+    """Добавить срабатывание к записи отпечатка или создать ее.
+
+    EXPLAIN выполняется до блокировки строки и только если план нужен:
+    для новой записи или нового максимума времени (максимум не убывает,
+    так что под блокировкой он не окажется больше прочитанного).
+    """
+    options = settings.SLOW_QUERIES
+    key = fingerprint(entry['sql'])
+    duration = round(entry['duration_ms'], 3)
+    max_ms = SlowQuery.objects.filter(fingerprint=key).values_list(
+        'max_ms', flat=True).first()
+    plan = None
+    if max_ms is None or duration > max_ms:
+        plan = explain(entry['sql'], entry['params'])
+    with transaction.atomic():
+        query = SlowQuery.objects.select_for_update().filter(
+            fingerprint=key).first()
+        if query is not None:
+            add_sample(query, entry, duration, plan)
+            return
+    if plan is None:
+        plan = explain(entry['sql'], entry['params'])
+    try:
+        with transaction.atomic():
+            SlowQuery.objects.create(
+                fingerprint=key, sql=entry['sql'],
+                params=params_repr(entry['params']), view=entry['view'],
+                serializer=entry['serializer'], origin=entry['origin'],
+                plan=plan, count=1, total_ms=duration, max_ms=duration,
+                samples=[duration], last_seen=timezone.now())
+    except IntegrityError:
+        # Тот же отпечаток только что записал другой воркер.
+        return
+    evict(options['MAX_ENTRIES'])
+
+
+def add_sample(query, entry, duration, plan):
+    """Обновить заблокированную запись отпечатка."""
+    samples = (query.samples + [duration])[-settings.SLOW_QUERIES['SAMPLES']:]
+    fields = {'count': F('count') + 1,
+              'total_ms': F('total_ms') + duration,
+              'samples': samples,
+              'last_seen': timezone.now()}
+    if duration > query.max_ms and plan is not None:
+        fields.update(max_ms=duration,
+                      params=params_repr(entry['params']),
+                      view=entry['view'],
+                      serializer=entry['serializer'],
+                      origin=entry['origin'],
+                      plan=plan)
+    SlowQuery.objects.filter(pk=query.pk).update(**fields)
+
+
+def describe(value):
+    """Тип значения и длина строк и списков, без самого значения."""
+    name = type(value).__name__
+    if isinstance(value, (str, bytes, list, tuple)):
+        return f'{name}[{len(value)}]'
+    return name
+
+
+def params_repr(params):
+    if settings.SLOW_QUERIES['LOG_PARAMS']:
+        return repr(params)[:MAX_PARAMS_LENGTH]
+    if isinstance(params, dict):
+        described = (f'{key}: {describe(value)}'
+                     for key, value in params.items())
+    else:
+        described = (describe(value) for value in params or ())
+    return ', '.join(described)[:MAX_PARAMS_LENGTH]
+
+
+def evict(max_entries):
+    stale = SlowQuery.objects.order_by('-last_seen').values_list(
+        'pk', flat=True)[max_entries:]
+    SlowQuery.objects.filter(pk__in=list(stale)).delete()
@@ -0,0 +1,13 @@
+from django.http import HttpResponse
+
+from .instruments import render
+
+
+def metrics(request):
+    """Метрики в текстовом формате Prometheus.
+
+    nginx этот путь наружу не проксирует: Prometheus забирает метрики
+    напрямую с backend:8000.
+    """
+    body, content_type = render()
+    return HttpResponse(body, content_type=content_type)
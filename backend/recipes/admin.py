@@ -1,20 +1,70 @@
 from django.contrib import admin
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
+from . import rollups, shopping_list
 from .models import (Component, FavoriteRecipe, Ingredient, Recipe,
                      ShoppingCart, Tag)
+from .paginators import EstimatedCountPaginator
+from .purge import delete_recipes, schedule_purge
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Список без полного COUNT(*) и сортировки через JOIN.
+
+    ordering моделей связей идет по пользователю или рецепту, то есть
+    требует JOIN всей таблицы; в админке сортируем по id.
+    """
+    empty_value_display = '-пусто-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ('-id',)
+
+
+class SoftDeleteAdmin(admin.ModelAdmin):
+    """Удаление через recipes.purge: объекты скрываются сразу, связанные
+    строки удаляет фоновая очистка.
+
+    Страница подтверждения не собирает связанные объекты через Collector.
+    Модели с побочными эффектами удаления переопределяют soft_delete.
+    """
+
+    def soft_delete(self, objs):
+        self.model._base_manager.filter(
+            pk__in=[obj.pk for obj in objs]).update(deleted_at=timezone.now())
+        schedule_purge()
+
+    def get_deleted_objects(self, objs, request):
+        perms_needed = set()
+        if not self.has_delete_permission(request):
+            perms_needed.add(self.opts.verbose_name)
+        objs = list(objs)
+        return ([str(obj) for obj in objs],
+                {self.opts.verbose_name_plural: len(objs)}, perms_needed, [])
+
+    def delete_model(self, request, obj):
+        self.soft_delete([obj])
+
+    def delete_queryset(self, request, queryset):
+        self.soft_delete(queryset)
 
 
 class ComponentInline(admin.TabularInline):
     model = Component
     extra = 1
     min_num = 1
+    autocomplete_fields = ('ingredient',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('ingredient')
 
 
 class IngredientAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
-    list_display = ('name', 'measurement_unit')
+    list_display = ('name', 'measurement_unit', 'calories', 'cost')
     search_fields = ('name',)
-    list_filter = ('name', )
+    list_filter = ('measurement_unit',)
 
 
 class TagAdmin(admin.ModelAdmin):
@@ -23,34 +73,94 @@ class TagAdmin(admin.ModelAdmin):
     search_fields = ('name', 'slug',)
 
 
-class RecipeAdmin(admin.ModelAdmin):
-    empty_value_display = '-пусто-'
+class RecipeAdmin(SoftDeleteAdmin, LargeTableAdmin):
     list_display = ('name', 'author', 'in_favorite')
-    search_fields = ('name',)
-    list_filter = ('author', 'name', 'tags',)
+    list_select_related = ('author',)
+    search_fields = ('name', 'author__username')
+    list_filter = ('tags',)
+    autocomplete_fields = ('author', 'tags')
     inlines = [ComponentInline]
 
+    def get_queryset(self, request):
+        # Подзапрос считается только для строк страницы, в отличие от
+        # annotate(Count(...)), которому нужен GROUP BY всего списка.
+        favorites = FavoriteRecipe.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            total=Count('*')
+        ).values('total')
+        return super().get_queryset(request).annotate(
+            favorites_count=Coalesce(Subquery(favorites), 0))
+
+    @admin.display(description='В избранном',
+                   ordering='favorites_count')
     def in_favorite(self, obj):
-        return obj.favorite.count()
+        return obj.favorites_count
 
+    def save_formset(self, request, form, formset, change):
+        # Рецепт уже сохранен save_model: прежние порции - из формы.
+        if formset.model is not Component or not change:
+            return super().save_formset(request, form, formset, change)
+        recipe = form.instance
+        with shopping_list.editing_components(
+                [recipe.id],
+                {recipe.id: form.initial.get('servings', recipe.servings)}):
+            super().save_formset(request, form, formset, change)
 
-class ComponentAdmin(admin.ModelAdmin):
-    empty_value_display = '-пусто-'
+    def save_related(self, request, form, formsets, change):
+        # Состав сохраняется инлайном уже после самого рецепта.
+        super().save_related(request, form, formsets, change)
+        rollups.update_recipes([form.instance.id])
+
+    def soft_delete(self, objs):
+        delete_recipes([obj.id for obj in objs])
+
+
+class ComponentAdmin(LargeTableAdmin):
     list_display = ('recipe', 'ingredient', 'amount')
+    list_select_related = ('recipe', 'ingredient')
+    search_fields = ('recipe__name',)
+    autocomplete_fields = ('recipe', 'ingredient')
 
+    def save_model(self, request, obj, form, change):
+        recipe_ids = {obj.recipe_id}
+        if change:
+            recipe_ids.add(form.initial['recipe'])
+        with shopping_list.editing_components(recipe_ids):
+            super().save_model(request, obj, form, change)
 
-class FavoriteRecipeAdmin(admin.ModelAdmin):
-    empty_value_display = '-пусто-'
-    list_display = ('user', 'recipe')
-    search_fields = ('user',)
-    list_filter = ('user',)
+    def delete_model(self, request, obj):
+        with shopping_list.editing_components([obj.recipe_id]):
+            super().delete_model(request, obj)
 
+    def delete_queryset(self, request, queryset):
+        with shopping_list.editing_components(
+                queryset.values_list('recipe_id', flat=True)):
+            super().delete_queryset(request, queryset)
 
-class ShoppingCartAdmin(admin.ModelAdmin):
-    empty_value_display = '-пусто-'
+
+class FavoriteRecipeAdmin(LargeTableAdmin):
     list_display = ('user', 'recipe')
-    search_fields = ('user',)
-    list_filter = ('user',)
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__username', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
+
+
+class ShoppingCartAdmin(LargeTableAdmin):
+    list_display = ('user', 'recipe', 'servings')
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__username', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
+
+    def save_model(self, request, obj, form, change):
+        # Новую запись добавляет в список сигнал post_save; при правке
+        # прежняя запись вычитается, новая прибавляется.
+        super().save_model(request, obj, form, change)
+        if change and form.has_changed():
+            initial = form.initial
+            shopping_list.remove_recipe(
+                initial['user'], initial['recipe'], initial['servings'])
+            shopping_list.add_recipe(obj.user_id, obj.recipe_id, obj.servings)
 
 
 admin.site.register(Ingredient, IngredientAdmin)
@@ -0,0 +1,79 @@
+import gzip
+import json
+import sys
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from recipes.models import Component, Recipe
+
+
+def open_output(path):
+    if path == '-':
+        return sys.stdout.buffer
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wb')
+    return open(path, 'wb')
+
+
+def recipe_batches(chunk):
+    """Рецепты пачками по id (keyset), без OFFSET и без курсора на всю БД."""
+    last_id = 0
+    while True:
+        rows = list(Recipe.objects.filter(id__gt=last_id).order_by(
+            'id').values('id', 'name', 'text', 'cooking_time', 'servings',
+                         'pub_date', 'image', 'author__email')[:chunk])
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]['id']
+
+
+def batch_lines(rows):
+    recipe_ids = [row['id'] for row in rows]
+    tags = defaultdict(list)
+    for recipe_id, slug in Recipe.tags.through.objects.filter(
+            recipe_id__in=recipe_ids).order_by('tag__slug').values_list(
+            'recipe_id', 'tag__slug'):
+        tags[recipe_id].append(slug)
+    ingredients = defaultdict(list)
+    for recipe_id, name, unit, amount in Component.objects.filter(
+            recipe_id__in=recipe_ids).order_by('id').values_list(
+            'recipe_id', 'ingredient__name',
+            'ingredient__measurement_unit', 'amount'):
+        ingredients[recipe_id].append(
+            {'name': name, 'measurement_unit': unit, 'amount': amount})
+    for row in rows:
+        yield json.dumps({
+            'author': row['author__email'],
+            'name': row['name'],
+            'text': row['text'],
+            'cooking_time': row['cooking_time'],
+            'servings': row['servings'],
+            'pub_date': row['pub_date'].isoformat(),
+            'image': row['image'],
+            'tags': tags[row['id']],
+            'ingredients': ingredients[row['id']],
+        }, ensure_ascii=False).encode() + b'\n'
+
+
+class Command(BaseCommand):
+    help = ('Выгрузка рецептов в JSONL: по строке на рецепт с составом, '
+            'тегами и ссылкой на изображение.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл (.jsonl или .jsonl.gz), "-" - stdout.')
+        parser.add_argument('--chunk', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        output = open_output(options['path'])
+        count = 0
+        try:
+            for rows in recipe_batches(options['chunk']):
+                output.writelines(batch_lines(rows))
+                count += len(rows)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+        self.stderr.write(f'Выгружено рецептов: {count}')
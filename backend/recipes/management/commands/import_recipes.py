@@ -0,0 +1,289 @@
+import gzip
+import json
+import os
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from recipes import rollups, versions
+from recipes.models import Component, Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+MAX_AMOUNT = 32000
+# Диапазон PositiveSmallIntegerField: SQLite его не проверяет, поэтому
+# граница задана явно, а не берется из валидаторов поля.
+SMALLINT_MAX = 32767
+REQUIRED_FIELDS = ('author', 'name', 'text', 'cooking_time', 'image',
+                   'ingredients')
+
+
+def open_input(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def integer(value, field, maximum=SMALLINT_MAX):
+    # Валидаторы модели приводят 1.5 и True к int - тип проверяется здесь.
+    if isinstance(value, bool) or not isinstance(value, int) or (
+            value > maximum):
+        raise ValueError(f'недопустимое значение {field}: {value!r}')
+    return value
+
+
+def validate(model, values):
+    """Проверить значения валидаторами полей модели; ошибка - ValueError."""
+    instance = model(**values)
+    try:
+        instance.clean_fields(exclude=[
+            field.name for field in model._meta.fields
+            if field.name not in values])
+    except ValidationError as error:
+        raise ValueError('; '.join(
+            f'{field}: {" ".join(messages)}'
+            for field, messages in error.message_dict.items()))
+
+
+def parse_line(line):
+    """Разобрать и проверить строку выгрузки; ошибка - ValueError."""
+    data = json.loads(line)
+    if not isinstance(data, dict):
+        raise ValueError('ожидается объект рецепта')
+    missing = [field for field in REQUIRED_FIELDS if field not in data]
+    if missing:
+        raise ValueError(f'нет полей: {", ".join(missing)}')
+    integer(data['cooking_time'], 'cooking_time')
+    integer(data.setdefault('servings', 1), 'servings')
+    validate(Recipe, {field: data[field] for field in (
+        'name', 'text', 'image', 'cooking_time', 'servings')})
+    if not data['ingredients']:
+        raise ValueError('пустой состав')
+    seen = set()
+    for item in data['ingredients']:
+        key = (item['name'], item['measurement_unit'])
+        if key in seen:
+            raise ValueError(f'ингредиент повторяется: {key[0]}')
+        seen.add(key)
+        validate(Ingredient, {'name': key[0], 'measurement_unit': key[1]})
+        validate(Component, {'amount': integer(
+            item['amount'], 'amount', MAX_AMOUNT)})
+    if data.get('pub_date'):
+        data['pub_date'] = parse_datetime(data['pub_date'])
+    return data
+
+
+class Resolver:
+    """Имена -> id пачками с кешем на все время загрузки."""
+
+    def __init__(self):
+        self.authors = {}
+        self.tags = {}
+        self.ingredients = {}
+
+    def resolve_authors(self, emails):
+        missing = set(emails) - self.authors.keys()
+        if missing:
+            self.authors.update(User.objects.filter(
+                email__in=missing).values_list('email', 'id'))
+        return self.authors
+
+    def resolve_tags(self, slugs):
+        missing = set(slugs) - self.tags.keys()
+        if missing:
+            self.tags.update(Tag.objects.filter(
+                slug__in=missing).values_list('slug', 'id'))
+        return self.tags
+
+    def _fetch_ingredients(self, keys):
+        names = {name for name, _ in keys}
+        for pk, name, unit in Ingredient.objects.filter(
+                name__in=names).values_list('id', 'name', 'measurement_unit'):
+            if (name, unit) in keys:
+                self.ingredients[(name, unit)] = pk
+
+    def resolve_ingredients(self, keys):
+        """Найти ингредиенты, создав недостающие."""
+        missing = set(keys) - self.ingredients.keys()
+        if missing:
+            self._fetch_ingredients(missing)
+            missing -= self.ingredients.keys()
+        if missing:
+            Ingredient.objects.bulk_create(
+                (Ingredient(name=name, measurement_unit=unit)
+                 for name, unit in missing),
+                ignore_conflicts=True)
+            self._fetch_ingredients(missing)
+        return self.ingredients
+
+
+class Command(BaseCommand):
+    help = ('Загрузка рецептов из JSONL (формат export_recipes) пачками '
+            'с возможностью продолжить с контрольной точки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл .jsonl или .jsonl.gz.')
+        parser.add_argument(
+            '--chunk', type=int, default=1000,
+            help='Рецептов в одной транзакции.')
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки, по умолчанию <path>.checkpoint.')
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать сначала, игнорируя контрольную точку.')
+
+    def load_checkpoint(self, path):
+        try:
+            with open(path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def save_checkpoint(self, path, state):
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(state, file)
+        os.replace(tmp_path, path)
+
+    def handle(self, *args, **options):
+        checkpoint_path = (options['checkpoint']
+                           or f'{options["path"]}.checkpoint')
+        state = None if options['restart'] else self.load_checkpoint(
+            checkpoint_path)
+        if state is not None:
+            self.stderr.write(f'Продолжение со строки {state["line"] + 1}')
+        state = state or {'offset': 0, 'line': 0, 'imported': 0,
+                          'skipped': 0}
+        self.resolver = Resolver()
+        self.unknown_tags = set()
+        try:
+            file = open_input(options['path'])
+        except FileNotFoundError:
+            raise CommandError(f'Файл {options["path"]} не найден!')
+        with file:
+            file.seek(state['offset'])
+            self.load(file, state, options['chunk'], checkpoint_path)
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        # bulk_create не шлет сигналов, сбрасывающих кэш страниц рецептов:
+        # суммы пересчитаны в каждой пачке, версия меняется в конце.
+        if state['imported']:
+            versions.bump_version()
+        if self.unknown_tags:
+            self.stderr.write(
+                f'Неизвестные теги пропущены: '
+                f'{", ".join(sorted(self.unknown_tags))}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено рецептов: {state["imported"]}, '
+            f'пропущено: {state["skipped"]}'))
+
+    def load(self, file, state, chunk_size, checkpoint_path):
+        chunk = []
+        # Первая пачка запуска могла быть записана прошлым запуском
+        # уже после его последней контрольной точки.
+        dedupe = True
+        while True:
+            line = file.readline()
+            if line.strip():
+                state['line'] += 1
+                try:
+                    chunk.append((state['line'], parse_line(line)))
+                except (ValueError, KeyError, TypeError) as error:
+                    self.skip(state, state['line'], error)
+            if chunk and (not line or len(chunk) >= chunk_size):
+                state['imported'] += self.import_chunk(chunk, state, dedupe)
+                dedupe = False
+                chunk = []
+                state['offset'] = file.tell()
+                self.save_checkpoint(checkpoint_path, state)
+            if not line:
+                return
+
+    def skip(self, state, line_number, reason):
+        state['skipped'] += 1
+        self.stderr.write(f'Строка {line_number} пропущена: {reason}')
+
+    def import_chunk(self, chunk, state, dedupe=False):
+        """Записать пачку рецептов одной транзакцией."""
+        resolver = self.resolver
+        authors = resolver.resolve_authors(
+            data['author'] for _, data in chunk)
+        tags = resolver.resolve_tags(
+            slug for _, data in chunk for slug in data.get('tags', ()))
+        ingredients = resolver.resolve_ingredients({
+            (item['name'], item['measurement_unit'])
+            for _, data in chunk for item in data['ingredients']})
+        existing = set()
+        if dedupe:
+            existing = set(Recipe.objects.filter(
+                image__in=[data['image'] for _, data in chunk]
+            ).values_list('author_id', 'name', 'image'))
+        recipes, items = [], []
+        for line_number, data in chunk:
+            author_id = authors.get(data['author'])
+            if author_id is None:
+                self.skip(state, line_number,
+                          f'неизвестный автор {data["author"]}')
+                continue
+            if (author_id, data['name'], data['image']) in existing:
+                continue
+            recipes.append(Recipe(
+                author_id=author_id, name=data['name'], text=data['text'],
+                image=data['image'], cooking_time=data['cooking_time'],
+                servings=data['servings']))
+            items.append(data)
+        with transaction.atomic():
+            Recipe.objects.bulk_create(recipes)
+            self.fill_ids(recipes)
+            # auto_now_add перезаписывает дату при вставке - возвращаем
+            # дату из выгрузки отдельным обновлением.
+            dated = []
+            for recipe, data in zip(recipes, items):
+                if data.get('pub_date'):
+                    recipe.pub_date = data['pub_date']
+                    dated.append(recipe)
+            Recipe.objects.bulk_update(dated, ['pub_date'])
+            Component.objects.bulk_create(
+                Component(recipe_id=recipe.id,
+                          ingredient_id=ingredients[
+                              (item['name'], item['measurement_unit'])],
+                          amount=item['amount'])
+                for recipe, data in zip(recipes, items)
+                for item in data['ingredients'])
+            Recipe.tags.through.objects.bulk_create(
+                Recipe.tags.through(recipe_id=recipe.id, tag_id=tags[slug])
+                for recipe, data in zip(recipes, items)
+                for slug in self.known_tags(data.get('tags', ()), tags))
+            rollups.update_recipes(recipe.id for recipe in recipes)
+        return len(recipes)
+
+    def known_tags(self, slugs, tags):
+        for slug in slugs:
+            if slug in tags:
+                yield slug
+            else:
+                self.unknown_tags.add(slug)
+
+    def fill_ids(self, recipes):
+        """Не все СУБД возвращают id из bulk_create - дочитываем их.
+
+        Ключ (автор, название, картинка) не уникален: он повторяется и
+        внутри пачки, и у записанных раньше рецептов. Строки пачки
+        вставлены по порядку, поэтому последние id каждого ключа - ее,
+        и раздаются с конца.
+        """
+        if not recipes or recipes[0].pk is not None:
+            return
+        ids = defaultdict(list)
+        for pk, author_id, name, image in Recipe.objects.filter(
+                image__in=[recipe.image.name for recipe in recipes]
+        ).order_by('id').values_list('id', 'author_id', 'name', 'image'):
+            ids[(author_id, name, image)].append(pk)
+        for recipe in reversed(recipes):
+            recipe.pk = ids[(recipe.author_id, recipe.name,
+                             recipe.image.name)].pop()
@@ -1,25 +1,90 @@
 import csv
+import json
 import os
+from itertools import islice
 
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
-from recipes.models import Ingredient
+from django.db import transaction
+from jobs.queue import enqueue
+from recipes.models import ROLLUP_FIELDS, Ingredient
 
 FILE_ROOT = os.path.join(settings.BASE_DIR, 'data/ingredients.csv')
+COLUMNS = ('name', 'measurement_unit', *ROLLUP_FIELDS)
+BATCH_SIZE = 1000
+
+
+def read_rows(path):
+    """Строки файла как словари; CSV - без заголовка, в порядке COLUMNS."""
+    with open(path, 'r', encoding='utf-8') as file:
+        if path.endswith('.json'):
+            yield from json.load(file)
+        else:
+            for row in csv.reader(file):
+                yield dict(zip(COLUMNS, row))
+
+
+def parse_values(row):
+    """Заполненные поля пищевой ценности и стоимости строки.
+
+    Пустое значение не стирает уже загруженное.
+    """
+    values = {}
+    for field in ROLLUP_FIELDS:
+        value = row.get(field)
+        if value not in (None, ''):
+            values[field] = float(value)
+    return values
 
 
 class Command(BaseCommand):
-    help = 'Загрузка ингридиентов из csv файла.'
+    help = ('Загрузка ингридиентов из csv или json файла, в том числе '
+            'пищевой ценности и стоимости на единицу измерения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=FILE_ROOT)
+
+    def load_batch(self, batch):
+        """Создать новые ингредиенты, обновить значения; вернуть id
+        ингредиентов с изменившимися значениями."""
+        rows = {(row['name'], row['measurement_unit']): parse_values(row)
+                for row in batch}
+        with transaction.atomic():
+            Ingredient.objects.bulk_create(
+                (Ingredient(name=name, measurement_unit=unit, **values)
+                 for (name, unit), values in rows.items()),
+                ignore_conflicts=True)
+            changed = []
+            for ingredient in Ingredient.objects.filter(
+                    name__in={name for name, _ in rows}):
+                values = rows.get(
+                    (ingredient.name, ingredient.measurement_unit))
+                if not values or all(getattr(ingredient, field) == value
+                                     for field, value in values.items()):
+                    continue
+                for field, value in values.items():
+                    setattr(ingredient, field, value)
+                changed.append(ingredient)
+            Ingredient.objects.bulk_update(changed, ROLLUP_FIELDS)
+        return [ingredient.id for ingredient in changed]
 
     def handle(self, *args, **options):
         try:
-            with open(FILE_ROOT, 'r', encoding='utf-8') as file:
-                data = csv.reader(file)
-                for row in data:
-                    Ingredient.objects.get_or_create(
-                        name=row[0], measurement_unit=row[1])
-                self.stdout.write(
-                    self.style.SUCCESS('Данные успешно загружены!')
-                )
+            rows = read_rows(options['path'])
+            changed, total = [], 0
+            while True:
+                batch = list(islice(rows, BATCH_SIZE))
+                if not batch:
+                    break
+                changed += self.load_batch(batch)
+                total += len(batch)
         except FileNotFoundError:
-            raise CommandError('Файл ingredients.csv не найден!')
+            raise CommandError(f'Файл {options["path"]} не найден!')
+        except (KeyError, ValueError) as error:
+            raise CommandError(f'Неверные данные в файле: {error}')
+        if changed:
+            # Суммы рецептов пересчитывает воркер, по затронутым рецептам.
+            enqueue('recipes.update_rollups', {'ingredient_ids': changed})
+        self.stdout.write(self.style.SUCCESS(
+            f'Данные успешно загружены: {total} строк, '
+            f'изменены значения у {len(changed)} ингредиентов.'))
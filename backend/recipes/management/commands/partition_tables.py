@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.partitioning import set_partitions
+
+
+class Command(BaseCommand):
+    help = ('Хеш-секционирование избранного, корзины и состава рецептов '
+            'в PostgreSQL: пересоздает таблицы с данными под блокировкой.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--partitions', type=int,
+            default=settings.PARTITIONING['PARTITIONS'],
+            help='Число секций; 0 - вернуть обычные таблицы.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Секционирование доступно только в PostgreSQL.')
+        with transaction.atomic():
+            rebuilt = set_partitions(connection, options['partitions'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересозданы: {", ".join(rebuilt)}' if rebuilt
+            else 'Таблицы уже в нужном виде.'))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from jobs.queue import enqueue
+
+
+class Command(BaseCommand):
+    help = ('Пересчет похожих рецептов по совместному добавлению в '
+            'избранное и корзину (для запуска по расписанию).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать все рецепты, а не только затронутые.')
+        parser.add_argument(
+            '--enqueue', action='store_true',
+            help='Поставить задачу в очередь вместо выполнения здесь.')
+
+    def handle(self, *args, **options):
+        if options['enqueue']:
+            task = enqueue('recipes.update_similar',
+                           {'full': options['full']})
+            self.stdout.write(f'Задача поставлена в очередь: {task}')
+            return
+        from recipes.recommendations import update_similarities
+
+        start = time.perf_counter()
+        stats = update_similarities(full=options['full'])
+        stats['seconds'] = round(time.perf_counter() - start, 1)
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f'{key}: {value}' for key, value in stats.items())))
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.16 on 2026-10-19 17:21
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='servings',
+            field=models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)], verbose_name='Количество порций'),
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='servings',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Пусто - столько порций, сколько указано в рецепте.', null=True, validators=[django.core.validators.MinValueValidator(1)], verbose_name='Количество порций'),
+        ),
+        migrations.AlterField(
+            model_name='shoppinglistitem',
+            name='amount',
+            field=models.FloatField(verbose_name='Количество ингредиента'),
+        ),
+    ]
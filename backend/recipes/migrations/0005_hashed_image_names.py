@@ -0,0 +1,19 @@
+# Generated by Django 3.2.16 on 2026-10-19 17:32
+
+from django.db import migrations, models
+import recipes.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_servings'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(upload_to=recipes.models.recipe_image_path, verbose_name='Изображение'),
+        ),
+    ]
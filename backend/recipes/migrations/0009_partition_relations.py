@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.db import migrations
+
+from recipes.partitioning import set_partitions
+
+
+def partition(apps, schema_editor):
+    options = settings.PARTITIONING
+    if options['ENABLED']:
+        set_partitions(schema_editor.connection, options['PARTITIONS'])
+
+
+def unpartition(apps, schema_editor):
+    set_partitions(schema_editor.connection, 0)
+
+
+# Схема моделей не меняется: секции создаются только в базе и только при
+# PARTITIONING['ENABLED'] (см. recipes.partitioning). Операция не
+# elidable: при сжатии миграций база без секций должна их получить.
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition, unpartition),
+    ]
@@ -1,3 +1,6 @@
+import hashlib
+import os
+
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
 from django.db import models
@@ -7,6 +10,28 @@ MINIMAL_VALUE = 1
 User = get_user_model()
 
 
+def hashed_name(directory, filename, content):
+    """Имя файла по хешу содержимого: новое содержимое - новый URL.
+
+    Такие файлы nginx отдает с Cache-Control: immutable.
+    """
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    extension = os.path.splitext(filename)[1].lower()
+    return f'{directory}{digest.hexdigest()[:32]}{extension}'
+
+
+def recipe_image_path(instance, filename):
+    return hashed_name('recipes/', filename, instance.image.file)
+
+
+# Поля пищевой ценности и стоимости: у ингредиента - на единицу
+# измерения, у рецепта - сумма по составу (recipes.rollups).
+ROLLUP_FIELDS = ('calories', 'proteins', 'fats', 'carbohydrates', 'cost')
+
+
 class Ingredient(models.Model):
     """Модель ингредиента."""
     name = models.CharField(
@@ -19,6 +44,31 @@ class Ingredient(models.Model):
         max_length=20,
         blank=False
     )
+    calories = models.FloatField(
+        verbose_name='Калорийность на единицу, ккал',
+        null=True,
+        blank=True
+    )
+    proteins = models.FloatField(
+        verbose_name='Белки на единицу, г',
+        null=True,
+        blank=True
+    )
+    fats = models.FloatField(
+        verbose_name='Жиры на единицу, г',
+        null=True,
+        blank=True
+    )
+    carbohydrates = models.FloatField(
+        verbose_name='Углеводы на единицу, г',
+        null=True,
+        blank=True
+    )
+    cost = models.FloatField(
+        verbose_name='Стоимость единицы',
+        null=True,
+        blank=True
+    )
 
     class Meta:
         constraints = [
@@ -63,6 +113,14 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeManager(models.Manager):
+    """Рецепты без удаленных: удаление сразу скрывает рецепт, а строки
+    удаляет фоновая очистка (recipes.purge)."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Recipe(models.Model):
     """Модель рецепта."""
     author = models.ForeignKey(
@@ -77,7 +135,7 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         verbose_name='Изображение',
-        upload_to='recipes/'
+        upload_to=recipe_image_path
     )
     text = models.TextField(
         verbose_name='Описание рецепта'
@@ -97,13 +155,72 @@ class Recipe(models.Model):
         verbose_name='Время приготовления в минутах',
         validators=[MinValueValidator(MINIMAL_VALUE)]
     )
+    servings = models.PositiveSmallIntegerField(
+        verbose_name='Количество порций',
+        default=1,
+        validators=[MinValueValidator(MINIMAL_VALUE)]
+    )
     pub_date = models.DateTimeField(
         verbose_name='Дата публикации',
         auto_now_add=True
     )
+    # Суммы по составу на все порции; пусто, если хотя бы у одного
+    # ингредиента значение не задано.
+    calories = models.FloatField(
+        verbose_name='Калорийность, ккал',
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True
+    )
+    proteins = models.FloatField(
+        verbose_name='Белки, г',
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True
+    )
+    fats = models.FloatField(
+        verbose_name='Жиры, г',
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True
+    )
+    carbohydrates = models.FloatField(
+        verbose_name='Углеводы, г',
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True
+    )
+    cost = models.FloatField(
+        verbose_name='Стоимость',
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True
+    )
+    deleted_at = models.DateTimeField(
+        verbose_name='Дата удаления',
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True
+    )
+
+    objects = RecipeManager()
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ('-pub_date',)
+        # Лента идет по дате; фильтр по времени приготовления - диапазон
+        # по первому полю с уже отсортированными датами.
+        indexes = [
+            models.Index(fields=['-pub_date'], name='recipe_pub_date_idx'),
+            models.Index(fields=['cooking_time', '-pub_date'],
+                         name='recipe_cooking_time_idx'),
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -183,6 +300,13 @@ class ShoppingCart(models.Model):
         on_delete=models.CASCADE,
         related_name='shop_cart'
     )
+    servings = models.PositiveSmallIntegerField(
+        verbose_name='Количество порций',
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(MINIMAL_VALUE)],
+        help_text='Пусто - столько порций, сколько указано в рецепте.'
+    )
 
     class Meta:
         constraints = [
@@ -194,3 +318,102 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.recipe.name} - {self.user}'
+
+
+class ShoppingListItem(models.Model):
+    """Модель суммарного количества ингредиента в списке покупок.
+
+    Поддерживается инкрементально при изменении корзины и состава
+    рецептов (recipes.shopping_list).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент'
+    )
+    amount = models.FloatField(
+        verbose_name='Количество ингредиента'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item')]
+        ordering = ('user',)
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Список покупок'
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient.name} - {self.amount}'
+
+
+class RecipeSimilarity(models.Model):
+    """Модель похожего рецепта: его добавляют вместе с recipe.
+
+    Заполняется заданием recipes.update_similar (recipes.recommendations);
+    на рецепт хранится не больше RECOMMENDATIONS['TOP_K'] записей.
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similarities',
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField(
+        verbose_name='Сходство'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='unique_recipe_similarity')]
+        indexes = [
+            models.Index(fields=['recipe', '-score'],
+                         name='recipe_similarity_top_idx'),
+        ]
+        ordering = ('recipe', '-score')
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+
+    def __str__(self):
+        return f'{self.recipe_id} -> {self.similar_id} ({self.score:.3f})'
+
+
+class SimilarityDigest(models.Model):
+    """Отпечаток множества пользователей рецепта на момент расчета.
+
+    По изменившимся отпечаткам задание пересчитывает только затронутые
+    рецепты.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='similarity_digest',
+        verbose_name='Рецепт'
+    )
+    digest = models.BigIntegerField(
+        verbose_name='Отпечаток'
+    )
+
+    class Meta:
+        verbose_name = 'Отпечаток взаимодействий'
+        verbose_name_plural = 'Отпечатки взаимодействий'
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.digest}'
@@ -0,0 +1,59 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+ESTIMATE_SQL = """
+    SELECT sum(reltuples)::bigint FROM pg_class
+    WHERE relkind = 'r' AND reltuples >= 0 AND (
+        oid = %(table)s::regclass OR oid IN (
+            SELECT inhrelid FROM pg_inherits
+            WHERE inhparent = %(table)s::regclass))
+"""
+
+
+def estimated_count(model, using='default'):
+    """Оценка числа строк таблицы из статистики PostgreSQL (reltuples).
+
+    У секционированной таблицы строки лежат в секциях - оценки секций
+    складываются. None, если оценки нет: другая СУБД или таблица еще не
+    анализировалась (reltuples = -1).
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(ESTIMATE_SQL, {'table': model._meta.db_table})
+        row = cursor.fetchone()
+    if row is None or row[0] is None:
+        return None
+    return row[0]
+
+
+def filtered(queryset):
+    """Есть ли в запросе условия сверх фильтра менеджера по умолчанию.
+
+    Менеджер Recipe скрывает удаленные рецепты; их мало и они скоро
+    удаляются, так что оценка по всей таблице к такому списку подходит.
+    """
+    where = queryset.query.where
+    return bool(where) and (
+        where != queryset.model._default_manager.all().query.where)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Паджинатор для таблиц с миллионами строк.
+
+    Без фильтров COUNT(*) читает всю таблицу, поэтому число строк
+    берется из статистики планировщика. Точный подсчет остается для
+    отфильтрованных списков и небольших таблиц, где оценка неточна.
+    """
+    min_estimate = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not filtered(queryset):
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= self.min_estimate:
+                return estimate
+        return super().count
@@ -0,0 +1,116 @@
+"""Хеш-секционирование таблиц связей в PostgreSQL.
+
+Избранное и корзина секционируются по user_id, состав рецептов - по
+recipe_id: так запросы страницы (флаги текущего пользователя, состав
+рецептов страницы) читают одну секцию, а VACUUM и перестроение индексов
+идут по секциям, а не по всей таблице.
+
+Модели Django не меняются. Первичный ключ секционированной таблицы
+обязан включать ключ секционирования, поэтому в базе он составной
+(id, ключ); id по-прежнему выдается одной последовательностью и
+уникален. Уникальные ограничения моделей уже включают ключ.
+
+Без уникального ограничения на одном id внешний ключ на эти таблицы
+создать нельзя - сейчас на них никто не ссылается, новым моделям тоже
+нельзя. Поиск по одному id (админка, delete() модели) не отсекает
+секции и читает индекс каждой из них.
+"""
+# Таблица модели -> столбец ключа секционирования.
+PARTITION_KEYS = {
+    'recipes_favoriterecipe': 'user_id',
+    'recipes_shoppingcart': 'user_id',
+    'recipes_component': 'recipe_id',
+}
+
+CONSTRAINTS_SQL = """
+    SELECT conname, pg_get_constraintdef(oid)
+    FROM pg_constraint
+    WHERE conrelid = %s::regclass AND contype IN ('u', 'f')
+"""
+# Индексы, не принадлежащие ограничениям (первичный ключ, unique).
+INDEXES_SQL = """
+    SELECT pg_get_indexdef(i.indexrelid)
+    FROM pg_index AS i
+    WHERE i.indrelid = %s::regclass AND NOT EXISTS (
+        SELECT 1 FROM pg_constraint AS c WHERE c.conindid = i.indexrelid)
+"""
+PARTITIONS_SQL = """
+    SELECT count(*) FROM pg_inherits WHERE inhparent = %s::regclass
+"""
+
+
+def partition_count(cursor, table):
+    """Число секций таблицы; 0 - таблица не секционирована."""
+    cursor.execute(PARTITIONS_SQL, [table])
+    return cursor.fetchone()[0]
+
+
+def rebuild(connection, cursor, table, partitions):
+    """Пересоздать таблицу с partitions хеш-секциями (0 - обычной).
+
+    Данные копируются, имена ограничений и индексов сохраняются, чтобы
+    следующие миграции Django находили их как раньше. Выполняется в
+    транзакции миграции; таблица на это время заблокирована.
+    """
+    key = PARTITION_KEYS[table]
+    quoted = connection.ops.quote_name
+    cursor.execute(CONSTRAINTS_SQL, [table])
+    constraints = cursor.fetchall()
+    cursor.execute(INDEXES_SQL, [table])
+    indexes = [row[0] for row in cursor.fetchall()]
+    cursor.execute(
+        "SELECT pg_get_serial_sequence(%s, 'id')", [table])
+    sequence = cursor.fetchone()[0]
+
+    new = f'{table}_new'
+    partition_by = f' PARTITION BY HASH ({quoted(key)})' if partitions else ''
+    cursor.execute(
+        f'CREATE TABLE {quoted(new)} (LIKE {quoted(table)} '
+        f'INCLUDING DEFAULTS INCLUDING CONSTRAINTS){partition_by}')
+    for remainder in range(partitions):
+        cursor.execute(
+            f'CREATE TABLE {quoted(f"{new}_p{remainder}")} '
+            f'PARTITION OF {quoted(new)} FOR VALUES WITH '
+            f'(MODULUS {partitions}, REMAINDER {remainder})')
+    cursor.execute(f'INSERT INTO {quoted(new)} SELECT * FROM {quoted(table)}')
+    # Последовательность id принадлежит столбцу старой таблицы и иначе
+    # удалится вместе с ней.
+    cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY NONE')
+    cursor.execute(f'DROP TABLE {quoted(table)}')
+    cursor.execute(f'ALTER TABLE {quoted(new)} RENAME TO {quoted(table)}')
+    cursor.execute(
+        f'ALTER SEQUENCE {sequence} OWNED BY {quoted(table)}.{quoted("id")}')
+    # Секции старой таблицы удалены вместе с ней, имена свободны.
+    for remainder in range(partitions):
+        cursor.execute(
+            f'ALTER TABLE {quoted(f"{new}_p{remainder}")} RENAME TO '
+            f'{quoted(f"{table}_p{remainder}")}')
+
+    primary_key = ('id', key) if partitions else ('id',)
+    cursor.execute(
+        f'ALTER TABLE {quoted(table)} ADD CONSTRAINT '
+        f'{quoted(f"{table}_pkey")} PRIMARY KEY '
+        f'({", ".join(quoted(column) for column in primary_key)})')
+    for name, definition in constraints:
+        cursor.execute(
+            f'ALTER TABLE {quoted(table)} ADD CONSTRAINT {quoted(name)} '
+            f'{definition}')
+    for definition in indexes:
+        cursor.execute(definition)
+    cursor.execute(f'ANALYZE {quoted(table)}')
+
+
+def set_partitions(connection, partitions, tables=PARTITION_KEYS):
+    """Привести таблицы к partitions секциям; вернуть пересозданные.
+
+    На других СУБД ничего не делает.
+    """
+    if connection.vendor != 'postgresql':
+        return []
+    rebuilt = []
+    with connection.cursor() as cursor:
+        for table in tables:
+            if partition_count(cursor, table) != partitions:
+                rebuild(connection, cursor, table, partitions)
+                rebuilt.append(table)
+    return rebuilt
@@ -0,0 +1,147 @@
+"""Мягкое удаление рецептов и пользователей и фоновая очистка.
+
+Удаление через ORM сначала собирает в память все зависимые объекты
+(Collector) и удаляет их одной транзакцией: у активного автора это
+тысячи строк и секунды блокировок. Здесь удаление только ставит
+deleted_at - рецепт или пользователь сразу скрыт, - а задание
+recipes.purge_deleted удаляет строки снизу вверх по каскадным связям:
+DELETE ... WHERE id IN (...) не больше BATCH_SIZE строк за транзакцию.
+
+Сигналы pre_delete/post_delete при этом не отправляются; кому нужно
+знать об удалении (списки покупок, кэши), подписываются на pre_purge.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, models, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from jobs.queue import enqueue
+
+from . import shopping_list
+from .models import Recipe, ShoppingCart
+from .versions import bump_version
+
+User = get_user_model()
+
+# Отправляется перед удалением пачки строк sender с первичными ключами pks,
+# внутри транзакции удаления: строки еще на месте и заблокированы.
+pre_purge = Signal()
+
+
+def schedule_purge():
+    enqueue('recipes.purge_deleted', delay=settings.PURGE['DELAY'])
+
+
+def hide_recipes(recipes):
+    """Скрыть рецепты и сразу вычесть их из списков покупок.
+
+    Записи корзины со скрытыми рецептами очистка потом удаляет без
+    повторного вычитания (recipes.signals).
+    """
+    with transaction.atomic():
+        recipe_ids = list(recipes.select_for_update().values_list(
+            'id', flat=True))
+        shopping_list.remove_carts(ShoppingCart.objects.filter(
+            recipe_id__in=recipe_ids).values_list('id', flat=True))
+        Recipe.objects.filter(id__in=recipe_ids).update(
+            deleted_at=timezone.now())
+    bump_version()
+
+
+def delete_recipes(recipe_ids):
+    """Скрыть рецепты и поставить их удаление в очередь."""
+    hide_recipes(Recipe.objects.filter(id__in=recipe_ids))
+    schedule_purge()
+
+
+def delete_user(user):
+    """Деактивировать пользователя, скрыть его рецепты, удалить позже."""
+    user.deleted_at = timezone.now()
+    user.is_active = False
+    # save, а не update: по post_save сбрасываются токены в кэше.
+    user.save(update_fields=['deleted_at', 'is_active'])
+    hide_recipes(Recipe.objects.filter(author=user))
+    schedule_purge()
+
+
+def cascade_relations(model):
+    """Связи, по которым удаление строк model удаляет зависимые строки."""
+    relations = [
+        field for field in model._meta.get_fields(include_hidden=True)
+        if field.auto_created and not field.concrete
+        and (field.one_to_many or field.one_to_one)
+        and field.on_delete is models.CASCADE
+    ]
+    # Корзину - раньше состава: по составу уменьшаются списки покупок.
+    return sorted(relations,
+                  key=lambda field: field.related_model is not ShoppingCart)
+
+
+def delete_rows(model, pks):
+    """Удалить строки по первичному ключу без Collector; вернуть число.
+
+    Строки, заблокированные другим процессом очистки, пропускаются.
+    """
+    with transaction.atomic():
+        pks = list(model._base_manager.select_for_update(
+            skip_locked=True).filter(pk__in=pks).values_list('pk', flat=True))
+        if not pks:
+            return 0
+        pre_purge.send(sender=model, pks=pks)
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {quote(model._meta.db_table)} '
+                f'WHERE {quote(model._meta.pk.column)} IN '
+                f'({", ".join(["%s"] * len(pks))})', pks)
+    return len(pks)
+
+
+def purge_rows(model, pks, batch_size):
+    """Удалить строки pks и все зависящие от них, пачками.
+
+    False, если удалить все не удалось: часть строк держит или уже
+    удалила другая очистка. Тогда сами строки pks остаются до
+    следующего запуска.
+    """
+    for relation in cascade_relations(model):
+        children = relation.related_model._base_manager.filter(**{
+            f'{relation.field.attname}__in': pks}).values_list(
+                'pk', flat=True)
+        while True:
+            child_pks = list(children[:batch_size])
+            if not child_pks:
+                break
+            if not purge_rows(relation.related_model, child_pks,
+                              batch_size):
+                return False
+    return delete_rows(model, pks) == len(pks)
+
+
+def purge_model(model, batch_size, max_batches):
+    """(удалено строк model, закончена ли очистка model)."""
+    deleted = model._base_manager.filter(
+        deleted_at__isnull=False).order_by('deleted_at').values_list(
+            'pk', flat=True)
+    purged = 0
+    for _ in range(max_batches):
+        pks = list(deleted[:batch_size])
+        if not pks:
+            return purged, True
+        if not purge_rows(model, pks, batch_size):
+            return purged, False
+        purged += len(pks)
+    return purged, not deleted.exists()
+
+
+def purge_deleted():
+    """Удалить до MAX_BATCHES пачек рецептов и пользователей."""
+    options = settings.PURGE
+    result = {'done': True}
+    # Рецепты раньше пользователей: у удаленного автора они уже скрыты.
+    for name, model in (('recipes', Recipe), ('users', User)):
+        result[name], done = purge_model(
+            model, options['BATCH_SIZE'], options['MAX_BATCHES'])
+        result['done'] = result['done'] and done
+    return result
@@ -0,0 +1,268 @@
+"""Похожие рецепты по совместному добавлению в избранное и корзину.
+
+Взаимодействия - матрица A (пользователи x рецепты, 0/1) в формате CSR.
+Сходство рецептов i и j - косинус их столбцов:
+|U_i ∩ U_j| / sqrt(|U_i| * |U_j|), где числитель - элемент A^T A.
+A собирается по пачкам READ_CHUNK строк в индексы int32 и занимает
+память пропорционально числу взаимодействий; строки A^T A считаются
+блоками по BLOCK_SIZE рецептов, а не квадратом числа рецептов.
+
+Пересчет инкрементальный: для каждого рецепта хранится отпечаток
+множества его пользователей (SimilarityDigest). Пересчитываются рецепты
+с изменившимся отпечатком, рецепты, у которых с ними есть общие
+пользователи, и рецепты, у которых они уже записаны в похожих.
+Скрытые (удаленные) рецепты во взаимодействия не входят.
+
+Два пересчета одновременно не идут: в PostgreSQL их разделяет
+advisory-блокировка, второй запуск сразу завершается.
+
+Модуль импортирует numpy и scipy, поэтому подключается только внутри
+задания, а не при старте веб-воркера.
+"""
+from contextlib import contextmanager
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from scipy import sparse
+
+from .models import (FavoriteRecipe, RecipeSimilarity, ShoppingCart,
+                     SimilarityDigest)
+from .versions import bump_version
+
+MIX = np.uint64(0x9E3779B97F4A7C15)
+ID_CHUNK = 1000
+INTERACTIONS = (FavoriteRecipe, ShoppingCart)
+# Ключ pg_try_advisory_lock пересчета.
+LOCK_KEY = 0x5E11A1
+
+
+def read_columns(queryset, fields, chunk):
+    """Столбцы queryset.values_list пачками, в массивах int64."""
+    rows = queryset.values_list(*fields).iterator(chunk_size=chunk)
+    parts = []
+    while True:
+        batch = list(islice(rows, chunk))
+        if not batch:
+            break
+        parts.append(np.array(batch, dtype=np.int64))
+    if not parts:
+        return np.empty((0, len(fields)), dtype=np.int64)
+    return np.concatenate(parts)
+
+
+def interactions(model):
+    """Строки избранного или корзины с нескрытыми рецептами."""
+    return model.objects.filter(recipe__deleted_at__isnull=True)
+
+
+def distinct_ids(field, chunk):
+    """Отсортированные различные значения field в избранном и корзинах."""
+    return np.unique(np.concatenate([
+        read_columns(interactions(model).order_by(field).distinct(),
+                     (field,), chunk)[:, 0]
+        for model in INTERACTIONS
+    ]))
+
+
+def positions(ids, values):
+    """(индексы values в отсортированном ids в int32, маска найденных)."""
+    if not len(ids):
+        return (np.zeros(len(values), dtype=np.int32),
+                np.zeros(len(values), dtype=bool))
+    found = np.minimum(np.searchsorted(ids, values), len(ids) - 1)
+    return found.astype(np.int32), ids[found] == values
+
+
+def interaction_matrix(chunk):
+    """(A в CSR, id пользователей по строкам, id рецептов по столбцам).
+
+    Сначала читаются различные id пользователей и рецептов, затем пары
+    пачками переводятся в индексы int32: в памяти не бывает всех пар
+    в int64. Пары, появившиеся между чтениями, пропускаются - их учтет
+    следующий пересчет.
+    """
+    user_ids = distinct_ids('user_id', chunk)
+    recipe_ids = distinct_ids('recipe_id', chunk)
+    rows, columns = [], []
+    for model in INTERACTIONS:
+        pairs = interactions(model).order_by().values_list(
+            'user_id', 'recipe_id').iterator(chunk_size=chunk)
+        while True:
+            batch = np.array(list(islice(pairs, chunk)), dtype=np.int64)
+            if not len(batch):
+                break
+            batch_rows, known_users = positions(user_ids, batch[:, 0])
+            batch_columns, known_recipes = positions(recipe_ids, batch[:, 1])
+            known = known_users & known_recipes
+            rows.append(batch_rows[known])
+            columns.append(batch_columns[known])
+    rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int32)
+    columns = (np.concatenate(columns) if columns
+               else np.empty(0, dtype=np.int32))
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, columns)),
+        shape=(len(user_ids), len(recipe_ids)))
+    # Рецепт и в избранном, и в корзине - одно взаимодействие.
+    matrix.data[:] = 1
+    return matrix, user_ids, recipe_ids
+
+
+def column_digests(by_recipe, user_ids):
+    """Отпечаток множества пользователей каждого рецепта (int64).
+
+    Сумма перемешанных id не зависит от порядка, а число пользователей
+    отличает множества с совпавшей суммой. Столбец без пользователей
+    (пары удалили между чтениями) дает 0: reduceat идет только по
+    непустым столбцам.
+    """
+    counts = np.diff(by_recipe.indptr)
+    sums = np.zeros(len(counts), dtype=np.uint64)
+    filled = counts > 0
+    if filled.any():
+        mixed = user_ids[by_recipe.indices].astype(np.uint64) * MIX
+        mixed ^= mixed >> np.uint64(29)
+        sums[filled] = np.add.reduceat(mixed, by_recipe.indptr[:-1][filled])
+    return (sums ^ (counts.astype(np.uint64) * MIX)).view(np.int64)
+
+
+def changed_recipes(recipe_ids, digests, chunk):
+    """(индексы столбцов с новым отпечатком, id исчезнувших рецептов)."""
+    stored = read_columns(SimilarityDigest.objects.order_by('recipe_id'),
+                          ('recipe_id', 'digest'), chunk)
+    stored_ids, stored_digests = stored[:, 0], stored[:, 1]
+    positions = np.searchsorted(stored_ids, recipe_ids)
+    positions[positions >= len(stored_ids)] = 0
+    same = np.zeros(len(recipe_ids), dtype=bool)
+    if len(stored_ids):
+        same = ((stored_ids[positions] == recipe_ids)
+                & (stored_digests[positions] == digests))
+    gone = stored_ids[~np.isin(stored_ids, recipe_ids)]
+    return np.flatnonzero(~same), gone
+
+
+def recipes_listing(similar_ids):
+    """id рецептов, у которых в похожих есть similar_ids."""
+    found = set()
+    for start in range(0, len(similar_ids), ID_CHUNK):
+        found.update(RecipeSimilarity.objects.filter(
+            similar_id__in=similar_ids[start:start + ID_CHUNK].tolist()
+        ).values_list('recipe_id', flat=True))
+    return np.array(sorted(found), dtype=np.int64)
+
+
+def affected_rows(matrix, by_recipe, recipe_ids, dirty, gone):
+    """Индексы рецептов, строки сходства которых могли измениться."""
+    users = np.unique(by_recipe[dirty].indices)
+    neighbours = np.unique(matrix[users].indices)
+    listed = recipes_listing(np.concatenate([recipe_ids[dirty], gone]))
+    listed = np.flatnonzero(np.isin(recipe_ids, listed))
+    return np.union1d(np.union1d(dirty, neighbours), listed)
+
+
+def top_neighbours(counts, block, norms, top_k, min_support):
+    """[(строка, столбцы, сходство)] для строк блока A^T A."""
+    result = []
+    for offset, row in enumerate(block):
+        start, end = counts.indptr[offset], counts.indptr[offset + 1]
+        columns = counts.indices[start:end]
+        common = counts.data[start:end]
+        keep = (columns != row) & (common >= min_support)
+        columns, common = columns[keep], common[keep]
+        scores = common / (norms[row] * norms[columns])
+        if len(scores) > top_k:
+            best = np.argpartition(-scores, top_k)[:top_k]
+            columns, scores = columns[best], scores[best]
+        result.append((row, columns, scores))
+    return result
+
+
+def save_block(recipe_ids, neighbours):
+    with transaction.atomic():
+        RecipeSimilarity.objects.filter(recipe_id__in=[
+            int(recipe_ids[row]) for row, _, _ in neighbours]).delete()
+        RecipeSimilarity.objects.bulk_create((
+            RecipeSimilarity(recipe_id=int(recipe_ids[row]),
+                             similar_id=int(recipe_ids[column]),
+                             score=float(score))
+            for row, columns, scores in neighbours
+            for column, score in zip(columns, scores)
+        ), batch_size=ID_CHUNK)
+    return sum(len(columns) for _, columns, _ in neighbours)
+
+
+def save_digests(recipe_ids, digests, gone):
+    for start in range(0, len(recipe_ids), ID_CHUNK):
+        ids = recipe_ids[start:start + ID_CHUNK].tolist()
+        with transaction.atomic():
+            SimilarityDigest.objects.filter(recipe_id__in=ids).delete()
+            SimilarityDigest.objects.bulk_create(
+                SimilarityDigest(recipe_id=pk, digest=int(digest))
+                for pk, digest in zip(
+                    ids, digests[start:start + ID_CHUNK].tolist()))
+    for start in range(0, len(gone), ID_CHUNK):
+        ids = gone[start:start + ID_CHUNK].tolist()
+        RecipeSimilarity.objects.filter(recipe_id__in=ids).delete()
+        SimilarityDigest.objects.filter(recipe_id__in=ids).delete()
+
+
+@contextmanager
+def exclusive_run():
+    """True, если пересчет можно начать: другой сейчас не идет.
+
+    Блокировка сессионная и снимается на выходе; вне PostgreSQL
+    пересчеты не разделяются.
+    """
+    if connection.vendor != 'postgresql':
+        yield True
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_lock(%s)', [LOCK_KEY])
+        acquired = cursor.fetchone()[0]
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [LOCK_KEY])
+
+
+def update_similarities(full=False):
+    """Пересчитать похожие рецепты; full - все, а не только измененные.
+
+    Если пересчет уже идет, возвращает {'skipped': True}.
+    """
+    with exclusive_run() as acquired:
+        if not acquired:
+            return {'skipped': True}
+        return recompute(full)
+
+
+def recompute(full):
+    options = settings.RECOMMENDATIONS
+    matrix, user_ids, recipe_ids = interaction_matrix(options['READ_CHUNK'])
+    by_recipe = matrix.T.tocsr()
+    digests = column_digests(by_recipe, user_ids)
+    dirty, gone = changed_recipes(recipe_ids, digests, options['READ_CHUNK'])
+    if full:
+        rows = np.arange(len(recipe_ids))
+    else:
+        rows = affected_rows(matrix, by_recipe, recipe_ids, dirty, gone)
+    norms = np.sqrt(np.diff(by_recipe.indptr)).astype(np.float32)
+    written = 0
+    for start in range(0, len(rows), options['BLOCK_SIZE']):
+        block = rows[start:start + options['BLOCK_SIZE']]
+        counts = (by_recipe[block] @ matrix).tocsr()
+        written += save_block(recipe_ids, top_neighbours(
+            counts, block, norms, options['TOP_K'], options['MIN_SUPPORT']))
+    save_digests(recipe_ids[dirty], digests[dirty], gone)
+    if written or len(gone):
+        bump_version()
+    return {
+        'interactions': int(matrix.nnz),
+        'recipes': len(recipe_ids),
+        'changed': len(dirty) + len(gone),
+        'recomputed': len(rows),
+        'similarities': written,
+    }
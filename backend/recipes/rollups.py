@@ -0,0 +1,69 @@
+"""Пищевая ценность и стоимость рецептов по составу.
+
+Суммы хранятся в полях Recipe (ROLLUP_FIELDS) и пересчитываются только
+для затронутых рецептов: одним UPDATE с коррелированными подзапросами на
+пачку из ROLLUP_BATCH_SIZE рецептов.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import (Case, Count, F, FloatField, OuterRef, Subquery,
+                              Sum, When)
+
+from .models import ROLLUP_FIELDS, Component, Recipe
+from .units import format_amount
+from .versions import bump_version
+
+
+def rollup(field):
+    """Сумма amount * значение ингредиента по составу рецепта.
+
+    NULL, если значение задано не у всех ингредиентов: неполная сумма
+    в фильтре выглядела бы как настоящая.
+    """
+    return Subquery(
+        Component.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            rows=Count('id'),
+            known=Count(f'ingredient__{field}'),
+            total=Sum(F('amount') * F(f'ingredient__{field}'),
+                      output_field=FloatField()),
+        ).annotate(
+            value=Case(When(known=F('rows'), then=F('total')),
+                       output_field=FloatField())
+        ).values('value'),
+        output_field=FloatField())
+
+
+def update_recipes(recipe_ids):
+    """Пересчитать суммы рецептов; возвращает число обновленных."""
+    recipe_ids = iter(recipe_ids)
+    updated = 0
+    while True:
+        batch = list(islice(recipe_ids, settings.ROLLUP_BATCH_SIZE))
+        if not batch:
+            if updated:
+                bump_version()
+            return updated
+        updated += Recipe.objects.filter(id__in=batch).update(
+            **{field: rollup(field) for field in ROLLUP_FIELDS})
+
+
+def recipes_with_ingredients(ingredient_ids):
+    """id рецептов с этими ингредиентами, без загрузки всех в память."""
+    return Component.objects.filter(
+        ingredient_id__in=ingredient_ids
+    ).order_by('recipe_id').values_list(
+        'recipe_id', flat=True
+    ).distinct().iterator(chunk_size=settings.ROLLUP_BATCH_SIZE)
+
+
+def rollup_data(row, servings=None):
+    """Суммы для представления рецепта, с пересчетом на servings."""
+    factor = servings / row['servings'] if servings else 1
+    return {
+        field: None if row[field] is None else format_amount(
+            row[field] * factor)
+        for field in ROLLUP_FIELDS
+    }
@@ -0,0 +1,204 @@
+"""Инкрементально поддерживаемый список покупок пользователя.
+
+ShoppingListItem хранит сумму количества каждого ингредиента по всем
+рецептам в корзине. Добавление/удаление рецепта из корзины и правка
+состава рецепта применяют к таблице только разницу. Количество учитывает
+порции: рецепт в корзине с servings=N дает amount * N / Recipe.servings.
+"""
+import hashlib
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import ExpressionWrapper, F, FloatField, Min
+
+from .models import Component, Recipe, ShoppingCart, ShoppingListItem
+from .units import aggregate_canonical, format_amount
+
+
+# Остаток от вычитания дробных количеств, который считается нулем.
+EPSILON = 1e-6
+
+
+def scaled_amount(servings, amount='amount',
+                  recipe_servings='recipe__servings'):
+    """Выражение количества ингредиента на servings порций."""
+    return ExpressionWrapper(
+        F(amount) * float(servings) / F(recipe_servings),
+        output_field=FloatField())
+
+
+def servings_factor(servings, recipe_servings):
+    """Множитель порций записи корзины (None - как в рецепте)."""
+    if servings is None:
+        return 1
+    return servings / recipe_servings
+
+
+def recipe_amounts(recipe_id, servings=None):
+    components = Component.objects.filter(recipe_id=recipe_id)
+    amount = 'amount'
+    if servings is not None:
+        components = components.annotate(scaled=scaled_amount(servings))
+        amount = 'scaled'
+    return Counter(dict(components.values_list('ingredient_id', amount)))
+
+
+def locked_items(user_ids, ingredient_ids):
+    return {
+        (item.user_id, item.ingredient_id): item
+        for item in ShoppingListItem.objects.select_for_update().filter(
+            user_id__in=user_ids, ingredient_id__in=ingredient_ids)
+    }
+
+
+def apply_deltas(user_ids, deltas):
+    """Прибавить deltas {ingredient_id: количество} к спискам user_ids.
+
+    Недостающие строки сначала вставляются с нулем (конфликты с
+    параллельной вставкой игнорируются) и только потом блокируются:
+    SELECT FOR UPDATE не блокирует строки, которых еще нет.
+    """
+    deltas = {
+        key: value for key, value in deltas.items() if abs(value) > EPSILON}
+    user_ids = list(user_ids)
+    if not deltas or not user_ids:
+        return
+    with transaction.atomic():
+        existing = locked_items(user_ids, deltas)
+        missing = [
+            ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id,
+                             amount=0)
+            for user_id in user_ids
+            for ingredient_id, delta in deltas.items()
+            if delta > EPSILON and (user_id, ingredient_id) not in existing
+        ]
+        if missing:
+            ShoppingListItem.objects.bulk_create(
+                missing, ignore_conflicts=True)
+            existing = locked_items(user_ids, deltas)
+        to_update, to_delete = [], []
+        for user_id in user_ids:
+            for ingredient_id, delta in deltas.items():
+                item = existing.get((user_id, ingredient_id))
+                if item is None:
+                    continue
+                item.amount += delta
+                if item.amount > EPSILON:
+                    to_update.append(item)
+                else:
+                    to_delete.append(item.id)
+        ShoppingListItem.objects.bulk_update(to_update, ['amount'])
+        ShoppingListItem.objects.filter(id__in=to_delete).delete()
+
+
+def add_recipe(user_id, recipe_id, servings=None):
+    apply_deltas([user_id], recipe_amounts(recipe_id, servings))
+
+
+def remove_recipe(user_id, recipe_id, servings=None):
+    amounts = recipe_amounts(recipe_id, servings)
+    apply_deltas([user_id], {key: -value for key, value in amounts.items()})
+
+
+def remove_carts(cart_ids):
+    """Вычесть из списков записи корзины cart_ids (удаление без сигналов).
+
+    Записи одного рецепта с одинаковыми порциями вычитаются у всех их
+    пользователей одним apply_deltas.
+    """
+    users = defaultdict(list)
+    for user_id, recipe_id, servings in ShoppingCart.objects.filter(
+            id__in=cart_ids).values_list('user_id', 'recipe_id', 'servings'):
+        users[recipe_id, servings].append(user_id)
+    for (recipe_id, servings), user_ids in users.items():
+        amounts = recipe_amounts(recipe_id, servings)
+        apply_deltas(user_ids, {
+            key: -value for key, value in amounts.items()})
+
+
+def servings_changed(cart, old_servings):
+    """Пересчитать список после смены порций у записи корзины."""
+    old = recipe_amounts(cart.recipe_id, old_servings)
+    deltas = Counter(recipe_amounts(cart.recipe_id, cart.servings))
+    deltas.subtract(old)
+    apply_deltas([cart.user_id], deltas)
+
+
+def components_changed(recipe_id, old_amounts, new_amounts,
+                       old_servings=1, new_servings=1):
+    """Перенести правку рецепта в списки всех, у кого он в корзине.
+
+    Записи корзины группируются по числу порций: на каждую группу
+    разница считается один раз и применяется всем ее пользователям.
+    """
+    groups = defaultdict(list)
+    for user_id, servings in ShoppingCart.objects.filter(
+            recipe_id=recipe_id).values_list('user_id', 'servings'):
+        groups[servings].append(user_id)
+    ingredient_ids = set(old_amounts) | set(new_amounts)
+    for servings, user_ids in groups.items():
+        old_factor = servings_factor(servings, old_servings)
+        new_factor = servings_factor(servings, new_servings)
+        apply_deltas(user_ids, {
+            ingredient_id: (new_amounts.get(ingredient_id, 0) * new_factor
+                            - old_amounts.get(ingredient_id, 0) * old_factor)
+            for ingredient_id in ingredient_ids
+        })
+
+
+@contextmanager
+def editing_components(recipe_ids, old_servings=None):
+    """Перенести в списки покупок правку состава, сделанную в блоке.
+
+    Для правок мимо RecipeSerializer (админка). old_servings
+    {recipe_id: порции} - если порции рецепта сменились еще до блока.
+    Скрытые рецепты уже вычтены из списков и пропускаются.
+    """
+    recipe_ids = set(recipe_ids)
+    old_amounts = {
+        recipe_id: recipe_amounts(recipe_id) for recipe_id in recipe_ids}
+    yield
+    old_servings = old_servings or {}
+    for recipe_id, servings in Recipe.objects.filter(
+            id__in=recipe_ids).values_list('id', 'servings'):
+        components_changed(
+            recipe_id, old_amounts[recipe_id], recipe_amounts(recipe_id),
+            old_servings.get(recipe_id, servings), servings)
+
+
+def shopping_list_rows(user):
+    """Строки списка покупок одним чтением по индексу (user, ingredient).
+
+    Количество одного продукта в совместимых единицах ("500 г" и "1 кг")
+    складывается в канонической единице.
+    """
+    rows = aggregate_canonical(
+        ShoppingListItem.objects.filter(user=user),
+        'ingredient__name', 'ingredient__measurement_unit', 'amount'
+    ).annotate(first_ingredient=Min('ingredient_id'))
+    return [
+        (row['first_ingredient'], row['ingredient__name'],
+         row['canonical_unit'], format_amount(row['total']))
+        for row in rows
+    ]
+
+
+def shopping_list_digest(user):
+    """Отпечаток содержимого списка: количества, названия и единицы.
+
+    Меняется при любой правке корзины, состава рецептов и ингредиентов
+    из списка, в отличие от отпечатка одной корзины.
+    """
+    rows = ShoppingListItem.objects.filter(user=user).order_by(
+        'ingredient_id').values_list(
+            'ingredient_id', 'ingredient__name',
+            'ingredient__measurement_unit', 'amount')
+    return hashlib.sha1(repr(list(rows)).encode()).hexdigest()
+
+
+def build_shopping_list(user):
+    """Текст списка покупок по рецептам из корзины пользователя."""
+    return '===Foodgram===\n' + ''.join(
+        f'- {name}: {amount} {measurement_unit}\n'
+        for _, name, measurement_unit, amount in shopping_list_rows(user))
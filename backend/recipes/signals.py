@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from jobs.queue import enqueue
+
+from . import shopping_list
+from .models import (ROLLUP_FIELDS, Component, Ingredient, Recipe,
+                     ShoppingCart, Tag)
+from .purge import pre_purge
+from .versions import bump_version
+
+User = get_user_model()
+
+# Поля пользователя в представлении рецепта (api.fastpath.AUTHOR_FIELDS).
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        shopping_list.add_recipe(
+            instance.user_id, instance.recipe_id, instance.servings)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    # pre_delete: при каскадном удалении рецепта его Component еще на месте.
+    shopping_list.remove_recipe(
+        instance.user_id, instance.recipe_id, instance.servings)
+
+
+@receiver(pre_purge, sender=ShoppingCart)
+def remove_purged_from_shopping_lists(sender, pks, **kwargs):
+    # Скрытые рецепты вычтены из списков уже при удалении.
+    shopping_list.remove_carts(ShoppingCart.objects.filter(
+        id__in=pks, recipe__deleted_at__isnull=True).values_list(
+            'id', flat=True))
+
+
+def rollup_values(ingredient):
+    return tuple(getattr(ingredient, field) for field in ROLLUP_FIELDS)
+
+
+@receiver(pre_save, sender=Ingredient)
+def remember_ingredient_values(sender, instance, update_fields=None,
+                               **kwargs):
+    # Старые значения нужны post_save: пересчет только при их изменении.
+    instance._rollup_values = None
+    if instance.pk is None or (update_fields and not set(update_fields) & set(
+            ROLLUP_FIELDS)):
+        return
+    instance._rollup_values = Ingredient.objects.filter(
+        pk=instance.pk).values_list(*ROLLUP_FIELDS).first()
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_changed(sender, instance, created, **kwargs):
+    old = getattr(instance, '_rollup_values', None)
+    if created or old is None or old == rollup_values(instance):
+        return
+    enqueue('recipes.update_rollups', {'ingredient_ids': [instance.id]})
+
+
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_deleted(sender, instance, **kwargs):
+    # После удаления связи с рецептами уже не найти.
+    recipe_ids = list(instance.components.values_list(
+        'recipe_id', flat=True).distinct())
+    if recipe_ids:
+        enqueue('recipes.update_rollups', {'recipe_ids': recipe_ids})
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Component)
+@receiver(post_delete, sender=Component)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipes_changed(sender, **kwargs):
+    bump_version()
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields=None,
+                   **kwargs):
+    """Имя и почта автора входят в представление его рецептов."""
+    if created or (update_fields
+                   and not set(update_fields) & AUTHOR_FIELDS):
+        return
+    if Recipe.objects.filter(author=instance).exists():
+        bump_version()
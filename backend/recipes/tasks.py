@@ -0,0 +1,95 @@
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from jobs.queue import job
+
+from . import purge, rollups, versions
+from .models import Recipe, hashed_name
+from .shopping_list import build_shopping_list
+
+EXPORTS_DIR = 'exports'
+
+User = get_user_model()
+
+
+@job('recipes.process_image')
+def process_image(recipe_id):
+    """Уменьшить и пережать загруженное изображение рецепта."""
+    recipe = Recipe.objects.filter(id=recipe_id).first()
+    if recipe is None or not recipe.image:
+        return None
+    with recipe.image.open('rb') as file:
+        image = Image.open(file)
+        image.load()
+    max_size = settings.RECIPE_IMAGE_MAX_SIZE
+    if max(image.size) <= max_size:
+        return {'resized': False}
+    image_format = image.format or 'PNG'
+    image.thumbnail((max_size, max_size))
+    buffer = BytesIO()
+    image.save(buffer, format=image_format, optimize=True)
+    old_name = recipe.image.name
+    content = ContentFile(buffer.getvalue())
+    name = recipe.image.storage.save(
+        hashed_name('recipes/', old_name, content), content)
+    # update() вместо save(): не вызываем сигналы и повторную обработку.
+    Recipe.objects.filter(id=recipe_id).update(image=name)
+    versions.bump_version()
+    if name != old_name:
+        recipe.image.storage.delete(old_name)
+    return {'resized': True, 'image': name}
+
+
+@job('recipes.export_shopping_cart')
+def export_shopping_cart(user_id):
+    """Сформировать файл списка покупок для большой корзины."""
+    text = build_shopping_list(User.objects.get(id=user_id))
+    prefix = f'shopping_list_{user_id}'
+    remove_exports(prefix)
+    name = default_storage.save(
+        f'{EXPORTS_DIR}/{prefix}.txt', ContentFile(text.encode()))
+    return {'file': name}
+
+
+def remove_exports(prefix):
+    """Удалить прежние выгрузки, включая копии с суффиксом хранилища."""
+    try:
+        _, files = default_storage.listdir(EXPORTS_DIR)
+    except FileNotFoundError:
+        return
+    for file_name in files:
+        if file_name == f'{prefix}.txt' or file_name.startswith(
+                f'{prefix}_'):
+            default_storage.delete(f'{EXPORTS_DIR}/{file_name}')
+
+
+@job('recipes.update_similar')
+def update_similar(full=False):
+    """Пересчитать похожие рецепты по избранному и корзинам."""
+    # numpy и scipy нужны только здесь - не грузим их в веб-воркеры.
+    from .recommendations import update_similarities
+    return update_similarities(full=full)
+
+
+@job('recipes.update_rollups')
+def update_rollups(ingredient_ids=(), recipe_ids=()):
+    """Пересчитать пищевую ценность и стоимость затронутых рецептов."""
+    updated = rollups.update_recipes(recipe_ids)
+    if ingredient_ids:
+        updated += rollups.update_recipes(
+            rollups.recipes_with_ingredients(ingredient_ids))
+    return {'recipes': updated}
+
+
+@job('recipes.purge_deleted')
+def purge_deleted():
+    """Удалить строки мягко удаленных рецептов и пользователей."""
+    result = purge.purge_deleted()
+    if not result['done']:
+        purge.schedule_purge()
+    return result
@@ -0,0 +1,40 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from recipes.models import Recipe
+from users.models import User
+
+
+class ImportRecipesTest(TestCase):
+
+    def import_lines(self, lines):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'recipes.jsonl')
+            with open(path, 'w') as file:
+                file.writelines(json.dumps(line) + '\n' for line in lines)
+            call_command('import_recipes', path, stdout=StringIO(),
+                         stderr=StringIO())
+
+    def recipe(self, text, ingredient):
+        return {
+            'author': 'a@example.com', 'name': 'Суп', 'text': text,
+            'cooking_time': 10, 'image': 'recipes/images/soup.png',
+            'ingredients': [{'name': ingredient, 'measurement_unit': 'г',
+                             'amount': 100}],
+        }
+
+    def test_duplicate_keys_in_chunk(self):
+        User.objects.create(email='a@example.com', username='a')
+        self.import_lines([self.recipe('Первый', 'морковь'),
+                           self.recipe('Второй', 'свекла'),
+                           self.recipe('Третий', 'капуста')])
+        self.assertEqual(
+            {recipe.text: [item.name for item in recipe.ingredients.all()]
+             for recipe in Recipe.objects.all()},
+            {'Первый': ['морковь'], 'Второй': ['свекла'],
+             'Третий': ['капуста']})
@@ -0,0 +1,89 @@
+from django.test import TestCase, override_settings
+
+from recipes.models import (Component, FavoriteRecipe, Ingredient, Recipe,
+                            ShoppingCart, ShoppingListItem, Tag)
+from recipes.purge import delete_recipes, delete_user, purge_deleted
+from users.models import Subscribe, User
+
+
+@override_settings(PURGE={'BATCH_SIZE': 1, 'MAX_BATCHES': 100, 'DELAY': 0})
+class PurgeTest(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create(
+            email='author@example.com', username='author')
+        self.reader = User.objects.create(
+            email='reader@example.com', username='reader')
+        self.flour = Ingredient.objects.create(
+            name='мука', measurement_unit='г')
+        self.salt = Ingredient.objects.create(
+            name='соль', measurement_unit='г')
+        self.tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast')
+        self.recipes = [
+            self.make_recipe(self.author, 'Хлеб'),
+            self.make_recipe(self.author, 'Булка'),
+        ]
+        self.kept = self.make_recipe(self.reader, 'Блины')
+        for recipe in (*self.recipes, self.kept):
+            FavoriteRecipe.objects.create(user=self.reader, recipe=recipe)
+            ShoppingCart.objects.create(user=self.reader, recipe=recipe)
+        ShoppingCart.objects.create(user=self.author, recipe=self.kept)
+        Subscribe.objects.create(user=self.reader, author=self.author)
+
+    def make_recipe(self, author, name):
+        recipe = Recipe.objects.create(
+            author=author, name=name, text='Описание',
+            image='recipes/images/recipe.png', cooking_time=10)
+        Component.objects.bulk_create([
+            Component(recipe=recipe, ingredient=self.flour, amount=100),
+            Component(recipe=recipe, ingredient=self.salt, amount=5)])
+        recipe.tags.add(self.tag)
+        return recipe
+
+    def shopping_list(self, user):
+        return dict(ShoppingListItem.objects.filter(user=user).values_list(
+            'ingredient__name', 'amount'))
+
+    def test_delete_user(self):
+        delete_user(self.author)
+        # Рецепты скрыты и вычтены из списков сразу.
+        self.assertFalse(Recipe.objects.filter(author=self.author).exists())
+        self.assertEqual(self.shopping_list(self.reader),
+                         {'мука': 100, 'соль': 5})
+
+        self.assertEqual(purge_deleted(), {
+            'done': True, 'recipes': 2, 'users': 1})
+        self.assertFalse(User.objects.filter(id=self.author.id).exists())
+        recipe_ids = [recipe.id for recipe in self.recipes]
+        self.assertFalse(Recipe.all_objects.filter(id__in=recipe_ids).exists())
+        for model in (Component, FavoriteRecipe, ShoppingCart):
+            self.assertFalse(model.objects.filter(
+                recipe_id__in=recipe_ids).exists(), model)
+        self.assertFalse(Recipe.tags.through.objects.filter(
+            recipe_id__in=recipe_ids).exists())
+        self.assertFalse(Subscribe.objects.filter(
+            author_id=self.author.id).exists())
+        self.assertFalse(ShoppingListItem.objects.filter(
+            user_id=self.author.id).exists())
+        # Повторного вычитания при очистке нет, чужой рецепт на месте.
+        self.assertEqual(self.shopping_list(self.reader),
+                         {'мука': 100, 'соль': 5})
+        self.assertEqual(self.kept.components.count(), 2)
+        self.assertEqual(ShoppingCart.objects.filter(
+            recipe=self.kept).count(), 1)
+
+    def test_delete_recipes(self):
+        delete_recipes([self.recipes[0].id])
+        self.assertEqual(purge_deleted(), {
+            'done': True, 'recipes': 1, 'users': 0})
+        self.assertEqual(
+            list(Recipe.all_objects.filter(
+                author=self.author).values_list('name', flat=True)),
+            ['Булка'])
+        self.assertEqual(FavoriteRecipe.objects.filter(
+            user=self.reader).count(), 2)
+        self.assertEqual(self.shopping_list(self.reader),
+                         {'мука': 200, 'соль': 10})
+        self.assertEqual(purge_deleted(), {
+            'done': True, 'recipes': 0, 'users': 0})
@@ -0,0 +1,59 @@
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from scipy import sparse
+
+from recipes.models import FavoriteRecipe, Recipe, RecipeSimilarity
+from recipes.recommendations import column_digests, update_similarities
+from users.models import User
+
+
+class ColumnDigestsTest(SimpleTestCase):
+
+    def digests(self, columns):
+        """Отпечатки столбцов матрицы пользователи x рецепты."""
+        rows = [user for column in columns for user in column]
+        cols = [index for index, column in enumerate(columns)
+                for _ in column]
+        matrix = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+            shape=(3, len(columns)))
+        return column_digests(matrix.T.tocsr(), np.array([10, 20, 30]))
+
+    def test_empty_columns(self):
+        digests = self.digests([[0, 1], [], [2], []])
+        self.assertEqual(digests[1], 0)
+        self.assertEqual(digests[3], 0)
+        self.assertEqual(digests[0], self.digests([[0, 1]])[0])
+        self.assertEqual(digests[2], self.digests([[2]])[0])
+
+    def test_no_interactions(self):
+        self.assertEqual(list(self.digests([[], []])), [0, 0])
+
+
+class UpdateSimilaritiesTest(TestCase):
+
+    def test_hidden_recipes_are_skipped(self):
+        author = User.objects.create(email='a@example.com', username='a')
+        recipes = [
+            Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Описание',
+                image=f'recipes/{number}.jpg', cooking_time=10)
+            for number in range(3)]
+        for number in range(3):
+            user = User.objects.create(
+                email=f'u{number}@example.com', username=f'u{number}')
+            for recipe in recipes:
+                FavoriteRecipe.objects.create(user=user, recipe=recipe)
+        update_similarities()
+        self.assertTrue(RecipeSimilarity.objects.filter(
+            similar=recipes[2]).exists())
+        Recipe.objects.filter(pk=recipes[2].pk).update(
+            deleted_at=timezone.now())
+        update_similarities()
+        self.assertFalse(RecipeSimilarity.objects.filter(
+            similar=recipes[2]).exists())
+        self.assertFalse(RecipeSimilarity.objects.filter(
+            recipe=recipes[2]).exists())
+        self.assertTrue(RecipeSimilarity.objects.filter(
+            recipe=recipes[0], similar=recipes[1]).exists())
@@ -0,0 +1,94 @@
+from django.test import TestCase
+
+from recipes.models import Component, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.shopping_list import build_shopping_list, shopping_list_rows
+from users.models import User
+
+
+class ShoppingListTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(
+            email='a@example.com', username='a', is_staff=True,
+            is_superuser=True)
+        self.flour_g = Ingredient.objects.create(
+            name='мука', measurement_unit='г')
+        self.flour_kg = Ingredient.objects.create(
+            name='мука', measurement_unit='кг')
+        self.milk = Ingredient.objects.create(
+            name='молоко', measurement_unit='мл')
+        self.pancakes = self.make_recipe('Блины', 2, [
+            (self.flour_g, 300), (self.milk, 500)])
+        self.bread = self.make_recipe('Хлеб', 1, [(self.flour_kg, 1)])
+
+    def make_recipe(self, name, servings, components):
+        recipe = Recipe.objects.create(
+            author=self.user, name=name, text='Описание',
+            image='recipes/images/recipe.png', cooking_time=10,
+            servings=servings)
+        Component.objects.bulk_create(
+            Component(recipe=recipe, ingredient=ingredient, amount=amount)
+            for ingredient, amount in components)
+        return recipe
+
+    def rows(self):
+        return {(name, unit): amount
+                for _, name, unit, amount in shopping_list_rows(self.user)}
+
+    def test_units_and_servings(self):
+        ShoppingCart.objects.create(
+            user=self.user, recipe=self.pancakes, servings=3)
+        ShoppingCart.objects.create(user=self.user, recipe=self.bread)
+        self.assertEqual(self.rows(), {
+            ('мука', 'г'): 1450, ('молоко', 'мл'): 750})
+        self.assertEqual(
+            build_shopping_list(self.user),
+            '===Foodgram===\n- молоко: 750 мл\n- мука: 1450 г\n')
+
+    def test_remove_from_cart(self):
+        cart = ShoppingCart.objects.create(
+            user=self.user, recipe=self.pancakes, servings=3)
+        ShoppingCart.objects.create(user=self.user, recipe=self.bread)
+        cart.delete()
+        self.assertEqual(self.rows(), {('мука', 'г'): 1000})
+
+    def test_admin_recipe_change(self):
+        ShoppingCart.objects.create(
+            user=self.user, recipe=self.pancakes, servings=4)
+        component = self.pancakes.components.get(ingredient=self.flour_g)
+        self.client.force_login(self.user)
+        response = self.client.post(
+            f'/admin/recipes/recipe/{self.pancakes.id}/change/', {
+                'author': self.user.id, 'name': 'Блины', 'text': 'Описание',
+                'cooking_time': 10, 'servings': 1,
+                'tags': [Tag.objects.create(
+                    name='Завтрак', color='#E26C2D', slug='breakfast').id],
+                'components-TOTAL_FORMS': 2,
+                'components-INITIAL_FORMS': 2,
+                'components-MIN_NUM_FORMS': 1,
+                'components-MAX_NUM_FORMS': 1000,
+                'components-0-id': component.id,
+                'components-0-recipe': self.pancakes.id,
+                'components-0-ingredient': self.flour_g.id,
+                'components-0-amount': 100,
+                'components-1-id': self.pancakes.components.get(
+                    ingredient=self.milk).id,
+                'components-1-recipe': self.pancakes.id,
+                'components-1-ingredient': self.milk.id,
+                'components-1-amount': 200,
+                'components-1-DELETE': 'on',
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.rows(), {('мука', 'г'): 400})
+
+    def test_admin_cart_servings_change(self):
+        cart = ShoppingCart.objects.create(
+            user=self.user, recipe=self.pancakes)
+        self.client.force_login(self.user)
+        response = self.client.post(
+            f'/admin/recipes/shoppingcart/{cart.id}/change/', {
+                'user': self.user.id, 'recipe': self.pancakes.id,
+                'servings': 4})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.rows(), {
+            ('мука', 'г'): 600, ('молоко', 'мл'): 1000})
@@ -0,0 +1,102 @@
+"""Единицы измерения и пересчет в каноническую единицу.
+
+Ingredient.measurement_unit - свободный текст, поэтому единица сначала
+нормализуется (регистр, пробелы, синонимы), а затем, если она входит в
+таблицу UNITS, переводится в каноническую единицу своей величины.
+Единицы вне таблицы ("по вкусу", "пучок" и т.п.) не пересчитываются.
+"""
+from collections import defaultdict
+
+from django.db.models import Case, CharField, F, FloatField, Sum, Value, When
+
+# Единица: (каноническая единица, множитель).
+UNITS = {
+    'мг': ('г', 0.001),
+    'г': ('г', 1),
+    'кг': ('г', 1000),
+    'мл': ('мл', 1),
+    'л': ('мл', 1000),
+    'капля': ('мл', 0.05),
+    'ч. л.': ('мл', 5),
+    'ст. л.': ('мл', 15),
+    'стакан': ('мл', 200),
+    'шт.': ('шт.', 1),
+}
+
+SYNONYMS = {
+    'гр': 'г',
+    'гр.': 'г',
+    'г.': 'г',
+    'кг.': 'кг',
+    'мл.': 'мл',
+    'л.': 'л',
+    'шт': 'шт.',
+    'ч.л.': 'ч. л.',
+    'ст.л.': 'ст. л.',
+}
+
+
+def normalize_unit(unit):
+    unit = ' '.join(unit.lower().split())
+    return SYNONYMS.get(unit, unit)
+
+
+def _build_lookup():
+    """Все известные написания -> (каноническая единица, множитель)."""
+    lookup = dict(UNITS)
+    for synonym, unit in SYNONYMS.items():
+        lookup[synonym] = UNITS[unit]
+    return lookup
+
+
+# Таблица строится один раз при импорте (старте процесса).
+LOOKUP = _build_lookup()
+
+
+def convert(amount, unit):
+    """Перевести количество в каноническую единицу."""
+    canonical, factor = LOOKUP.get(normalize_unit(unit), (unit, 1))
+    return amount * factor, canonical
+
+
+def aggregate_canonical(queryset, name_field, unit_field, amount_field):
+    """Суммы количества по (название, каноническая единица).
+
+    Написания единиц из queryset (их немного) разбираются normalize_unit
+    в Python, а в БД уходят как есть: каноническая единица и множитель
+    подставляются выражением CASE по точному значению, поэтому правила
+    нормализации в SQL и в convert() не расходятся. Неизвестные единицы
+    остаются как есть с множителем 1.
+    """
+    by_target = defaultdict(list)
+    for unit in queryset.order_by().values_list(
+            unit_field, flat=True).distinct():
+        target = LOOKUP.get(normalize_unit(unit))
+        if target is not None:
+            by_target[target].append(unit)
+    return queryset.annotate(
+        canonical_unit=Case(
+            *(When(**{f'{unit_field}__in': spellings},
+                   then=Value(canonical))
+              for (canonical, _), spellings in by_target.items()),
+            default=F(unit_field),
+            output_field=CharField(),
+        ),
+        factor=Case(
+            *(When(**{f'{unit_field}__in': spellings},
+                   then=Value(float(factor)))
+              for (_, factor), spellings in by_target.items()),
+            default=Value(1.0),
+            output_field=FloatField(),
+        ),
+    ).values(
+        name_field, 'canonical_unit'
+    ).annotate(
+        total=Sum(F(amount_field) * F('factor'), output_field=FloatField())
+    ).order_by(name_field, 'canonical_unit')
+
+
+def format_amount(amount):
+    """Целое без дробной части, иначе не более двух знаков."""
+    amount = round(amount, 2)
+    return int(amount) if amount == int(amount) else amount
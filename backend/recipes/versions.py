@@ -0,0 +1,61 @@
+"""Версия содержимого рецептов для кэшей ответов API.
+
+Любая правка рецептов, состава, тегов, ингредиентов и данных авторов
+меняет значение; ETag и ключи закэшированных ответов включают его,
+поэтому старые записи просто перестают совпадать - удалять их по
+шаблону не нужно. Значение - время в наносекундах, а не счетчик с нуля:
+после очистки кэша версия не повторит уже выданную.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+
+VERSION_KEY = 'recipes-version'
+
+
+def get_cache():
+    alias = settings.RESPONSE_CACHE['ALIAS']
+    return caches[alias] if alias else None
+
+
+def check_shared_cache():
+    """Отказаться запускаться с кэшем версии в памяти процесса.
+
+    С LocMemCache у каждого воркера своя версия: bump_version меняет ее
+    только в одном из них, и ключи nginx и ETag зависят от того, какой
+    воркер ответил.
+    """
+    cache = get_cache()
+    if isinstance(cache, LocMemCache):
+        raise ImproperlyConfigured(
+            f'RESPONSE_CACHE_ALIAS={settings.RESPONSE_CACHE["ALIAS"]}: '
+            f'нужен общий для процессов кэш (Redis, Memcached), '
+            f'а не LocMemCache.')
+
+
+def current_version():
+    """Текущая версия; None, если общий кэш не настроен."""
+    cache = get_cache()
+    if cache is None:
+        return None
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    """Сменить версию после коммита текущей транзакции.
+
+    До коммита параллельный запрос прочитал бы старые данные и сохранил
+    их уже под новой версией.
+    """
+    cache = get_cache()
+    if cache is not None:
+        transaction.on_commit(
+            lambda: cache.set(VERSION_KEY, time.time_ns(), None))
@@ -0,0 +1,18 @@
+from django.http import HttpResponse
+
+from .versions import current_version
+
+
+def recipes_version(request):
+    """Версия рецептов в заголовке X-Recipes-Version, без тела.
+
+    nginx запрашивает ее подзапросом auth_request и добавляет в ключ кэша
+    анонимных ответов: после правки рецептов старые записи не читаются.
+    Наружу путь не проксируется. Ошибка подзапроса - 500 на все списки,
+    поэтому путь не ограничивается: это не вью DRF (throttling его не
+    касается), и он исключен из LOAD_SHEDDING.
+    """
+    response = HttpResponse(status=204)
+    response['X-Recipes-Version'] = current_version() or ''
+    response['Cache-Control'] = 'no-store'
+    return response
@@ -1,9 +1,13 @@
 from django.contrib import admin
 
+from recipes.admin import SoftDeleteAdmin
+from recipes.paginators import EstimatedCountPaginator
+from recipes.purge import delete_user
+
 from .models import Subscribe, User
 
 
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(SoftDeleteAdmin):
     empty_value_display = '-пусто-'
     list_display = (
         'username',
@@ -13,13 +17,25 @@ class UserAdmin(admin.ModelAdmin):
         'last_name',
     )
     search_fields = ('username', 'email', 'first_name', 'last_name',)
-    list_filter = ('username', 'email',)
+    list_filter = ('is_staff', 'is_active')
     list_editable = ('password',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def soft_delete(self, objs):
+        for user in objs:
+            delete_user(user)
 
 
 class SubscribeAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
     list_display = ('user', 'author',)
+    list_select_related = ('user', 'author')
+    search_fields = ('user__username', 'author__username')
+    autocomplete_fields = ('user', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ('-id',)
 
 
 admin.site.register(User, UserAdmin)
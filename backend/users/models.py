@@ -26,6 +26,15 @@ class User(AbstractUser):
         verbose_name='Пароль',
         max_length=150
     )
+    # Удаленный пользователь деактивирован и скрыт; строки удаляет
+    # фоновая очистка (recipes.purge).
+    deleted_at = models.DateTimeField(
+        verbose_name='Дата удаления',
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True
+    )
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name')
 
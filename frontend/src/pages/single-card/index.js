@@ -3,6 +3,7 @@ import { UserContext, AuthContext } from '../../contexts'
 import { useContext, useState, useEffect } from 'react'
 import styles from './styles.module.css'
 import Ingredients from './ingredients'
+import Nutrition from './nutrition'
 import Description from './description'
 import cn from 'classnames'
 import { useRouteMatch, useParams, useHistory } from 'react-router-dom'
@@ -44,6 +45,8 @@ const SingleCard = ({ loadItem, updateOrders }) => {
     image,
     tags,
     cooking_time,
+    servings,
+    nutrition,
     name,
     ingredients,
     text,
@@ -75,6 +78,7 @@ const SingleCard = ({ loadItem, updateOrders }) => {
           <TagsContainer tags={tags} />
           <div>
             <p className={styles['single-card__text']}><Icons.ClockIcon /> {cooking_time} мин.</p>
+            {servings && <p className={styles['single-card__text']}>Порций: {servings}</p>}
             <p className={styles['single-card__text_with_link']}>
               <div className={styles['single-card__text']}>
                 <Icons.UserIcon /> <LinkComponent
@@ -112,6 +116,7 @@ const SingleCard = ({ loadItem, updateOrders }) => {
             </Button>}
           </div>
           <Ingredients ingredients={ingredients} />
+          <Nutrition nutrition={nutrition} servings={servings} />
           <Description description={text} />
         </div>
     </div>
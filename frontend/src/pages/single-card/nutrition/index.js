@@ -0,0 +1,31 @@
+import styles from './styles.module.css'
+
+const FIELDS = [
+  ['calories', 'Калорийность', 'ккал'],
+  ['proteins', 'Белки', 'г'],
+  ['fats', 'Жиры', 'г'],
+  ['carbohydrates', 'Углеводы', 'г'],
+  ['cost', 'Стоимость', '']
+]
+
+// Суммы на все порции рецепта; null - значение известно не для всех ингредиентов.
+const Nutrition = ({ nutrition, servings }) => {
+  if (!nutrition) { return null }
+  const known = FIELDS.filter(([ field ]) => nutrition[field] !== null && nutrition[field] !== undefined)
+  if (!known.length) { return null }
+  return <div className={styles.nutrition}>
+    <h3 className={styles['nutrition__title']}>
+      Пищевая ценность{servings ? ` на ${servings} порц.` : ''}:
+    </h3>
+    <div className={styles['nutrition__list']}>
+      {known.map(([ field, title, unit ]) => <p
+        key={field}
+        className={styles['nutrition__list-item']}
+      >
+        {title} - {nutrition[field]} {unit}
+      </p>)}
+    </div>
+  </div>
+}
+
+export default Nutrition